@@ -0,0 +1,290 @@
+"""Benchmarks of the pytest-copie plugin.
+
+The templates are synthetic versions of the ``copier_template`` test fixture scaled up in number
+of files, depth of ``!include`` trees and length of parent/child chains. Every benchmark is
+timed several times and the results are saved as json so that two commits can be compared:
+
+.. code-block:: console
+
+    python benchmarks/bench_copie.py --output before.json
+    git checkout my-branch
+    python benchmarks/bench_copie.py --output after.json --compare before.json
+"""
+
+import argparse
+import io
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from contextlib import redirect_stderr, redirect_stdout
+from datetime import datetime, timezone
+from importlib.metadata import version
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import plumbum
+import yaml
+
+from pytest_copie.plugin import Copie, Result, _git
+
+FILES_PER_DIR = 100
+"Number of files in each folder of the synthetic templates."
+
+
+def make_template(root: Path, n_files: int, include_depth: int = 0, name: str = "template") -> Path:
+    """Build a synthetic template scaled from the ``copier_template`` test fixture.
+
+    Args:
+        root: the folder where the template is created
+        n_files: the number of templated files to render
+        include_depth: the depth of the chain of ``!include`` files in copier.yaml
+        name: the name of the template folder
+
+    Returns:
+        the path to the template
+    """
+    template_config = {
+        "repo_name": {"type": "str", "default": "foobar"},
+        "test_templated": {"type": "str", "default": "{{ repo_name }}"},
+        "test_value": "value",
+        "short_description": {"type": "str", "default": "Test Project"},
+        "_subdirectory": "project",
+    }
+
+    (template_dir := root / name).mkdir(parents=True)
+    config = yaml.dump(template_config)
+    if include_depth:
+        config = f"!include include_0.yml\n---\n{config}"
+        for i in range(include_depth):
+            include = {f"question_{i}": {"type": "str", "default": f"value {i}"}}
+            text = yaml.dump(include)
+            if i < include_depth - 1:
+                text += f"nested_{i}: !include include_{i + 1}.yml\n"
+            (template_dir / f"include_{i}.yml").write_text(text)
+    (template_dir / "copier.yaml").write_text(config)
+
+    (repo_dir := template_dir / "project").mkdir()
+    (repo_dir / "{{ _copier_conf.answers_file }}.jinja").write_text(
+        "{{ _copier_answers|to_nice_yaml -}}"
+    )
+    (repo_dir / "README.rst.jinja").write_text("{{ repo_name }}\n{{ short_description }}\n")
+    for i in range(n_files):
+        (folder := repo_dir / f"folder_{i // FILES_PER_DIR:03d}").mkdir(exist_ok=True)
+        (folder / f"file_{i:05d}.txt.jinja").write_text(f"{{{{ repo_name }}}} file {i}\n")
+
+    return template_dir
+
+
+def make_versioned_template(root: Path, n_files: int) -> Path:
+    """Build a synthetic template as a git repository with a ``v1`` and a ``v2`` tag."""
+    template_dir = make_template(root, n_files)
+    with plumbum.local.cwd(template_dir):
+        _git("init", "--quiet")
+        _git("add", ".")
+        _git("commit", "--quiet", "-m", "v1")
+        _git("tag", "v1")
+        with (template_dir / "project" / "README.rst.jinja").open("a") as f:
+            f.write("New content\n")
+        _git("commit", "--quiet", "-am", "v2")
+        _git("tag", "v2")
+    return template_dir
+
+
+def make_copie(root: Path, template_dir: Path) -> Copie:
+    """Create a Copie instance equivalent to the one yielded by the ``copie`` fixture.
+
+    The Jinja bytecode cache is enabled, like with ``--copie-jinja-cache=session``.
+    """
+    (user_dir := root / "user_dir").mkdir(parents=True, exist_ok=True)
+    config = {"copier_dir": str(user_dir / "copier"), "replay_dir": str(user_dir / "replay")}
+    (config_file := user_dir / "config").write_text(yaml.dump(config))
+    (test_dir := root / "copie").mkdir(parents=True, exist_ok=True)
+    (bytecode_dir := root / "copie_jinja").mkdir(parents=True, exist_ok=True)
+    return Copie(template_dir, test_dir, config_file, bytecode_dir=bytecode_dir)
+
+
+def measure(func: Callable[..., object], repeat: int, setup: Optional[Callable] = None) -> Dict:
+    """Time a function several times, the setup is not part of the timing.
+
+    The copier messages are captured like pytest would do.
+    """
+    runs = []
+    for _ in range(repeat):
+        with redirect_stderr(io.StringIO()), redirect_stdout(io.StringIO()):
+            args = setup() if setup is not None else ()
+            start = time.perf_counter()
+            func(*args)
+            runs.append(time.perf_counter() - start)
+    return {"runs": runs, "min": min(runs), "median": statistics.median(runs)}
+
+
+def _check(result: Result) -> Result:
+    """Raise the exception of a failed copier run so that failures are not benchmarked."""
+    if result.exception is not None:
+        raise RuntimeError(f"copier failed: {result.exception!r}")
+    return result
+
+
+def bench_copy(tmp: Path, n_files: int, repeat: int) -> Dict:
+    """Time Copie.copy on a template of n_files files."""
+    copie = make_copie(tmp / "copy", make_template(tmp / "copy", n_files))
+    return measure(lambda: _check(copie.copy()), repeat)
+
+
+def bench_include(tmp: Path, depth: int, repeat: int) -> Dict:
+    """Time Copie.copy on a template whose copier.yaml includes a chain of depth files."""
+    template_dir = make_template(tmp / "include", 10, include_depth=depth)
+    copie = make_copie(tmp / "include", template_dir)
+    return measure(lambda: _check(copie.copy()), repeat)
+
+
+def bench_update(tmp: Path, n_files: int, repeat: int) -> Dict:
+    """Time Copie.update from v1 to v2 on a template of n_files files."""
+    copie = make_copie(tmp / "update", make_versioned_template(tmp / "update", n_files))
+
+    def setup():
+        result = _check(copie.copy(vcs_ref="v1"))
+        result.git_snapshot()
+        return (result,)
+
+    return measure(lambda result: _check(copie.update(result, vcs_ref="v2")), repeat, setup)
+
+
+def bench_chain(tmp: Path, levels: int, n_files: int, repeat: int) -> Dict:
+    """Time a parent/child chain of levels templates applied one on top of the other."""
+    templates = [make_template(tmp / "chain", n_files, name=f"level_{i}") for i in range(levels)]
+    for i, template_dir in enumerate(templates):
+        # each level renders its own files and answers file
+        config = yaml.safe_load((template_dir / "copier.yaml").read_text())
+        config["_answers_file"] = f".level-{i}-answers.yml"
+        (template_dir / "copier.yaml").write_text(yaml.dump(config))
+        for path in (template_dir / "project").glob("folder_*"):
+            path.rename(path.with_name(f"level_{i}_{path.name}"))
+
+    def chain():
+        result = None
+        for template_dir in templates:
+            copie = make_copie(Path(tempfile.mkdtemp(dir=tmp / "chain")), template_dir)
+            copie.parent_result = result
+            result = _check(copie.copy())
+
+    return measure(chain, repeat)
+
+
+_DURATIONS_CONFTEST = """
+import json
+
+durations = {}
+
+def pytest_runtest_logreport(report):
+    if report.when in ("setup", "teardown"):
+        durations[report.nodeid] = durations.get(report.nodeid, 0) + report.duration
+
+def pytest_sessionfinish(session):
+    with open("durations.json", "w") as f:
+        json.dump(durations, f)
+"""
+
+
+def bench_fixture(tmp: Path, n_tests: int, repeat: int) -> Dict:
+    """Time the setup and teardown of the copie fixture, per test.
+
+    The same tests are run requesting the fixture and requesting ``tmp_path`` only (a dependency
+    of ``copie``), the difference of their setup and teardown durations is the overhead of the
+    fixture.
+    """
+    (tmp / "conftest.py").write_text(_DURATIONS_CONFTEST)
+    body = "def test_{fixture}_{i}({fixture}):\n    pass\n"
+    tests = [body.format(i=i, fixture=f) for i in range(n_tests) for f in ("copie", "tmp_path")]
+    (tmp / "test_fixture.py").write_text("\n\n".join(tests))
+
+    runs = []
+    cmd = [sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "test_fixture.py"]
+    cmd.append("--copie-jinja-cache=session")
+    for _ in range(repeat):
+        subprocess.run(cmd, cwd=tmp, check=True, capture_output=True)
+        durations = json.loads((tmp / "durations.json").read_text())
+        copie = [d for node, d in durations.items() if "test_copie_" in node]
+        plain = [d for node, d in durations.items() if "test_tmp_path_" in node]
+        runs.append(statistics.median(copie) - statistics.median(plain))
+    return {"runs": runs, "min": min(runs), "median": statistics.median(runs)}
+
+
+def compare(current: Dict, previous: Dict, threshold: float) -> bool:
+    """Print the ratio between two benchmark results and report regressions.
+
+    Returns:
+        True if a benchmark is slower than the threshold allows
+    """
+    regression = False
+    old_results = previous["results"]
+    print(f"\n{'benchmark':<35} {'before':>10} {'after':>10} {'ratio':>8}")
+    for name, result in current["results"].items():
+        if name not in old_results:
+            continue
+        before, after = old_results[name]["median"], result["median"]
+        ratio = after / before if before else float("inf")
+        flag = " !" if ratio > 1 + threshold else ""
+        regression |= bool(flag)
+        print(f"{name:<35} {before:>10.4f} {after:>10.4f} {ratio:>8.2f}{flag}")
+    return regression
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description=textwrap.dedent(__doc__ or "").split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--include-depths", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--chain-levels", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--fixture-tests", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=Path("benchmark.json"))
+    parser.add_argument("--compare", type=Path, help="previous json results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="tolerated slowdown ratio")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict] = {}
+    with tempfile.TemporaryDirectory(prefix="copie-bench-") as tmp_dir:
+        tmp = Path(tmp_dir)
+
+        def run(name: str, func: Callable, *bench_args) -> None:
+            (folder := tmp / name.replace("[", "-").replace("]", "").replace("=", "")).mkdir()
+            results[name] = func(folder, *bench_args)
+            print(f"{name:<35} median {results[name]['median']:.4f}s", flush=True)
+
+        for size in args.sizes:
+            run(f"copy[files={size}]", bench_copy, size, args.repeat)
+            run(f"update[files={size}]", bench_update, size, args.repeat)
+        for depth in args.include_depths:
+            run(f"copy[include_depth={depth}]", bench_include, depth, args.repeat)
+        for levels in args.chain_levels:
+            run(f"chain[levels={levels}]", bench_chain, levels, 100, args.repeat)
+        run("fixture[per_test]", bench_fixture, args.fixture_tests, args.repeat)
+
+    commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True)
+    output = {
+        "meta": {
+            "commit": commit.stdout.strip() or None,
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "copier": version("copier"),
+            "pytest-copie": version("pytest-copie"),
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(output, indent=2))
+    print(f"\nresults saved in {args.output}")
+
+    if args.compare is not None:
+        return int(compare(output, json.loads(args.compare.read_text()), args.threshold))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
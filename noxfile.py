@@ -38,6 +38,13 @@ def dead_fixtures(session):
     session.run("pytest", "--dead-fixtures")
 
 
+@nox.session(reuse_venv=True, venv_backend="uv")
+def bench(session):
+    """Run the benchmarks and compare them with previous results if requested."""
+    session.install(".")
+    session.run("python", "benchmarks/bench_copie.py", *session.posargs)
+
+
 @nox.session(reuse_venv=True, venv_backend="uv")
 def docs(session):
     """Build the documentation."""
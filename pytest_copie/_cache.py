@@ -0,0 +1,528 @@
+"""Content-addressed cache of rendered copier projects."""
+
+import fnmatch
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import subprocess
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ._jinja import _versions
+
+RENDER_CACHES = ("none", "session", "persistent")
+"Where the renders are kept: nowhere, in the session temp dir or in the pytest cache directory."
+
+LINK_MODES = ("auto", "hardlink", "copy")
+"The strategies available to materialize a cached render into a test directory."
+
+_STRATEGIES: Dict[str, Tuple[str, ...]] = {
+    "auto": ("reflink", "copy"),
+    "hardlink": ("hardlink", "copy"),
+    "copy": ("copy",),
+}
+
+PARENT_MODES = ("copy", "auto", "reflink", "hardlink")
+"The strategies available to materialize a parent project into the child output directories."
+
+PARENT_STRATEGIES: Dict[str, Tuple[str, ...]] = {
+    "copy": ("copy",),
+    # the hardlinks are opt-in: the tasks and the tests write through them into the parent
+    "auto": ("reflink", "copy"),
+    "reflink": ("reflink", "copy"),
+    "hardlink": ("hardlink", "copy"),
+}
+
+_FICLONE = 0x40049409
+"The Linux ioctl request number asking the filesystem to share the extents of a file."
+
+
+def _reflink(src: str, dst: str) -> None:
+    """Clone ``src`` into ``dst`` sharing the data blocks (copy-on-write)."""
+    try:
+        import fcntl
+    except ImportError:  # pragma: no cover - not available on Windows
+        raise OSError("reflinks are not supported on this platform")
+
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+    shutil.copystat(src, dst)
+
+
+_COPY_FUNCTIONS: Dict[str, Callable[[str, str], object]] = {
+    "reflink": _reflink,
+    "hardlink": os.link,
+    "copy": shutil.copy2,
+}
+
+
+def _clear(directory: Path) -> None:
+    """Remove the content of a directory without removing the directory itself."""
+    for item in directory.iterdir():
+        if item.is_dir() and not item.is_symlink():
+            shutil.rmtree(item)
+        else:
+            item.unlink()
+
+
+def materialize(src: Path, dst: Path, strategies: Sequence[str] = ("copy",)) -> str:
+    """Populate ``dst`` with the content of ``src``.
+
+    Each strategy is tried in turn for the whole tree, the first one that succeeds wins.
+
+    Args:
+        src: the directory to reproduce
+        dst: the destination directory, created if needed, expected to be empty
+        strategies: the ordered names of the strategies to try ("reflink", "hardlink" or "copy")
+
+    Returns:
+        the name of the strategy that was used
+    """
+    for i, strategy in enumerate(strategies):
+        try:
+            shutil.copytree(
+                src,
+                dst,
+                symlinks=True,
+                copy_function=_COPY_FUNCTIONS[strategy],
+                dirs_exist_ok=True,
+            )
+            return strategy
+        except (OSError, shutil.Error):
+            if i == len(strategies) - 1:
+                raise
+            _clear(dst)
+
+    raise ValueError("At least one materialization strategy must be provided.")
+
+
+def break_links(root: Path, patterns: Iterable[str]) -> None:
+    """Replace the hardlinked files matching the patterns by independent copies.
+
+    This must be done before writing into files shared with another tree, writing into a
+    hardlink would modify the other tree as well.
+
+    Args:
+        root: the directory where the patterns are searched
+        patterns: glob patterns relative to ``root``
+    """
+    for pattern in patterns:
+        for path in root.glob(pattern):
+            if path.is_symlink() or not path.is_file() or path.stat().st_nlink < 2:
+                continue
+            tmp = path.with_name(f".{path.name}.copie")
+            shutil.copy2(path, tmp)
+            os.replace(tmp, path)
+
+
+@lru_cache(maxsize=65536)
+def _signature_digest(path: str, size: int, mtime_ns: int, inode: int) -> str:
+    """Return the sha256 of a file, the stat signature is only used as the key of the memo."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _file_digest(path: str, st: os.stat_result) -> str:
+    """Return the sha256 of a file, reusing the previous value if it didn't change.
+
+    The digests of the most recently hashed files are kept, so that a long session doesn't
+    accumulate the ones of every file it ever rendered.
+    """
+    return _signature_digest(path, st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+def tree_digest(root: Path) -> str:
+    """Compute a digest of a directory tree from its relative paths, modes and contents.
+
+    The ``.git`` folder is ignored, the commit is taken into account by :py:func:`resolve_ref`.
+
+    Args:
+        root: the directory to hash
+
+    Returns:
+        the hexadecimal digest of the tree
+    """
+    h = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d != ".git")
+        rel_dir = Path(dirpath).relative_to(root).as_posix()
+        h.update(f"d {rel_dir}\0".encode())
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            if os.path.islink(path):
+                content = os.readlink(path)
+            else:
+                content = _file_digest(path, st)
+            h.update(f"f {rel_dir}/{name} {st.st_mode & 0o111:o} {content}\0".encode())
+    return h.hexdigest()
+
+
+def _ignore_rules(directory: Path, rel_dir: str) -> List[Tuple[str, str, bool, bool]]:
+    """Return the rules of the ``.gitignore`` file of a directory, if any.
+
+    Each rule holds the directory of the file, the glob pattern, whether it re-includes the
+    matching paths (``!`` prefix) and whether it only matches directories (``/`` suffix).
+    """
+    try:
+        lines = (directory / ".gitignore").read_text().splitlines()
+    except (OSError, UnicodeDecodeError):
+        return []
+    rules = []
+    for line in lines:
+        if not (line := line.strip()) or line.startswith("#"):
+            continue
+        negated, line = line.startswith("!"), line.lstrip("!")
+        dir_only, line = line.endswith("/"), line.rstrip("/")
+        rules.append((rel_dir, line, negated, dir_only))
+    return rules
+
+
+def _is_ignored(relpath: str, is_dir: bool, rules: List[Tuple[str, str, bool, bool]]) -> bool:
+    """Whether a path is ignored by the ``.gitignore`` rules, the last matching rule wins.
+
+    A pattern with a slash is relative to the directory of its file, the others match the
+    name at any depth.
+    """
+    ignored = False
+    for rel_dir, pattern, negated, dir_only in rules:
+        if dir_only and not is_dir:
+            continue
+        if "/" in pattern:
+            matched = fnmatch.fnmatchcase(
+                posixpath.relpath(relpath, rel_dir or "."), pattern.lstrip("/")
+            )
+        else:
+            matched = fnmatch.fnmatchcase(posixpath.basename(relpath), pattern)
+        if matched:
+            ignored = not negated
+    return ignored
+
+
+def template_files(template_dir: Path) -> List[str]:
+    """Return the files of a template, leaving out the ones ignored by git.
+
+    The files are listed by ``git ls-files`` when the template is in a git work tree (tracked
+    and untracked ones, like copier renders ``HEAD``), otherwise the ``.gitignore`` files are
+    read (without the global excludes of git). The ``.git`` folder is always left out. The
+    virtualenvs, the caches or the build artifacts of the template repository are usually
+    ignored this way.
+
+    Args:
+        template_dir: the template directory
+
+    Returns:
+        the sorted posix paths of the files, relative to the template directory
+    """
+    process = subprocess.run(
+        ["git", "ls-files", "-z", "--cached", "--others", "--exclude-standard"],
+        cwd=template_dir,
+        capture_output=True,
+    )
+    relpaths = {os.fsdecode(p) for p in process.stdout.split(b"\0") if p}
+    if process.returncode == 0 and relpaths:
+        # the deleted files are still in the index and the submodules are directories
+        paths = ((p, template_dir / p) for p in relpaths)
+        return sorted(p for p, path in paths if path.is_symlink() or path.is_file())
+
+    files = []
+    rules: Dict[str, List[Tuple[str, str, bool, bool]]] = {}
+    for dirpath, dirnames, filenames in os.walk(template_dir):
+        rel_dir = Path(dirpath).relative_to(template_dir).as_posix()
+        rel_dir = "" if rel_dir == "." else rel_dir
+        inherited = rules[posixpath.dirname(rel_dir)] if rel_dir else []
+        rules[rel_dir] = [*inherited, *_ignore_rules(Path(dirpath), rel_dir)]
+        prefix = f"{rel_dir}/" if rel_dir else ""
+
+        # the links to directories are not followed, they are hashed like the files
+        links = [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]
+        dirnames[:] = [
+            d
+            for d in dirnames
+            if d != ".git"
+            and d not in links
+            and not _is_ignored(f"{prefix}{d}", True, rules[rel_dir])
+        ]
+        for name in [*filenames, *links]:
+            if not _is_ignored(f"{prefix}{name}", False, rules[rel_dir]):
+                files.append(f"{prefix}{name}")
+    return sorted(files)
+
+
+def template_digest(template_dir: Path) -> str:
+    """Compute a digest of the files of a template, see :py:func:`template_files`.
+
+    The whole template is hashed: the renders may include or import templates from outside the
+    ``_subdirectory`` and the tasks may run scripts living anywhere in the template.
+
+    Args:
+        template_dir: the template directory
+
+    Returns:
+        the hexadecimal digest of the template
+    """
+    h = hashlib.sha256()
+    for relpath in template_files(template_dir):
+        path = os.path.join(template_dir, relpath)
+        st = os.lstat(path)
+        if os.path.islink(path):
+            content = os.readlink(path)
+        else:
+            content = _file_digest(path, st)
+        h.update(f"f {relpath} {st.st_mode & 0o111:o} {content}\0".encode())
+    return h.hexdigest()
+
+
+def is_sha(ref: str) -> bool:
+    """Whether a git reference is a full commit sha."""
+    return len(ref) == 40 and all(c in "0123456789abcdef" for c in ref)
+
+
+def resolve_ref(template_dir: Path, vcs_ref: Optional[str]) -> str:
+    """Resolve a git reference of the template to a commit sha.
+
+    Args:
+        template_dir: the template directory
+        vcs_ref: the reference to resolve
+
+    Returns:
+        the commit sha, or the reference itself when the template is not in a git repository
+        (its root or any of its subdirectories) or the reference cannot be resolved
+    """
+    ref = vcs_ref or "HEAD"
+    if is_sha(ref):
+        return ref
+    process = subprocess.run(
+        ["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+        cwd=template_dir,
+        capture_output=True,
+        text=True,
+    )
+    return process.stdout.strip() or ref
+
+
+@dataclass
+class RenderCache:
+    """Store successful renders and reproduce them in new output directories."""
+
+    root: Path
+    "The directory where the renders are stored."
+
+    link_mode: str = "auto"
+    "How cached renders are materialized in the test directories, one of :py:data:`LINK_MODES`."
+
+    lock_timeout: float = 600.0
+    "Seconds after which a lock left by another process is considered stale."
+
+    def key(
+        self,
+        template_dir: Path,
+        answers: dict,
+        vcs_ref: Optional[str],
+        parent_dir: Optional[Path] = None,
+        tasks: bool = True,
+    ) -> str:
+        """Compute the key of a render.
+
+        The key covers the location and the rendered files of the template (see
+        :py:func:`template_digest`), the resolved commit, the answers, the parent project and the
+        versions of copier and Jinja, so that it stays valid across the sessions. The location is
+        recorded by copier in the answers file (``_src_path``), identical templates living in
+        different places don't share their renders.
+
+        Args:
+            template_dir: the template directory
+            answers: the answers provided by the user
+            vcs_ref: the requested reference of the template
+            parent_dir: the parent project the template is applied on, if any
+            tasks: whether the tasks of the template run after the render
+
+        Returns:
+            the hexadecimal key identifying the render
+        """
+        # copier only checks out the references of a repository root, the commits of an
+        # enclosing repository don't change the render
+        is_repo = (Path(template_dir) / ".git").exists()
+        payload = {
+            "src": [str(template_dir), str(Path(template_dir).resolve())],
+            "template": template_digest(template_dir),
+            "ref": resolve_ref(template_dir, vcs_ref) if is_repo else vcs_ref,
+            "versions": _versions(),
+            "answers": answers,
+            "parent": tree_digest(parent_dir) if parent_dir is not None else None,
+            "tasks": tasks,
+        }
+        data = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    def lookup(self, key: str) -> Optional[Tuple[dict, Path]]:
+        """Return a cached render without reproducing it.
+
+        Args:
+            key: the key of the render
+
+        Returns:
+            the answers of the render and the cached project (to be read only),
+            ``None`` if the render is not cached
+        """
+        entry = self.root / key
+        try:
+            answers = (entry / "answers.json").read_text()
+            os.utime(entry / "answers.json")  # the last use of the entry, for the LRU eviction
+        except FileNotFoundError:
+            return None
+        return json.loads(answers), entry / "project"
+
+    def fetch(self, key: str, dst: Path) -> Optional[Tuple[dict, str]]:
+        """Reproduce a cached render in ``dst``.
+
+        Args:
+            key: the key of the render
+            dst: the (empty) output directory
+
+        Returns:
+            the answers of the render and the strategy used to materialize it,
+            ``None`` if the render is not cached
+        """
+        if (cached := self.lookup(key)) is None:
+            return None
+        answers, project = cached
+        return answers, materialize(project, dst, _STRATEGIES[self.link_mode])
+
+    def store(self, key: str, src: Path, answers: dict) -> None:
+        """Add a render to the cache.
+
+        The entry is written aside and renamed in place so that a partially written entry is
+        never visible. The render is always stored as an independent copy so that tests
+        modifying their project cannot alter the cache.
+
+        Args:
+            key: the key of the render
+            src: the rendered project
+            answers: the answers of the render
+        """
+        entry = self.root / key
+        if entry.exists():
+            return
+        tmp = self.root / f".{key}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        materialize(src, tmp / "project", _STRATEGIES["auto"])
+        (tmp / "answers.json").write_text(json.dumps(answers, default=str))
+        try:
+            tmp.rename(entry)
+        except OSError:  # another process stored the same render in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def acquire(self, key: str) -> bool:
+        """Try to take the lock of a render without waiting.
+
+        The lock is a file created atomically in the cache directory, so it is shared by all the
+        processes using the same cache (e.g. the pytest-xdist workers).
+
+        Args:
+            key: the key of the render
+
+        Returns:
+            True if the lock was taken, False if it is already held
+        """
+        try:
+            fd = os.open(self.root / f".{key}.lock", os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        return True
+
+    def release(self, key: str) -> None:
+        """Release the lock of a render.
+
+        Args:
+            key: the key of the render
+        """
+        (self.root / f".{key}.lock").unlink(missing_ok=True)
+
+    def wait(self, key: str) -> None:
+        """Wait until the lock of a render is released.
+
+        Locks older than :py:attr:`lock_timeout` are removed as their owner most likely died.
+
+        Args:
+            key: the key of the render
+        """
+        lock = self.root / f".{key}.lock"
+        while True:
+            try:
+                age = time.time() - lock.stat().st_mtime
+            except FileNotFoundError:
+                return
+            if age > self.lock_timeout or not _owner_alive(lock):
+                lock.unlink(missing_ok=True)
+                return
+            time.sleep(0.05)
+
+    def clear(self) -> None:
+        """Remove all the renders of the cache."""
+        if self.root.is_dir():
+            _clear(self.root)
+
+    def evict(self, max_size: int) -> List[Path]:
+        """Remove the least recently used renders until the cache fits in max_size.
+
+        The renders being produced and the temporary entries of the live processes are kept,
+        the ones left by crashed processes are removed once older than :py:attr:`lock_timeout`.
+
+        Args:
+            max_size: the size of the cache in bytes
+
+        Returns:
+            the removed renders
+        """
+        entries = []
+        for entry in self.root.iterdir():
+            if entry.name.endswith(".tmp"):
+                if time.time() - entry.stat().st_mtime > self.lock_timeout:
+                    shutil.rmtree(entry, ignore_errors=True)
+            elif (entry / "answers.json").is_file():
+                files = (p for p in entry.rglob("*") if p.is_symlink() or p.is_file())
+                size = sum(p.lstat().st_size for p in files)
+                entries.append(((entry / "answers.json").stat().st_mtime, size, entry))
+
+        entries.sort(reverse=True)
+        removed, total = [], 0
+        for _, size, entry in entries:
+            total += size
+            if total > max_size and not (self.root / f".{entry.name}.lock").exists():
+                # the entry disappears atomically for the processes looking it up
+                trash = self.root / f".{entry.name}.{os.getpid()}.tmp"
+                try:
+                    entry.rename(trash)
+                except OSError:  # evicted by another process in the meantime
+                    continue
+                shutil.rmtree(trash, ignore_errors=True)
+                removed.append(entry)
+        return removed
+
+
+def _owner_alive(lock: Path) -> bool:
+    """Whether the process holding a lock is still running on this machine.
+
+    The locks of the persistent cache may be left by the crashed runs, their owner is known
+    from the pid written in the file.
+    """
+    if os.name == "nt":  # os.kill would send a signal to the process
+        return True
+    try:
+        os.kill(int(lock.read_text()), 0)
+    except (ProcessLookupError, FileNotFoundError):
+        return False
+    except (PermissionError, ValueError):  # not ours, or the pid is being written
+        return True
+    return True
@@ -0,0 +1,72 @@
+"""Removal of the generated projects at the end of the tests."""
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from shutil import rmtree
+from typing import Callable, List, Optional
+
+CLEANUP_MODES = ("sync", "background", "trash")
+"The ways of removing the generated projects, see :py:class:`Cleaner`."
+
+
+@dataclass
+class Cleaner:
+    """Remove the directories created by the fixtures.
+
+    - ``sync`` removes them right away, in the teardown of the test.
+    - ``background`` hands them to a pool of threads and waits for it at the end of the session.
+    - ``trash`` renames them into a trash directory that is removed at the end of the session,
+      renaming is instant when the trash lives on the same filesystem.
+    """
+
+    mode: str = "sync"
+    "How the directories are removed, one of :py:data:`CLEANUP_MODES`."
+
+    trash_factory: Optional[Callable[[], Path]] = None
+    "Create the trash directory, called once on the first removal in ``trash`` mode."
+
+    workers: int = 4
+    "The number of deletion threads in ``background`` mode."
+
+    trash: Optional[Path] = None
+    "The trash directory, once created."
+
+    _count: int = 0
+    _pool: Optional[ThreadPoolExecutor] = None
+    _futures: List[Future] = field(default_factory=list)
+
+    def remove(self, path: Path):
+        """Remove a directory according to the cleanup mode.
+
+        Args:
+            path: the directory to remove
+        """
+        if self.mode == "background":
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="copie-cleanup")
+            self._futures.append(self._pool.submit(rmtree, path, ignore_errors=True))
+            return
+
+        if self.mode == "trash" and self.trash_factory is not None:
+            if self.trash is None:
+                self.trash = self.trash_factory()
+            self._count += 1
+            try:
+                os.rename(path, self.trash / f"{self._count:06d}-{path.name}")
+                return
+            except OSError:
+                pass  # another filesystem or a vanished directory, delete it in place
+
+        rmtree(path, ignore_errors=True)
+
+    def close(self):
+        """Wait for the pending deletions and empty the trash."""
+        if self._pool is not None:
+            wait(self._futures)
+            self._pool.shutdown()
+            self._pool, self._futures = None, []
+        if self.trash is not None:
+            rmtree(self.trash, ignore_errors=True)
+            self.trash = None
@@ -0,0 +1,149 @@
+"""Parsing of the copier configuration of the templates."""
+
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, ClassVar, Dict, List, Tuple
+
+import yaml
+
+
+class ConfigNotFoundError(FileNotFoundError):
+    """Raised when a template has no copier.yaml file."""
+
+
+class _IncludeLoader(yaml.SafeLoader):
+    """SafeLoader resolving the copier ``!include`` directive relative to the template.
+
+    The constructor is registered on this subclass only, the global ``yaml.SafeLoader`` is left
+    untouched.
+    """
+
+    template_dir: Path
+    "The template directory the included paths are relative to."
+
+    stack: Tuple[Path, ...] = ()
+    "The files being loaded, outermost first, to detect circular includes."
+
+    files: Dict[Path, int]
+    "The modification time of every file read so far."
+
+    includes: ClassVar[Dict[Tuple[Path, int], Tuple[Any, Dict[Path, int]]]] = {}
+    "The parsed included files and the files they read, shared by the loaders, keyed on path and mtime."
+
+    def include(self, node: yaml.Node) -> Any:
+        """Load the file referenced by an ``!include`` node."""
+        fullpath = self.template_dir / str(node.value)
+
+        if not fullpath.is_file():
+            raise FileNotFoundError(f"The filename '{fullpath}' does not exist.")
+        if fullpath in self.stack:
+            chain = " -> ".join(str(p) for p in (*self.stack, fullpath))
+            raise ValueError(f"Circular !include detected: {chain}")
+
+        self.files[fullpath] = (mtime := os.stat(fullpath).st_mtime_ns)
+        # the file may be unchanged while the files it includes changed
+        if (cached := self.includes.get((fullpath, mtime))) is not None and _is_stale(cached[1]):
+            del self.includes[fullpath, mtime]
+        if (fullpath, mtime) not in self.includes:
+            documents, files = _load(fullpath, self.template_dir, (*self.stack, fullpath))
+            self.includes[fullpath, mtime] = (documents[0] if documents else None, files)
+        data, files = self.includes[fullpath, mtime]
+        self.files.update(files)
+        return data
+
+
+_IncludeLoader.add_constructor("!include", _IncludeLoader.include)
+
+
+def _is_stale(files: Dict[Path, int]) -> bool:
+    """Whether one of the files changed since their modification time was recorded."""
+    try:
+        return any(os.stat(p).st_mtime_ns != m for p, m in files.items())
+    except FileNotFoundError:
+        return True
+
+
+def _load(path: Path, template_dir: Path, stack: Tuple[Path, ...]) -> Tuple[list, Dict[Path, int]]:
+    """Load all the documents of a yaml file with the include loader.
+
+    Returns:
+        the documents and the modification time of every file read, including ``path``
+    """
+    loader = _IncludeLoader(path.read_text())
+    loader.template_dir, loader.stack = template_dir, stack
+    loader.files = {path: os.stat(path).st_mtime_ns}
+    try:
+        documents = []
+        while loader.check_data():
+            documents.append(loader.get_data())
+    finally:
+        loader.dispose()
+    return documents, loader.files
+
+
+@dataclass
+class TemplateConfig:
+    """The parsed copier configuration of a template."""
+
+    path: Path
+    "The copier.yaml file."
+
+    documents: List[Any]
+    "The yaml documents of the file, with the includes resolved."
+
+    files: Dict[Path, int]
+    "The modification time of the template dir, the config file and all its includes."
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """The questions and settings of all the documents merged together."""
+        data: Dict[str, Any] = {}
+        for document in self.documents:
+            if isinstance(document, dict):
+                data.update(document)
+        return data
+
+    @property
+    def has_subdirectory(self) -> bool:
+        """Whether the template renders a subdirectory, as required by the plugin."""
+        return any(isinstance(d, dict) and "_subdirectory" in d for d in self.documents)
+
+    def is_stale(self) -> bool:
+        """Whether one of the files the config was read from changed since."""
+        return _is_stale(self.files)
+
+
+_configs: Dict[Path, TemplateConfig] = {}
+"The configurations already parsed in this process, keyed on the template directory."
+
+
+def load_template_config(template_dir: Path) -> TemplateConfig:
+    """Return the copier configuration of a template, parsing it only if it changed.
+
+    The template directory is part of the tracked files so that adding or removing a config
+    file invalidates the cached value.
+
+    Args:
+        template_dir: the template directory
+
+    Returns:
+        the parsed configuration
+
+    Raises:
+        ConfigNotFoundError: if there is no copier.yaml file in the template
+    """
+    cached = _configs.get(template_dir)
+    if cached is not None and not cached.is_stale():
+        return cached
+
+    mtime = os.stat(template_dir).st_mtime_ns
+    files = template_dir.glob("copier.*")
+    try:
+        copier_yaml = next(f for f in files if f.suffix in [".yaml", ".yml"])
+    except StopIteration:
+        raise ConfigNotFoundError("No copier.yaml configuration file found.")
+
+    documents, read = _load(copier_yaml, template_dir, (copier_yaml,))
+    _configs[template_dir] = TemplateConfig(copier_yaml, documents, {template_dir: mtime, **read})
+    return _configs[template_dir]
@@ -0,0 +1,70 @@
+"""The copier and Jinja classes used to render the templates.
+
+Copier takes a noticeable time to import and the plugin is loaded by every pytest session, this
+module is only imported by the plugin when a project is rendered.
+"""
+
+import hashlib
+from functools import cached_property, lru_cache
+from pathlib import Path
+from typing import Optional
+
+from copier._main import Worker, _operation  # noqa: F401
+from copier._tools import cast_to_bool  # noqa: F401
+from copier.errors import TaskError  # noqa: F401
+from jinja2 import FileSystemBytecodeCache
+
+from ._jinja import template_namespace
+
+
+class TemplateBytecodeCache(FileSystemBytecodeCache):
+    """A Jinja bytecode cache keyed on the template and its commit instead of the file path.
+
+    Copier renders the templates with a ``vcs_ref`` from temporary clones, so the paths of the
+    files change at each copy. The key only uses the identity of the template and the name of
+    the file: Jinja checks the checksum of the source before reusing the compiled code, so a
+    modified file is compiled again. The files are written aside and renamed in place, so the
+    cache can be shared by the pytest-xdist workers.
+    """
+
+    def __init__(self, directory: Path, namespace: str):
+        """Create the cache of a template.
+
+        Args:
+            directory: the directory of the compiled templates
+            namespace: the identity of the template, see :py:func:`template_namespace <pytest_copie._jinja.template_namespace>`
+        """
+        super().__init__(str(directory))
+        self.namespace = namespace
+
+    def get_cache_key(self, name: str, filename: Optional[str] = None) -> str:
+        """Return the key of a template file from its name in the template."""
+        return hashlib.sha1(f"{self.namespace}|{name}".encode()).hexdigest()
+
+
+class CachedWorker(Worker):
+    """A copier Worker compiling the templates through the Jinja bytecode cache of the session.
+
+    The directory of the cache is a class attribute (see :py:func:`cached_worker`) so that the
+    workers copied by copier with ``dataclasses.replace`` (e.g. to render the old version on
+    update) keep using it.
+    """
+
+    bytecode_dir = Path()
+
+    @cached_property
+    def jinja_env(self):
+        """Return the Jinja environment of copier, with the bytecode cache of the template."""
+        env = super().jinja_env
+        template = self.template
+        namespace = template_namespace(
+            template.url, template.commit_hash, template.envops, template.jinja_extensions
+        )
+        env.bytecode_cache = TemplateBytecodeCache(self.bytecode_dir, namespace)
+        return env
+
+
+@lru_cache(maxsize=None)
+def cached_worker(bytecode_dir: Path) -> type:
+    """Return the copier Worker class using the Jinja bytecode cache of a directory."""
+    return type("CachedWorker", (CachedWorker,), {"bytecode_dir": bytecode_dir})
@@ -0,0 +1,209 @@
+"""Static index of the variables and templates each file of a template depends on."""
+
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Set
+
+from jinja2 import Environment, TemplateSyntaxError, meta
+
+from ._config import load_template_config
+
+ALL = "*"
+"Marker of a file depending on every answer: it reads the whole answers or its deps are unknown."
+
+_ANY_ANSWER = {"_copier_answers", "_copier_conf", "_external_data"}
+"The copier variables exposing all the answers at once."
+
+
+@dataclass
+class TemplateIndex:
+    """Map every file of a template to the questions and template files it depends on.
+
+    The dependencies are found statically by scanning the Jinja variables of the file names and
+    of the templated contents, following the ``include``, ``import`` and ``extends`` tags. A
+    file whose dependencies cannot be determined depends on :py:data:`ALL`.
+    """
+
+    root: Path
+    "The template directory (or a checkout of it) that is indexed."
+
+    subdirectory: str
+    "The ``_subdirectory`` of the template, relative to root."
+
+    suffix: str
+    "The ``_templates_suffix`` of the template."
+
+    env: Environment
+    "A Jinja environment using the delimiters of the template, used for parsing only."
+
+    variables: Dict[str, FrozenSet[str]] = field(default_factory=dict)
+    "The variables used by each file, keyed on its posix path relative to root."
+
+    references: Dict[str, FrozenSet[str]] = field(default_factory=dict)
+    "The template files each file includes, imports or extends, transitively."
+
+    @classmethod
+    def build(cls, template_dir: Path, root: Optional[Path] = None) -> "TemplateIndex":
+        """Index the files of the ``_subdirectory`` of a template.
+
+        Args:
+            template_dir: the template directory, its copier.yaml is read
+            root: the directory to index if not template_dir, e.g. a checkout at another commit
+
+        Returns:
+            the index
+        """
+        data = load_template_config(template_dir).data
+        envops = data.get("_envops", {})
+        index = cls(
+            root=root or template_dir,
+            subdirectory=str(data.get("_subdirectory", "")),
+            suffix=str(data.get("_templates_suffix", ".jinja")),
+            env=Environment(**envops if isinstance(envops, dict) else {}),
+        )
+        for path in sorted((index.root / index.subdirectory).rglob("*")):
+            if path.is_file() and ".git" not in path.relative_to(index.root).parts:
+                index.add(path.relative_to(index.root).as_posix())
+        return index
+
+    def add(self, relpath: str, stack: FrozenSet[str] = frozenset()):
+        """Index a file and the templates it references.
+
+        Args:
+            relpath: the posix path of the file relative to root
+            stack: the files being indexed, to stop on circular references
+        """
+        if relpath in self.variables or relpath in stack:
+            return
+
+        # the file name is always rendered, the content only with the template suffix
+        variables = set(self._scan(relpath)) if self._is_templated(relpath) else set()
+        references: Set[str] = set()
+        if self._is_content_templated(relpath):
+            try:
+                ast = self.env.parse((self.root / relpath).read_text())
+                variables |= meta.find_undeclared_variables(ast)
+                for name in meta.find_referenced_templates(ast):
+                    if name is None or not (self.root / name).is_file():
+                        variables.add(ALL)
+                        continue
+                    self.add(name, stack | {relpath})
+                    references |= {name, *self.references.get(name, ())}
+                    variables |= self.variables.get(name, {ALL})
+            except (TemplateSyntaxError, UnicodeDecodeError):
+                variables.add(ALL)
+
+        if variables & _ANY_ANSWER:
+            variables.add(ALL)
+        self.variables[relpath] = frozenset(variables)
+        self.references[relpath] = frozenset(references)
+
+    def project_files(self) -> List[str]:
+        """Return the indexed files of the subdirectory, the ones rendered in the project."""
+        prefix = f"{self.subdirectory}/" if self.subdirectory else ""
+        return [relpath for relpath in self.variables if relpath.startswith(prefix)]
+
+    def covers(self, files: Iterable[str]) -> bool:
+        """Whether the effect of the given template files on the render is known.
+
+        The files of the subdirectory (deleted ones included) and the templates they reference
+        are known, any other file (a task script, a Jinja extension, a context hook...) may
+        change every rendered file.
+
+        Args:
+            files: the template files, posix paths relative to root
+
+        Returns:
+            True if every file is covered by the index
+        """
+        prefix = f"{self.subdirectory}/" if self.subdirectory else ""
+        return all(f.startswith(prefix) or f in self.variables for f in files)
+
+    def affected_by(self, questions: Iterable[str] = (), files: Iterable[str] = ()) -> Set[str]:
+        """Return the files of the subdirectory that change with the given questions or files.
+
+        Args:
+            questions: the questions whose answer changed, :py:data:`ALL` for all of them
+            files: the template files (posix paths relative to root) whose content changed
+
+        Returns:
+            the posix paths, relative to root, of the affected files of the subdirectory, all of
+            them if a file is not covered by the index (see :py:meth:`covers`)
+        """
+        questions, files = set(questions), set(files)
+        if not self.covers(files):
+            return set(self.project_files())
+        affected = set()
+        for relpath in self.project_files():
+            variables = self.variables[relpath]
+            if relpath in files or self.references[relpath] & files:
+                affected.add(relpath)
+            elif questions and (ALL in variables or ALL in questions or variables & questions):
+                affected.add(relpath)
+        return affected
+
+    def rendered_path(self, relpath: str) -> str:
+        """Return the path of a template file in the project, its templated parts unrendered.
+
+        Args:
+            relpath: the posix path of the file relative to root
+
+        Returns:
+            the posix path relative to the project, without subdirectory and template suffix
+        """
+        prefix = f"{self.subdirectory}/" if self.subdirectory else ""
+        path = relpath[len(prefix) :] if relpath.startswith(prefix) else relpath
+        if self.suffix and path.endswith(self.suffix):
+            path = path[: -len(self.suffix)]
+        return path
+
+    def question_paths(self) -> Dict[str, Set[str]]:
+        """Return the rendered paths using each question, in their name or their content."""
+        paths = defaultdict(set)
+        for relpath in self.project_files():
+            for variable in self.variables[relpath]:
+                paths[variable].add(self.rendered_path(relpath))
+        return dict(paths)
+
+    def file_paths(self) -> Dict[str, Set[str]]:
+        """Return the rendered paths using each template file, directly or through a reference."""
+        paths = defaultdict(set)
+        for relpath in self.project_files():
+            for source in (relpath, *self.references[relpath]):
+                paths[source].add(self.rendered_path(relpath))
+        return dict(paths)
+
+    def path_pattern(self, rendered_path: str) -> Optional[Pattern]:
+        """Return a regex matching the file name of a rendered path in the source of a test.
+
+        The templated parts of the name match any characters allowed in a file name, a fully
+        templated name can't be recognized and has no pattern (None).
+        """
+        delimiters = (
+            (self.env.variable_start_string, self.env.variable_end_string),
+            (self.env.block_start_string, self.env.block_end_string),
+        )
+        name = rendered_path.rsplit("/", 1)[-1]
+        splitter = "|".join(f"{re.escape(a)}.*?{re.escape(b)}" for a, b in delimiters)
+        parts = [re.escape(part) for part in re.split(splitter, name)]
+        if not any(parts):
+            return None
+        return re.compile(r"(?<![\w.-])" + r"[\w.-]*".join(parts) + r"(?![\w.-])")
+
+    def _is_templated(self, relpath: str) -> bool:
+        """Whether the path contains Jinja delimiters."""
+        start = self.env.variable_start_string, self.env.block_start_string
+        return any(s in relpath for s in start)
+
+    def _is_content_templated(self, relpath: str) -> bool:
+        """Whether the content of a file is rendered by copier."""
+        return not self.suffix or relpath.endswith(self.suffix)
+
+    def _scan(self, text: str) -> Set[str]:
+        """Return the variables used in a templated string, :py:data:`ALL` if it can't be parsed."""
+        try:
+            return set(meta.find_undeclared_variables(self.env.parse(text)))
+        except TemplateSyntaxError:
+            return {ALL}
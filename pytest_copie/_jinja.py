@@ -0,0 +1,36 @@
+"""Identity of the templates in the Jinja bytecode cache shared by the renders of a session.
+
+The cache itself lives in :py:mod:`pytest_copie._copier`, imported when a project is rendered.
+"""
+
+import hashlib
+import json
+from functools import lru_cache
+from importlib.metadata import version
+from typing import Any, Optional
+
+JINJA_CACHES = ("none", "session")
+"Where the compiled templates are kept: nowhere or in a directory shared by the session."
+
+
+@lru_cache(maxsize=None)
+def _versions() -> str:
+    """Return the versions of the packages generating the compiled code."""
+    return f"copier {version('copier')} jinja2 {version('jinja2')}"
+
+
+def template_namespace(url: str, commit: Optional[str], envops: Any, extensions: Any) -> str:
+    """Return the identity of a template in the bytecode cache.
+
+    Args:
+        url: the path or url of the template, stable across the temporary clones of copier
+        commit: the commit sha of the template, None if it is not a git repository
+        envops: the Jinja settings of the template
+        extensions: the Jinja extensions of the template
+
+    Returns:
+        the hexadecimal namespace of the compiled templates
+    """
+    payload = [url, commit, envops, extensions, _versions()]
+    data = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
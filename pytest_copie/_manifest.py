@@ -0,0 +1,137 @@
+"""Manifest of the files of a generated project."""
+
+import fnmatch
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Set
+
+from ._cache import _file_digest
+from ._snapshot import mismatches
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    """A file of a :py:class:`Manifest`, its hash is only computed when requested."""
+
+    path: Path
+    "The absolute path of the file."
+
+    size: int
+    "The size of the file in bytes."
+
+    mode: int
+    "The permission bits of the file."
+
+    stat: os.stat_result = field(repr=False, compare=False)
+    "The stat of the file when the manifest was built."
+
+    @property
+    def digest(self) -> str:
+        """The sha256 of the file, memoized as long as the file is unchanged."""
+        return _file_digest(str(self.path), self.stat)
+
+    def read_text(self, encoding: str = "utf-8") -> str:
+        """Return the decoded content of the file."""
+        return self.path.read_text(encoding)
+
+    def read_bytes(self) -> bytes:
+        """Return the content of the file."""
+        return self.path.read_bytes()
+
+
+class Manifest(Mapping[str, FileEntry]):
+    """The files of a project keyed on their posix relative path, without the ``.git`` folder.
+
+    The manifest is built with a single walk of the project and supports glob filters and set
+    operations on the paths:
+
+    .. code-block:: python
+
+        assert "README.rst" in result.files
+        python_files = result.files.glob("**/*.py")
+        added = updated.files - result.files
+    """
+
+    def __init__(self, entries: Dict[str, FileEntry], root: Path):
+        """Create a manifest from its entries.
+
+        Args:
+            entries: the files keyed on their posix relative path
+            root: the directory of the files
+        """
+        self._entries = entries
+        self.root = root
+
+    @classmethod
+    def scan(cls, root: Path) -> "Manifest":
+        """Build the manifest of a directory with one ``os.scandir`` walk.
+
+        Args:
+            root: the directory to list
+
+        Returns:
+            the manifest
+        """
+        entries: Dict[str, FileEntry] = {}
+        stack = [(str(root), "")]
+        while stack:
+            folder, prefix = stack.pop()
+            with os.scandir(folder) as it:
+                for item in it:
+                    if item.is_dir(follow_symlinks=False):
+                        if item.name != ".git":
+                            stack.append((item.path, f"{prefix}{item.name}/"))
+                    elif item.is_file():
+                        st = item.stat()
+                        path = Path(item.path)
+                        entries[f"{prefix}{item.name}"] = FileEntry(
+                            path, st.st_size, st.st_mode & 0o777, st
+                        )
+        return cls(dict(sorted(entries.items())), root)
+
+    def __getitem__(self, key: str) -> FileEntry:
+        """Return the entry of a file."""
+        return self._entries[key]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the relative paths of the files, in sorted order."""
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        """Return the number of files."""
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        """Return a string representation of the manifest."""
+        return f"<Manifest {len(self)} files>"
+
+    def __sub__(self, other: "Manifest") -> Set[str]:
+        """Return the paths of the files missing from the other manifest."""
+        return set(self._entries) - set(other)
+
+    def __and__(self, other: "Manifest") -> Set[str]:
+        """Return the paths of the files present in both manifests."""
+        return set(self._entries) & set(other)
+
+    def __or__(self, other: "Manifest") -> Set[str]:
+        """Return the paths of the files present in any of the manifests."""
+        return set(self._entries) | set(other)
+
+    def __xor__(self, other: "Manifest") -> Set[str]:
+        """Return the paths of the files present in only one of the manifests."""
+        return set(self._entries) ^ set(other)
+
+    def glob(self, pattern: str) -> "Manifest":
+        """Return the manifest of the files matching an fnmatch pattern of their relative path."""
+        entries = {k: v for k, v in self._entries.items() if fnmatch.fnmatch(k, pattern)}
+        return Manifest(entries, self.root)
+
+    def changed(self, other: "Manifest") -> List[str]:
+        """Return the files present in both manifests with a different content.
+
+        The sizes are compared first, only the files of the same size are hashed.
+        """
+        return mismatches(
+            {k: v.path for k, v in self._entries.items()}, {k: v.path for k, v in other.items()}
+        )
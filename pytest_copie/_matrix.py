@@ -0,0 +1,145 @@
+"""Generation of the answer matrices of the templates."""
+
+import itertools
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from ._config import load_template_config
+
+
+def matrix_questions(
+    template_dir: Path, names: Optional[Sequence[str]] = None
+) -> Dict[str, List[Any]]:
+    """Return the possible answers of the ``choices`` and ``bool`` questions of a template.
+
+    The default answer comes first. Templated choices can't be enumerated and are skipped.
+
+    Args:
+        template_dir: the template directory
+        names: the questions to use, all the choices and bool questions if None
+
+    Returns:
+        the possible answers of each question, in the order of copier.yaml
+    """
+    questions: Dict[str, List[Any]] = {}
+    for name, spec in load_template_config(template_dir).data.items():
+        if name.startswith("_") or not isinstance(spec, dict):
+            continue
+        if names is not None and name not in names:
+            continue
+
+        choices = spec.get("choices")
+        if isinstance(choices, dict):
+            values = list(choices.values())
+        elif isinstance(choices, list):
+            values = [c[1] if isinstance(c, (list, tuple)) else c for c in choices]
+        elif spec.get("type") == "bool":
+            values = [True, False]
+        else:
+            continue
+        if any(isinstance(v, str) and ("{{" in v or "{%" in v) for v in values):
+            continue
+
+        default = spec.get("default")
+        if default in values:
+            values.remove(default)
+            values.insert(0, default)
+        questions[name] = values
+
+    if names is not None and (missing := set(names) - set(questions)):
+        raise ValueError(f"No choices or bool question named {sorted(missing)} in the template.")
+    return questions
+
+
+def covering_array(values: List[List[Any]], strength: int) -> List[Tuple[int, ...]]:
+    """Return a small set of cases covering every combination of ``strength`` parameters.
+
+    The cases are built greedily: each new case starts from an uncovered combination and every
+    other parameter takes the value covering the most remaining combinations.
+
+    Args:
+        values: the possible values of each parameter
+        strength: the number of parameters whose combinations must all be covered
+
+    Returns:
+        the cases, as the index of the value of each parameter
+    """
+    size = len(values)
+    if strength >= size:
+        return list(itertools.product(*(range(len(v)) for v in values)))
+
+    # every combination to cover, as sorted ((parameter, value index), ...) tuples
+    uncovered: Set[Tuple[Tuple[int, int], ...]] = set()
+    for params in itertools.combinations(range(size), strength):
+        for indices in itertools.product(*(range(len(values[p])) for p in params)):
+            uncovered.add(tuple(zip(params, indices)))
+
+    cases = []
+    while uncovered:
+        case: Dict[int, int] = dict(min(uncovered))
+        for param in range(size):
+            if param in case:
+                continue
+            scores = [0] * len(values[param])
+            for combination in uncovered:
+                known = dict(combination)
+                if param in known and all(case.get(p) == i for p, i in combination if p != param):
+                    scores[known[param]] += 1
+            case[param] = scores.index(max(scores))
+
+        cases.append(tuple(case[p] for p in range(size)))
+        uncovered -= {
+            tuple(zip(params, (case[p] for p in params)))
+            for params in itertools.combinations(range(size), strength)
+        }
+
+    return cases
+
+
+def order_cases(cases: List[Tuple[int, ...]]) -> List[Tuple[int, ...]]:
+    """Order the cases so that consecutive ones differ by as few answers as possible.
+
+    The defaults (all zeros) come first if present, then the nearest case is picked each time.
+    """
+    remaining = sorted(set(cases))
+    ordered: List[Tuple[int, ...]] = []
+    current = remaining[0] if remaining else ()
+    while remaining:
+        current = min(remaining, key=lambda c: sum(a != b for a, b in zip(c, current)))
+        remaining.remove(current)
+        ordered.append(current)
+    return ordered
+
+
+def answer_matrix(
+    template_dir: Path,
+    coverage: Union[str, int] = "pairwise",
+    questions: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Return the answer sets exercising the ``choices`` and ``bool`` questions of a template.
+
+    Args:
+        template_dir: the template directory
+        coverage: "cartesian" for every combination, "pairwise" for every combination of two
+            answers or an integer N for every combination of N answers
+        questions: the questions to use, all the choices and bool questions if None
+
+    Returns:
+        the answer sets, ordered so that consecutive ones share most of their answers
+    """
+    choices = matrix_questions(template_dir, questions)
+    names, values = list(choices), list(choices.values())
+    if coverage == "cartesian":
+        strength = len(values)
+    elif coverage == "pairwise":
+        strength = 2
+    elif isinstance(coverage, int) and coverage > 0:
+        strength = coverage
+    else:
+        raise ValueError('coverage must be "cartesian", "pairwise" or a positive integer.')
+
+    # the cartesian product is already in lexicographic order
+    cases = covering_array(values, strength)
+    if strength < len(values):
+        cases = order_cases(cases)
+    return [{n: values[p][i] for p, (n, i) in enumerate(zip(names, case))} for case in cases]
@@ -0,0 +1,143 @@
+"""In-memory representation of a rendered project."""
+
+import fnmatch
+import os
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, Mapping, Union
+
+
+class MemoryTree(Mapping[str, bytes]):
+    """The files of a rendered project kept in memory.
+
+    The tree is a mapping of the posix relative paths of the files to their content. Paths can
+    also be accessed like on disk with the ``/`` operator:
+
+    .. code-block:: python
+
+        assert (result.tree / "README.rst").read_text().startswith("foobar")
+    """
+
+    def __init__(self, files: Dict[str, bytes], modes: Dict[str, int], root: Path):
+        """Create a tree from its files.
+
+        Args:
+            files: the content of the files, keyed on their posix relative path
+            modes: the permission bits of the files
+            root: the directory the tree is written to by :py:meth:`write_to` by default
+        """
+        self._files = files
+        self._modes = modes
+        self.root = root
+
+    @classmethod
+    def load(cls, src: Path, root: Path) -> "MemoryTree":
+        """Read a directory into memory.
+
+        Args:
+            src: the directory to read
+            root: the directory the tree is written to by default
+
+        Returns:
+            the tree
+        """
+        files, modes = {}, {}
+        for dirpath, _, filenames in os.walk(src):
+            for name in filenames:
+                path = Path(dirpath) / name
+                key = path.relative_to(src).as_posix()
+                files[key] = path.read_bytes()
+                modes[key] = path.stat().st_mode & 0o777
+        return cls(files, modes, root)
+
+    def __getitem__(self, key: str) -> bytes:
+        """Return the content of a file."""
+        return self._files[str(PurePosixPath(key))]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the relative paths of the files."""
+        return iter(self._files)
+
+    def __len__(self) -> int:
+        """Return the number of files."""
+        return len(self._files)
+
+    def __truediv__(self, key: Union[str, os.PathLike]) -> "MemoryPath":
+        """Return a path-like accessor to a file or folder of the tree."""
+        return MemoryPath(self, PurePosixPath(key))
+
+    def __repr__(self) -> str:
+        """Return a string representation of the tree."""
+        return f"<MemoryTree {len(self)} files>"
+
+    def glob(self, pattern: str) -> List[str]:
+        """Return the relative paths of the files matching a glob pattern."""
+        return sorted(f for f in self._files if fnmatch.fnmatch(f, pattern))
+
+    def write_to(self, dst: Union[Path, None] = None) -> Path:
+        """Write the tree on disk.
+
+        Args:
+            dst: the destination directory, :py:attr:`root` by default
+
+        Returns:
+            the destination directory
+        """
+        dst = dst or self.root
+        dst.mkdir(parents=True, exist_ok=True)
+        for key, content in self._files.items():
+            (path := dst / key).parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(content)
+            path.chmod(self._modes.get(key, 0o644))
+        return dst
+
+
+class MemoryPath:
+    """A path-like accessor to a file or a folder of a :py:class:`MemoryTree`."""
+
+    def __init__(self, tree: MemoryTree, path: PurePosixPath):
+        """Point to a path of the tree."""
+        self.tree = tree
+        self.path = path
+
+    @property
+    def name(self) -> str:
+        """The final component of the path."""
+        return self.path.name
+
+    def __truediv__(self, key: Union[str, os.PathLike]) -> "MemoryPath":
+        """Return the accessor of a child path."""
+        return MemoryPath(self.tree, self.path / key)
+
+    def __repr__(self) -> str:
+        """Return a string representation of the path."""
+        return f"<MemoryPath {self.path}>"
+
+    def is_file(self) -> bool:
+        """Whether the path is a file of the tree."""
+        return str(self.path) in self.tree
+
+    def is_dir(self) -> bool:
+        """Whether the path is a folder of the tree."""
+        prefix = "" if str(self.path) == "." else f"{self.path}/"
+        return any(key.startswith(prefix) for key in self.tree)
+
+    def exists(self) -> bool:
+        """Whether the path is a file or a folder of the tree."""
+        return self.is_file() or self.is_dir()
+
+    def iterdir(self) -> Iterator["MemoryPath"]:
+        """Iterate over the direct children of a folder."""
+        prefix = "" if str(self.path) == "." else f"{self.path}/"
+        children = {k[len(prefix) :].split("/")[0] for k in self.tree if k.startswith(prefix)}
+        return (self / child for child in sorted(children))
+
+    def read_bytes(self) -> bytes:
+        """Return the content of the file."""
+        try:
+            return self.tree[str(self.path)]
+        except KeyError:
+            raise FileNotFoundError(f"No such file in the rendered tree: '{self.path}'")
+
+    def read_text(self, encoding: str = "utf-8") -> str:
+        """Return the decoded content of the file."""
+        return self.read_bytes().decode(encoding)
@@ -0,0 +1,140 @@
+"""Comparison of the generated projects with golden trees stored next to the tests."""
+
+import difflib
+import fnmatch
+import hashlib
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Union
+
+from ._cache import _file_digest
+
+Content = Union[Path, bytes]
+"A file of a tree: its path on disk or its content in memory."
+
+
+def list_files(root: Path, ignore: Sequence[str] = ()) -> Dict[str, Path]:
+    """Return the files of a directory keyed on their posix relative path, without ``.git``.
+
+    Args:
+        root: the directory to list
+        ignore: fnmatch patterns of the relative paths to skip
+
+    Returns:
+        the path of each file
+    """
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != ".git"]
+        for name in filenames:
+            path = Path(dirpath) / name
+            files[path.relative_to(root).as_posix()] = path
+    return {k: v for k, v in files.items() if not any(fnmatch.fnmatch(k, p) for p in ignore)}
+
+
+def _size(content: Content) -> int:
+    """Return the size of a file without reading it."""
+    return content.stat().st_size if isinstance(content, Path) else len(content)
+
+
+def _digest(content: Content) -> str:
+    """Return the sha256 of a file, memoized for the files on disk."""
+    if isinstance(content, Path):
+        return _file_digest(str(content), content.stat())
+    return hashlib.sha256(content).hexdigest()
+
+
+def _read(content: Content) -> bytes:
+    """Return the content of a file."""
+    return content.read_bytes() if isinstance(content, Path) else content
+
+
+def mismatches(
+    actual: Mapping[str, Content], golden: Mapping[str, Content], workers: Optional[int] = None
+) -> List[str]:
+    """Return the files whose content differs between two trees present in both.
+
+    The sizes are compared first, the files of the same size are hashed concurrently and only
+    compared by digest.
+
+    Args:
+        actual: the files of the rendered project
+        golden: the files of the golden tree
+        workers: the number of hashing threads, as many as the CPUs if None
+
+    Returns:
+        the sorted relative paths of the files that differ
+    """
+    common = sorted(set(actual) & set(golden))
+    differ = {k for k in common if _size(actual[k]) != _size(golden[k])}
+    same_size = [k for k in common if k not in differ]
+    with ThreadPoolExecutor(workers) as pool:
+        actual_digests = pool.map(_digest, [actual[k] for k in same_size])
+        golden_digests = pool.map(_digest, [golden[k] for k in same_size])
+        differ.update(k for k, a, g in zip(same_size, actual_digests, golden_digests) if a != g)
+    return sorted(differ)
+
+
+def diff(relpath: str, actual: Content, golden: Content) -> str:
+    """Return the unified diff of a file, or a one-line note for binary files."""
+    try:
+        actual_lines = _read(actual).decode().splitlines(keepends=True)
+        golden_lines = _read(golden).decode().splitlines(keepends=True)
+    except UnicodeDecodeError:
+        return f"Binary file {relpath} differs\n"
+    lines = difflib.unified_diff(golden_lines, actual_lines, f"snapshot/{relpath}", relpath)
+    return "".join(line if line.endswith("\n") else f"{line}\n" for line in lines)
+
+
+@dataclass
+class Snapshots:
+    """The golden trees of the tests and how rendered projects are checked against them."""
+
+    root: Path
+    "The directory of the golden trees, one folder per snapshot name."
+
+    update: bool = False
+    "Rewrite the golden trees with the rendered projects instead of comparing them."
+
+    def check(self, files: Mapping[str, Content], name: str, ignore: Sequence[str] = ()):
+        """Compare the files of a rendered project with a golden tree, or rewrite it.
+
+        Args:
+            files: the files of the rendered project
+            name: the name of the golden tree
+            ignore: fnmatch patterns of the relative paths left out of the comparison
+
+        Raises:
+            AssertionError: if the trees differ, with the diff of each mismatching file
+        """
+        __tracebackhide__ = True
+        golden_dir = self.root / name
+        files = {k: v for k, v in files.items() if not any(fnmatch.fnmatch(k, p) for p in ignore)}
+        if self.update:
+            shutil.rmtree(golden_dir, ignore_errors=True)
+            for relpath, content in files.items():
+                (path := golden_dir / relpath).parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(_read(content))
+            return
+
+        if not golden_dir.is_dir():
+            raise AssertionError(
+                f"No snapshot {name!r} in {self.root}, run pytest with --copie-snapshot-update "
+                "to create it."
+            )
+        golden = list_files(golden_dir, ignore)
+        missing, extra = sorted(set(golden) - set(files)), sorted(set(files) - set(golden))
+        differ = mismatches(files, golden)
+        if not (missing or extra or differ):
+            return
+
+        report = [f"The project doesn't match the snapshot {name!r}:"]
+        report += [f"- missing: {relpath}" for relpath in missing]
+        report += [f"- unexpected: {relpath}" for relpath in extra]
+        report += [f"- changed: {relpath}" for relpath in differ]
+        report += ["", *(diff(relpath, files[relpath], golden[relpath]) for relpath in differ)]
+        report.append("Run pytest with --copie-snapshot-update to accept the changes.")
+        raise AssertionError("\n".join(report))
@@ -0,0 +1,226 @@
+"""Memoization of the copier tasks from their inputs to their effects on the project."""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ._cache import _file_digest
+
+TASK_CACHES = ("none", "session")
+"Where the effects of the tasks are kept: nowhere or in a directory shared by the session."
+
+Snapshot = Dict[str, Tuple[int, int, int]]
+"The size, modification time and mode of each entry of a project, keyed on its relative path."
+
+
+def snapshot(root: Path) -> Snapshot:
+    """Return the stat signature of every file and directory of a project, ``.git`` included.
+
+    The size and modification time of the directories are 0: they only change with their
+    content, which is tracked by the signature of the files.
+
+    Args:
+        root: the project directory
+
+    Returns:
+        the signature of each file and directory, keyed on its posix relative path
+    """
+    entries: Snapshot = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames:
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            relpath = Path(path).relative_to(root).as_posix()
+            entries[relpath] = (0, 0, st.st_mode) if stat.S_ISDIR(st.st_mode) else _signature(st)
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            entries[Path(path).relative_to(root).as_posix()] = _signature(os.lstat(path))
+    return entries
+
+
+def _signature(st: os.stat_result) -> Tuple[int, int, int]:
+    """Return the signature of a file in a :py:data:`Snapshot`."""
+    return (st.st_size, st.st_mtime_ns, st.st_mode)
+
+
+def _in_git_dir(relpath: str) -> bool:
+    """Whether a path of a project is in its ``.git`` folder."""
+    return relpath == ".git" or relpath.startswith(".git/")
+
+
+def _git_state(root: Path) -> Optional[str]:
+    """Return the content of the git index and the tree of HEAD of a project, None without git.
+
+    Unlike the files of the ``.git`` folder, they don't depend on the time of the commits or
+    on the stat data of the files (which are in the index).
+    """
+    if not (root / ".git").exists():
+        return None
+    index = subprocess.run(["git", "ls-files", "--stage", "-z"], cwd=root, capture_output=True)
+    head = subprocess.run(
+        ["git", "rev-parse", "--verify", "--quiet", "HEAD^{tree}"], cwd=root, capture_output=True
+    )
+    return hashlib.sha256(index.stdout + head.stdout).hexdigest()
+
+
+def state_digest(root: Path, entries: Snapshot) -> str:
+    """Return a digest of the paths, modes and contents of the files of a project.
+
+    The ``.git`` folder is left out, see :py:func:`_git_state`.
+    """
+    h = hashlib.sha256()
+    for relpath in sorted(entries):
+        if _in_git_dir(relpath):
+            continue
+        path = os.path.join(root, relpath)
+        if stat.S_ISDIR(mode := entries[relpath][2]):
+            content = "directory"
+        elif os.path.islink(path):
+            content = os.readlink(path)
+        else:
+            content = _file_digest(path, os.stat(path))
+        h.update(f"{relpath} {mode & 0o777:o} {content}\0".encode())
+    return h.hexdigest()
+
+
+@dataclass
+class TaskCache:
+    """Replay the effects of the tasks already executed with the same inputs.
+
+    The inputs of a task are its definition, the answers, the copier operation and the whole
+    content of the project before the task (a superset of the files it can read), with the
+    content of its git index and commit if any. The effects are the files and directories it
+    writes, changes or deletes in the project, ``.git`` included. The network,
+    the tools installed on the machine and the absolute path of the project are not inputs:
+    only memoize the tasks that don't depend on them.
+    """
+
+    root: Path
+    "The directory where the effects of the tasks are stored."
+
+    def key(
+        self, task: Any, answers: dict, operation: Any, project_dir: Path
+    ) -> Tuple[str, Snapshot]:
+        """Compute the key of a task and the snapshot of the project before it runs.
+
+        Args:
+            task: the copier task
+            answers: the answers of the render
+            operation: the copier operation running the task ("copy" or "update")
+            project_dir: the project directory
+
+        Returns:
+            the hexadecimal key of the task and the snapshot of the project
+        """
+        entries = snapshot(project_dir)
+        payload = {
+            "task": [task.cmd, task.extra_vars, task.condition, str(task.working_directory)],
+            "answers": answers,
+            "operation": operation,
+            "state": state_digest(project_dir, entries),
+            "git": _git_state(project_dir),
+        }
+        data = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(data.encode()).hexdigest(), entries
+
+    def replay(self, key: str, project_dir: Path) -> bool:
+        """Apply the recorded effects of a task to a project.
+
+        Args:
+            key: the key of the task
+            project_dir: the project directory
+
+        Returns:
+            False if the task was never recorded
+        """
+        entry = self.root / key
+        if not (entry / "effects.json").is_file():
+            return False
+        effects = json.loads((entry / "effects.json").read_text())
+        # the content of a deleted directory is deleted before it
+        for relpath in sorted(effects["deleted"], reverse=True):
+            if (path := project_dir / relpath).is_dir() and not path.is_symlink():
+                shutil.rmtree(path)
+            else:
+                path.unlink(missing_ok=True)
+        for relpath in effects["directories"]:
+            (project_dir / relpath).mkdir(parents=True, exist_ok=True)
+        for relpath in effects["written"]:
+            (dst := project_dir / relpath).parent.mkdir(parents=True, exist_ok=True)
+            if dst.is_dir() and not dst.is_symlink():
+                shutil.rmtree(dst)
+            elif dst.is_symlink() or dst.exists():
+                dst.unlink()
+            shutil.copy2(entry / "files" / relpath, dst, follow_symlinks=False)
+        return True
+
+    def record(self, key: str, project_dir: Path, before: Snapshot) -> None:
+        """Store the effects of a task, the difference between the project before and after it.
+
+        The entry is written aside and renamed in place so that a partially written entry is
+        never visible, like the render cache.
+
+        Args:
+            key: the key of the task
+            project_dir: the project directory, after the task
+            before: the snapshot of the project before the task
+        """
+        entry = self.root / key
+        if entry.exists():
+            return
+        after = snapshot(project_dir)
+        changed = sorted(f for f, signature in after.items() if before.get(f) != signature)
+        directories = [f for f in changed if stat.S_ISDIR(after[f][2])]
+        written = [f for f in changed if not stat.S_ISDIR(after[f][2])]
+        # a file replaced by a directory (or the opposite) is deleted first
+        deleted = sorted(
+            f
+            for f in before
+            if f not in after or stat.S_ISDIR(before[f][2]) != stat.S_ISDIR(after[f][2])
+        )
+
+        tmp = self.root / f".{key}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        for relpath in written:
+            (dst := tmp / "files" / relpath).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(project_dir / relpath, dst, follow_symlinks=False)
+        tmp.mkdir(parents=True, exist_ok=True)
+        effects = {"written": written, "directories": directories, "deleted": deleted}
+        (tmp / "effects.json").write_text(json.dumps(effects))
+        try:
+            tmp.rename(entry)
+        except OSError:  # another process recorded the same task in the meantime
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def run(
+        self,
+        task: Any,
+        execute: Callable[[List[Any]], None],
+        answers: dict,
+        operation: Any,
+        project_dir: Path,
+    ) -> bool:
+        """Replay a task from the cache or execute and record it.
+
+        Args:
+            task: the copier task
+            execute: the function executing a list of tasks in the project
+            answers: the answers of the render
+            operation: the copier operation running the task
+            project_dir: the project directory
+
+        Returns:
+            True if the task was replayed, False if it was executed
+        """
+        key, before = self.key(task, answers, operation, project_dir)
+        if self.replay(key, project_dir):
+            return True
+        execute([task])
+        self.record(key, project_dir, before)
+        return False
@@ -0,0 +1,148 @@
+"""Rendering of the projects on a RAM-backed filesystem, within a budget of bytes."""
+
+import hashlib
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+TMPFS_DEFAULT = "/dev/shm"
+"The RAM-backed filesystem used by ``--copie-tmpfs`` without a value."
+
+
+def _tree_size(root: Path) -> int:
+    """Return the bytes of the files of a directory, 0 if it doesn't exist."""
+    size = 0
+    stack = [str(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for item in it:
+                    if item.is_dir(follow_symlinks=False):
+                        stack.append(item.path)
+                    else:
+                        size += item.stat(follow_symlinks=False).st_size
+        except FileNotFoundError:
+            continue
+    return size
+
+
+@dataclass
+class Tmpfs:
+    """Place the output directories of the tests on a RAM-backed filesystem.
+
+    Each test directory on disk is mirrored by a folder on the tmpfs holding its projects. The
+    processes sharing the tmpfs (e.g. the pytest-xdist workers) work in their own folder and
+    publish the bytes they use in a file next to it: once the sum exceeds the budget, the next
+    projects are rendered on disk until some space is released.
+
+    The bytes of this process are kept in a counter: a project is only measured again when its
+    folder changed (a file added or removed at its top level) and released with its mirror.
+    """
+
+    root: Path
+    "The directory of the session on the tmpfs, shared by the processes."
+
+    budget: int
+    "The bytes the projects may use on the tmpfs."
+
+    usage: int = 0
+    "The bytes used by the projects of this process, as last measured."
+
+    projects: Dict[Path, Dict[str, Tuple[int, int]]] = field(default_factory=dict)
+    "The mtime of the folder and the bytes of each project, by name, in each reserved mirror."
+
+    @property
+    def folder(self) -> Path:
+        """The folder of the projects of this process."""
+        return self.root / str(os.getpid())
+
+    def mirror(self, test_dir: Path) -> Path:
+        """Return the folder on the tmpfs holding the projects of a test directory."""
+        digest = hashlib.sha1(str(test_dir).encode()).hexdigest()[:12]
+        return self.folder / f"{test_dir.name}-{digest}"
+
+    def used(self) -> int:
+        """Return the bytes used on the tmpfs by all the processes, publishing ours."""
+        for mirror, projects in self.projects.items():
+            self._measure(mirror, projects)
+        own = self.usage
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / f".usage-{os.getpid()}").write_text(str(own))
+        for usage in self.root.glob(".usage-*"):
+            if usage.name != f".usage-{os.getpid()}":
+                try:
+                    own += int(usage.read_text())
+                except (FileNotFoundError, ValueError):  # finished or being written
+                    pass
+        return own
+
+    def _measure(self, mirror: Path, projects: Dict[str, Tuple[int, int]]):
+        """Update the counter with the projects of a mirror added, changed or removed."""
+        seen = set()
+        try:
+            with os.scandir(mirror) as it:
+                for item in it:
+                    seen.add(item.name)
+                    st = item.stat(follow_symlinks=False)
+                    mtime, size = projects.get(item.name, (-1, 0))
+                    if mtime != st.st_mtime_ns:
+                        is_dir = item.is_dir(follow_symlinks=False)
+                        new_size = _tree_size(Path(item.path)) if is_dir else st.st_size
+                        projects[item.name] = (st.st_mtime_ns, new_size)
+                        self.usage += new_size - size
+        except FileNotFoundError:
+            pass
+        for name in set(projects) - seen:
+            self.usage -= projects.pop(name)[1]
+
+    def reserve(self, test_dir: Path) -> Optional[Path]:
+        """Return the tmpfs folder of a test directory, None if the budget is exceeded.
+
+        Args:
+            test_dir: the test directory on disk
+
+        Returns:
+            the folder where the next project of the test directory is rendered
+        """
+        if self.used() >= self.budget:
+            return None
+        (mirror := self.mirror(test_dir)).mkdir(parents=True, exist_ok=True)
+        self.projects.setdefault(mirror, {})
+        return mirror
+
+    def release(self, test_dir: Path) -> Path:
+        """Stop counting the projects of a test directory, before they are removed or moved.
+
+        Args:
+            test_dir: the test directory on disk
+
+        Returns:
+            the folder on the tmpfs holding the projects of the test directory
+        """
+        mirror = self.mirror(test_dir)
+        self.usage -= sum(size for _, size in self.projects.pop(mirror, {}).values())
+        return mirror
+
+    def evacuate(self, test_dir: Path):
+        """Move the projects of a test directory from the tmpfs to the disk, e.g. to keep them.
+
+        Args:
+            test_dir: the test directory on disk, receiving the projects
+        """
+        if not (mirror := self.release(test_dir)).is_dir():
+            return
+        test_dir.mkdir(parents=True, exist_ok=True)
+        for item in mirror.iterdir():
+            shutil.move(str(item), str(test_dir / item.name))
+        mirror.rmdir()
+
+    def close(self):
+        """Remove the folder of this process, and the session directory once empty."""
+        shutil.rmtree(self.folder, ignore_errors=True)
+        (self.root / f".usage-{os.getpid()}").unlink(missing_ok=True)
+        try:
+            self.root.rmdir()
+        except OSError:  # still used by another process
+            pass
@@ -0,0 +1,223 @@
+"""Git repositories of the templates: session checkouts and tagged histories."""
+
+import hashlib
+import json
+import os
+import subprocess
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from ._cache import is_sha, resolve_ref, template_digest, template_files
+
+
+def _run_git(*args: str, cwd: Optional[Path] = None) -> str:
+    """Run a git command and return its output."""
+    process = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True)
+    return process.stdout
+
+
+@dataclass
+class TemplateMirrors:
+    """Resolve the references of the templates once and keep a checkout of each commit.
+
+    Copier clones a git template every time a ``vcs_ref`` is used, the mirrors are cloned once
+    per session (with ``--shared`` so that the objects are not duplicated) and reused by every
+    copy or update pointing at the same commit.
+    """
+
+    root: Path
+    "The directory where the checkouts are created."
+
+    refs: Dict[Tuple[Path, str], str] = field(default_factory=dict)
+    "The commit sha of each (template, reference) pair resolved so far."
+
+    checkouts: Dict[Tuple[Path, str], Path] = field(default_factory=dict)
+    "The checkout of each (template, commit sha) pair."
+
+    def resolve(self, template_dir: Path, vcs_ref: Optional[str]) -> Optional[str]:
+        """Resolve a reference of a template to a commit sha, once per session.
+
+        ``HEAD`` is never resolved as copier also renders the uncommitted changes of the
+        template for this reference.
+
+        Args:
+            template_dir: the template directory
+            vcs_ref: the reference to resolve
+
+        Returns:
+            the commit sha, None if the template is not a git repository or if the reference
+            is "HEAD" or cannot be resolved
+        """
+        if vcs_ref in (None, "HEAD") or not (template_dir / ".git").exists():
+            return None
+        key = (template_dir.resolve(), str(vcs_ref))
+        if key not in self.refs:
+            sha = resolve_ref(template_dir, vcs_ref)
+            if not is_sha(sha):
+                return None
+            self.refs[key] = sha
+        return self.refs[key]
+
+    def checkout(self, template_dir: Path, sha: str) -> Path:
+        """Return a checkout of the template at the given commit, cloning it if needed.
+
+        Args:
+            template_dir: the template directory
+            sha: the commit to check out
+
+        Returns:
+            the path to the checkout
+        """
+        key = (template_dir.resolve(), sha)
+        if key not in self.checkouts:
+            name = hashlib.sha256(str(key[0]).encode()).hexdigest()[:12]
+            dst = self.root / f"{name}-{sha[:12]}"
+            if not dst.exists():
+                _run_git("clone", "--quiet", "--shared", "--no-checkout", str(key[0]), str(dst))
+                _run_git("checkout", "--quiet", "--detach", sha, cwd=dst)
+            self.checkouts[key] = dst
+        return self.checkouts[key]
+
+    def get(self, template_dir: Path, vcs_ref: Optional[str]) -> Optional[Tuple[str, Path]]:
+        """Return the commit and the checkout matching a reference of a template.
+
+        Args:
+            template_dir: the template directory
+            vcs_ref: the requested reference
+
+        Returns:
+            the commit sha and the checkout path, None if the reference cannot be mirrored
+        """
+        if (sha := self.resolve(template_dir, vcs_ref)) is None:
+            return None
+        return sha, self.checkout(template_dir, sha)
+
+
+def changed_files(template_dir: Path, old_sha: str, new_sha: Optional[str]) -> List[str]:
+    """Return the files of a template that differ between two commits.
+
+    Args:
+        template_dir: the template directory
+        old_sha: the commit the project was rendered from
+        new_sha: the commit the project is updated to, None for the working tree (uncommitted
+            and untracked files included, like copier does for ``HEAD``)
+
+    Returns:
+        the posix paths of the changed files, relative to the template directory
+    """
+    if new_sha is not None:
+        diff = _run_git("diff", "--name-only", "--relative", old_sha, new_sha, cwd=template_dir)
+        return diff.splitlines()
+    diff = _run_git("diff", "--name-only", "--relative", old_sha, cwd=template_dir)
+    untracked = _run_git("ls-files", "--others", "--exclude-standard", cwd=template_dir)
+    return [*diff.splitlines(), *untracked.splitlines()]
+
+
+def _fast_import_stream(template_dir: Path, versions: Dict[str, Dict[str, Any]]) -> bytes:
+    """Return the git fast-import stream of one commit and one annotated tag per version.
+
+    The first commit holds the files of template_dir that git would track (see
+    :py:func:`template_files <pytest_copie._cache.template_files>`), every version then applies
+    its changes on top of the previous one: a str or bytes value writes a file and None deletes
+    it.
+    """
+    identity = b"Pytest Copie <pytest@example.com>"
+    stream = []
+
+    def data(content: bytes):
+        stream.append(b"data %d\n%s\n" % (len(content), content))
+
+    def modify(path: str, content: bytes, mode: str = "100644"):
+        stream.append(f"M {mode} inline {path}\n".encode())
+        data(content)
+
+    for i, (ref, changes) in enumerate(versions.items()):
+        stream.append(b"commit refs/heads/main\nmark :%d\n" % (i + 1))
+        stream.append(b"committer %s %d +0000\n" % (identity, 1_000_000_000 + i))
+        data(ref.encode())
+        if i == 0:
+            for relpath in template_files(template_dir):
+                if (file := template_dir / relpath).is_symlink():
+                    modify(relpath, os.readlink(file).encode(), "120000")
+                else:
+                    executable = os.access(file, os.X_OK)
+                    modify(relpath, file.read_bytes(), "100755" if executable else "100644")
+        for changed, content in changes.items():
+            if content is None:
+                stream.append(f"D {changed}\n".encode())
+            else:
+                modify(changed, content.encode() if isinstance(content, str) else content)
+        stream.append(f"tag {ref}\nfrom :{i + 1}\n".encode())
+        stream.append(b"tagger %s %d +0000\n" % (identity, 1_000_000_000 + i))
+        data(ref.encode())
+
+    return b"".join(stream)
+
+
+def _spec_value(content: Union[str, bytes, None]) -> Optional[List[str]]:
+    """Return the JSON form of the content of a file in a version, tagged with its type.
+
+    The bytes are written as hex: without the type, b"a" and "61" would share a history.
+    """
+    if content is None:
+        return None
+    if isinstance(content, bytes):
+        return ["bytes", content.hex()]
+    return ["str", content]
+
+
+@dataclass
+class TemplateHistories:
+    """Build the tagged git histories of the templates once per session.
+
+    Each history is a bare repository created with a single ``git fast-import`` and shared by
+    the tests through cheap ``git clone --shared`` working copies.
+    """
+
+    root: Path
+    "The directory where the bare repositories are created."
+
+    repos: Dict[str, Path] = field(default_factory=dict)
+    "The bare repository of each (template content, versions) key."
+
+    def get(self, template_dir: Path, versions: Dict[str, Dict[str, Any]]) -> Path:
+        """Return the bare repository of a template history, building it if needed.
+
+        Args:
+            template_dir: the template providing the files of the first version
+            versions: the changes of each version, keyed on the tag name, in order
+
+        Returns:
+            the path to the bare repository
+        """
+        spec = json.dumps(
+            [
+                [r, {p: _spec_value(c) for p, c in changes.items()}]
+                for r, changes in versions.items()
+            ],
+            sort_keys=True,
+        )
+        key = hashlib.sha256(f"{template_digest(template_dir)}{spec}".encode()).hexdigest()[:16]
+        if key not in self.repos:
+            dst = self.root / f"{key}.git"
+            if not dst.exists():
+                _run_git("init", "--quiet", "--bare", "--initial-branch=main", str(dst))
+                stream = _fast_import_stream(template_dir, versions)
+                subprocess.run(["git", "fast-import", "--quiet"], cwd=dst, input=stream, check=True)
+            self.repos[key] = dst
+        return self.repos[key]
+
+    def clone(self, template_dir: Path, versions: Dict[str, Dict[str, Any]], dst: Path) -> Path:
+        """Check out a template history in a new working copy.
+
+        Args:
+            template_dir: the template providing the files of the first version
+            versions: the changes of each version, keyed on the tag name, in order
+            dst: the directory of the working copy, it must not exist
+
+        Returns:
+            the working copy, at the last version
+        """
+        _run_git("clone", "--quiet", "--shared", str(self.get(template_dir, versions)), str(dst))
+        return dst
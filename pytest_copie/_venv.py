@@ -0,0 +1,234 @@
+"""Virtual environments of the generated projects, built on cached bases of their dependencies."""
+
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:  # pragma: no cover
+    import tomli as tomllib
+
+VENV_CACHES = ("session", "persistent")
+"Where the base virtualenvs are kept: in the session temp dir or in the pytest cache directory."
+
+_DEFAULT_BUILD_REQUIRES = ["setuptools>=40.8.0"]
+"The build requirements assumed by pip for the projects without ``[build-system]``."
+
+_COMPLETE = ".copie-complete"
+"The file marking a complete base, its modification time is the last use of the base."
+
+
+def _pip_install(python: Path, args: List[str]):
+    """Run pip install with the interpreter of a virtualenv, raising its errors."""
+    pip = ["-m", "pip", "--disable-pip-version-check", "--no-input", "--quiet", "install"]
+    process = subprocess.run([str(python), *pip, *args], capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"pip install failed in {python.parent.parent}:\n{process.stderr}")
+
+
+def _bin_dir(path: Path) -> Path:
+    """Return the folder of the executables of a virtualenv."""
+    return path / ("Scripts" if os.name == "nt" else "bin")
+
+
+def _site_packages(path: Path) -> Path:
+    """Return the site-packages folder of a virtualenv created by this interpreter."""
+    if os.name == "nt":
+        return path / "Lib" / "site-packages"
+    return path / "lib" / f"python{sys.version_info[0]}.{sys.version_info[1]}" / "site-packages"
+
+
+@dataclass
+class Venv:
+    """A virtualenv of a generated project.
+
+    The dependencies are installed in a shared base virtualenv linked by a ``.pth`` file, only
+    the project itself is installed (in editable mode) in this virtualenv. The console scripts
+    of the dependencies live in the base, run them as modules of :py:attr:`python`.
+    """
+
+    path: Path
+    "The folder of the virtualenv."
+
+    base: Path
+    "The folder of the base virtualenv holding the dependencies."
+
+    @property
+    def python(self) -> Path:
+        """The Python interpreter of the virtualenv."""
+        return _bin_dir(self.path) / ("python.exe" if os.name == "nt" else "python")
+
+    @property
+    def env(self) -> Dict[str, str]:
+        """The environment variables activating the virtualenv, e.g. for :py:meth:`Result.run <pytest_copie.plugin.Result.run>`."""
+        path = [str(_bin_dir(self.path)), str(_bin_dir(self.base)), os.environ.get("PATH", "")]
+        return {"VIRTUAL_ENV": str(self.path), "PATH": os.pathsep.join(path)}
+
+
+def requirements(project_dir: Path, extras: Sequence[str] = ()) -> Dict[str, List[str]]:
+    """Read the dependencies declared by a project.
+
+    Args:
+        project_dir: the generated project
+        extras: the optional dependencies to include
+
+    Returns:
+        the ``dependencies`` (with the extras), the ``build`` requirements and the content of
+        the requirements*.txt ``files``
+    """
+    dependencies, build = [], []
+    if (pyproject := project_dir / "pyproject.toml").is_file():
+        data = tomllib.loads(pyproject.read_text())
+        project = data.get("project", {})
+        dependencies = list(project.get("dependencies", []))
+        optional = project.get("optional-dependencies", {})
+        for extra in extras:
+            dependencies += optional.get(extra, [])
+        build = data.get("build-system", {}).get("requires", _DEFAULT_BUILD_REQUIRES)
+    elif (project_dir / "setup.py").is_file():
+        build = _DEFAULT_BUILD_REQUIRES
+
+    files = sorted(p.name for p in project_dir.glob("requirements*.txt") if p.is_file())
+    return {
+        "dependencies": sorted(dependencies),
+        "build": sorted(build),
+        "files": [(project_dir / f).read_text() for f in files],
+    }
+
+
+@dataclass
+class VenvCache:
+    """Build the base virtualenvs once per set of dependencies and link the projects to them.
+
+    The bases are keyed on the dependencies declared by the project and on the interpreter, so
+    that the answer sets producing the same dependencies share their base. A lock file makes
+    the processes sharing the cache (e.g. the pytest-xdist workers) build each base only once.
+    """
+
+    root: Path
+    "The directory where the base virtualenvs are stored."
+
+    pip_args: Sequence[str] = ()
+    "Extra arguments of pip install, e.g. ``--no-index --find-links`` to a wheelhouse."
+
+    lock_timeout: float = 1800.0
+    "Seconds after which a lock left by another process is considered stale."
+
+    def key(self, reqs: Dict[str, List[str]]) -> str:
+        """Compute the key of the base virtualenv of a set of requirements."""
+        payload = {
+            "python": [sys.version, sys.executable],
+            "requirements": reqs,
+            "pip": list(self.pip_args),
+        }
+        data = json.dumps(payload, sort_keys=True)
+        return hashlib.sha256(data.encode()).hexdigest()[:32]
+
+    def base(self, reqs: Dict[str, List[str]]) -> Path:
+        """Return the base virtualenv of a set of requirements, building it if needed.
+
+        The base is built in place (virtualenvs can't be moved) while holding the lock.
+
+        Args:
+            reqs: the requirements read by :py:func:`requirements`
+
+        Returns:
+            the folder of the base virtualenv
+        """
+        base = self.root / self.key(reqs)
+        lock = self.root / f".{base.name}.lock"
+        while not (base / _COMPLETE).is_file():
+            try:
+                fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                self._wait(lock)
+                continue
+            os.close(fd)
+            try:
+                shutil.rmtree(base, ignore_errors=True)
+                self._build(base, reqs)
+                (base / _COMPLETE).touch()
+            finally:
+                lock.unlink(missing_ok=True)
+
+        os.utime(base / _COMPLETE)
+        return base
+
+    def venv(self, project_dir: Path, dst: Path, extras: Sequence[str] = ()) -> Venv:
+        """Create the virtualenv of a project on top of its base.
+
+        A virtualenv already linked to the right base is reused, the editable install follows
+        the changes of the project (e.g. after an update).
+
+        Args:
+            project_dir: the generated project
+            dst: the folder of the virtualenv
+            extras: the optional dependencies to install
+
+        Returns:
+            the virtualenv
+        """
+        reqs = requirements(project_dir, extras)
+        venv = Venv(path=dst, base=self.base(reqs))
+        link = _site_packages(dst) / "_copie_base.pth"
+        line = f"import site; site.addsitedir({str(_site_packages(venv.base))!r})\n"
+        if link.is_file() and link.read_text() == line:
+            return venv
+
+        shutil.rmtree(dst, ignore_errors=True)
+        subprocess.run([sys.executable, "-m", "venv", "--without-pip", str(dst)], check=True)
+        link.parent.mkdir(parents=True, exist_ok=True)
+        link.write_text(line)
+        if (project_dir / "pyproject.toml").is_file() or (project_dir / "setup.py").is_file():
+            # pip and the build backend are imported from the base
+            install = ["--no-deps", "--no-build-isolation", *self.pip_args, "-e", str(project_dir)]
+            _pip_install(venv.python, install)
+        return venv
+
+    def evict(self, max_entries: int) -> List[Path]:
+        """Remove the least recently used bases beyond max_entries.
+
+        Args:
+            max_entries: the number of bases to keep
+
+        Returns:
+            the removed bases
+        """
+        bases = [p for p in self.root.iterdir() if (p / _COMPLETE).is_file()]
+        bases.sort(key=lambda p: (p / _COMPLETE).stat().st_mtime, reverse=True)
+        removed = []
+        for base in bases[max_entries:]:
+            if not (self.root / f".{base.name}.lock").exists():
+                shutil.rmtree(base, ignore_errors=True)
+                removed.append(base)
+        return removed
+
+    def _build(self, base: Path, reqs: Dict[str, List[str]]):
+        """Create a base virtualenv and install the requirements in it."""
+        subprocess.run([sys.executable, "-m", "venv", str(base)], check=True, capture_output=True)
+        args = [*reqs["dependencies"], *reqs["build"]]
+        for i, content in enumerate(reqs["files"]):
+            (requirement := base / f"requirements-{i}.txt").write_text(content)
+            args += ["-r", str(requirement)]
+        if args:
+            _pip_install(Venv(path=base, base=base).python, [*self.pip_args, *args])
+
+    def _wait(self, lock: Path):
+        """Wait until a lock is released, removing it once stale."""
+        while True:
+            try:
+                age = time.time() - lock.stat().st_mtime
+            except FileNotFoundError:
+                return
+            if age > self.lock_timeout:
+                lock.unlink(missing_ok=True)
+                return
+            time.sleep(0.1)
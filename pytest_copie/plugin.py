@@ -1,16 +1,116 @@
 """A pytest plugin to build copier project from a template."""
 
+import hashlib
+import inspect
+import os
+import pickle
+import shlex
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass, field
+from functools import cached_property, lru_cache, partial
 from pathlib import Path
-from shutil import copy2, copytree, rmtree
-from typing import Callable, Generator, List, Optional, Union
+from shutil import rmtree
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Collection,
+    Dict,
+    Generator,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 
-import plumbum
-import plumbum.machines
 import pytest
-import yaml
 from _pytest.tmpdir import TempPathFactory
-from copier import run_copy, run_update
+
+from ._cache import (
+    LINK_MODES,
+    PARENT_MODES,
+    PARENT_STRATEGIES,
+    RENDER_CACHES,
+    RenderCache,
+    break_links,
+    is_sha,
+    materialize,
+    resolve_ref,
+)
+from ._cleanup import CLEANUP_MODES, Cleaner
+from ._jinja import JINJA_CACHES
+from ._manifest import Manifest
+from ._memory import MemoryTree
+from ._snapshot import Snapshots
+from ._tasks import TASK_CACHES, TaskCache
+from ._tmpfs import TMPFS_DEFAULT, Tmpfs
+from ._vcs import TemplateHistories, TemplateMirrors, changed_files
+from ._venv import VENV_CACHES, Venv, VenvCache
+
+# copier, plumbum, jinja2 and yaml are slow to import: they are only imported when used, the
+# plugin module is loaded by every pytest session
+if TYPE_CHECKING:
+    import plumbum.machines
+
+    from ._copier import Worker
+
+
+@dataclass
+class CommandResult:
+    """Holds the captured output of a command run in a generated project."""
+
+    command: List[str]
+    "The command and its arguments."
+
+    exit_code: Optional[int] = None
+    "The exit code of the command, None if it timed out."
+
+    stdout: str = ""
+    "The captured standard output."
+
+    stderr: str = ""
+    "The captured standard error."
+
+    duration: float = 0.0
+    "The wall-clock time of the command, in seconds."
+
+    timed_out: bool = False
+    "Whether the command was killed after the timeout."
+
+    def __repr__(self) -> str:
+        """Return a string representation of the command result."""
+        status = "timeout" if self.timed_out else self.exit_code
+        return f"<CommandResult {shlex.join(self.command)!r} {status} {self.duration:.2f}s>"
+
+
+def _run_command(
+    command: List[str], cwd: Path, timeout: Optional[float], env: Optional[Dict[str, str]]
+) -> CommandResult:
+    """Run a command and capture its output, a timeout is recorded instead of raised."""
+    start = time.perf_counter()
+    env = {**os.environ, **env} if env else None
+    try:
+        process = subprocess.run(
+            command, cwd=cwd, env=env, capture_output=True, text=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired as e:
+        # the output of an interrupted process is not decoded
+        stdout, stderr = (
+            o.decode(errors="replace") if isinstance(o, bytes) else o or ""
+            for o in (e.stdout, e.stderr)
+        )
+        duration = time.perf_counter() - start
+        return CommandResult(command, None, stdout, stderr, duration, timed_out=True)
+    duration = time.perf_counter() - start
+    return CommandResult(command, process.returncode, process.stdout, process.stderr, duration)
 
 
 @dataclass
@@ -29,21 +129,642 @@ class Result:
     answers: dict = field(default_factory=dict)
     "The answers used to generate the project."
 
+    materialization: Optional[str] = None
+    "How existing files were reproduced in the project (parent project or cached render): 'reflink', 'hardlink' or 'copy'."
+
+    tree: Optional[MemoryTree] = None
+    "The rendered files kept in memory when the project was copied with ``backend='memory'``."
+
+    timings: Dict[str, float] = field(default_factory=dict)
+    "The wall-clock time spent in each phase of the generation, in seconds (see :py:data:`PHASES <pytest_copie.plugin.PHASES>`)."
+
+    touched_files: Optional[List[str]] = None
+    "The files of the project written or removed by an incremental update, None for the other operations."
+
+    task_hits: int = 0
+    "The number of template tasks whose effects were replayed from the task cache."
+
+    task_misses: int = 0
+    "The number of template tasks executed and recorded in the task cache (0 if it is disabled)."
+
+    venv_cache: Optional[VenvCache] = field(default=None, repr=False, compare=False)
+    "The cache of the virtualenvs built by :py:meth:`venv`, set by the Copie instance creating the result."
+
+    snapshots: Optional[Snapshots] = field(default=None, repr=False, compare=False)
+    "The golden trees used by :py:meth:`assert_matches_snapshot`, set by the Copie instance creating the result."
+
+    deferred_tasks: Optional[Callable[[Path, bool], Tuple[Dict[str, float], Dict[str, int]]]] = (
+        field(default=None, repr=False, compare=False)
+    )
+    "Runs the template tasks skipped by a copy with ``run_tasks=False``, None once :py:meth:`run_tasks` was called."
+
     def __repr__(self) -> str:
         """Return a string representation of the result."""
-        return f"<Result {self.exception or self.project_dir}>"
+        return f"<Result {self.exception or self.project_dir or self.tree}>"
+
+    @cached_property
+    def files(self) -> Manifest:
+        """The manifest of the files of the project, built on first access.
+
+        It is rebuilt after :py:meth:`Copie.update <pytest_copie.plugin.Copie.update>` and
+        :py:meth:`run`, use ``del result.files`` after modifying the project in the test.
+        """
+        if self.project_dir is None:
+            raise ValueError("The result has no project_dir to list, materialize it first.")
+        return Manifest.scan(self.project_dir)
+
+    def materialize(self, dst: Optional[Path] = None) -> Path:
+        """Write a project rendered in memory on disk.
+
+        Args:
+            dst: the destination directory, the ``copieNNN`` directory reserved for the project by default
+
+        Returns:
+            the path to the project, also set as :py:attr:`project_dir`
+        """
+        if self.project_dir is not None:
+            return self.project_dir
+        if self.tree is None:
+            raise ValueError("The result has no rendered tree to materialize.")
+        self.project_dir = self.tree.write_to(dst)
+        return self.project_dir
+
+    def run(
+        self,
+        commands: Sequence[Union[str, Sequence[str]]],
+        parallel: Optional[int] = None,
+        timeout: Optional[float] = None,
+        env: Optional[Dict[str, str]] = None,
+    ) -> List[CommandResult]:
+        """Run independent commands in the project directory, concurrently.
+
+        Args:
+            commands: the commands to run, a string is split like a shell command line
+            parallel: the number of commands running at the same time, all of them if None
+            timeout: the time in seconds after which a command is killed
+            env: extra environment variables of the commands
+
+        Returns:
+            the captured result of each command, in the order of commands
+        """
+        if self.project_dir is None:
+            raise ValueError("The result has no project_dir to run in, materialize it first.")
+        args = [shlex.split(c) if isinstance(c, str) else list(c) for c in commands]
+        if not args:
+            return []
+        with ThreadPoolExecutor(parallel or len(args), thread_name_prefix="copie-run") as pool:
+            futures = [pool.submit(_run_command, a, self.project_dir, timeout, env) for a in args]
+            results = [future.result() for future in futures]
+        self.__dict__.pop("files", None)  # the commands may have changed the project
+        return results
+
+    def run_tasks(self, parallel: bool = False) -> None:
+        """Run the template tasks skipped by a copy with ``run_tasks=False``.
+
+        The tasks see the same answers and render context as in a regular copy. With
+        ``parallel``, the consecutive tasks marked with ``independent: true`` in the
+        ``_tasks`` of copier.yaml run at the same time, the others wait for the previous ones.
+        With the task cache enabled, the tasks are replayed or executed one at a time.
+
+        Args:
+            parallel: run the independent tasks concurrently
+
+        Raises:
+            TaskError: if a task fails, like in copier
+        """
+        if self.project_dir is None:
+            raise ValueError("The result has no project_dir to run in, materialize it first.")
+        if self.deferred_tasks is None:
+            raise ValueError("The tasks already ran, copy the project with run_tasks=False.")
+        deferred_tasks, self.deferred_tasks = self.deferred_tasks, None
+        try:
+            timings, counts = deferred_tasks(self.project_dir, parallel)
+        finally:
+            self.__dict__.pop("files", None)  # the tasks may have changed the project
+        self.timings["tasks"] = self.timings.get("tasks", 0.0) + timings.get("tasks", 0.0)
+        self.task_hits += counts["hits"]
+        self.task_misses += counts["misses"]
+
+    def assert_matches_snapshot(
+        self, name: str, ignore: Sequence[str] = (".copier-answers.yml",)
+    ) -> None:
+        """Assert that the generated project is identical to a golden tree.
+
+        The golden trees live in the ``snapshots`` folder next to the test file. The file sizes
+        are compared first and the files of the same size by their hashes, computed in
+        parallel: only the mismatching files are read again to show their diff. With
+        ``--copie-snapshot-update`` the golden tree is rewritten instead.
+
+        Args:
+            name: the name of the golden tree
+            ignore: fnmatch patterns of the relative paths left out of the comparison, the
+                answers file by default as it holds the path of the template
+
+        Raises:
+            AssertionError: if the project differs from the golden tree
+        """
+        __tracebackhide__ = True
+        if self.snapshots is None:
+            raise ValueError("The result has no snapshots, create it with the copie fixtures.")
+        if self.project_dir is not None:
+            files = {relpath: entry.path for relpath, entry in self.files.items()}
+            self.snapshots.check(files, name, ignore)
+        elif self.tree is not None:
+            self.snapshots.check(self.tree, name, ignore)
+        else:
+            raise ValueError("The result has no project to compare, the generation failed.")
+
+    def venv(self, extras: Sequence[str] = ()) -> Venv:
+        """Return a virtualenv with the project installed in editable mode.
+
+        The dependencies declared in pyproject.toml and requirements*.txt are installed in a
+        base virtualenv shared by all the projects with the same dependencies and interpreter,
+        only the project is installed in its own virtualenv, next to the project directory.
+
+        Args:
+            extras: the optional dependencies of the project to install
+
+        Returns:
+            the virtualenv of the project
+        """
+        if self.project_dir is None:
+            raise ValueError("The result has no project_dir to install, materialize it first.")
+        if self.venv_cache is None:
+            raise ValueError("The result has no venv_cache, create it with the copie fixtures.")
+        dst = self.project_dir.with_name(f"{self.project_dir.name}.venv")
+        return self.venv_cache.venv(self.project_dir, dst, extras)
+
+    def git_snapshot(self, message: str = "Initial commit") -> str:
+        """Commit the whole project in git, creating the repository if needed.
+
+        This is the preparation required by :py:meth:`Copie.update <pytest_copie.plugin.Copie.update>`,
+        done with 2 git processes, without hooks, signing nor fsync.
+
+        Args:
+            message: the commit message
+
+        Returns:
+            the sha of the commit
+        """
+        if self.project_dir is None:
+            raise ValueError("The result has no project_dir to commit, materialize it first.")
+        return _git_snapshot(self.project_dir, message)
 
 
 _GIT_AUTHOR = "Pytest Copie"
 _GIT_EMAIL = "pytest@example.com"
 
-_git: plumbum.machines.LocalCommand = plumbum.cmd.git.with_env(
-    GIT_AUTHOR_NAME=_GIT_AUTHOR,
-    GIT_AUTHOR_EMAIL=_GIT_EMAIL,
-    GIT_COMMITTER_NAME=_GIT_AUTHOR,
-    GIT_COMMITTER_EMAIL=_GIT_EMAIL,
-)
-"""A handle to allow execution of git commands during tests."""
+
+@lru_cache(maxsize=None)
+def _git_command() -> "plumbum.machines.LocalCommand":
+    """Return a handle to allow execution of git commands during tests."""
+    from plumbum.cmd import git
+
+    return git.with_env(
+        GIT_AUTHOR_NAME=_GIT_AUTHOR,
+        GIT_AUTHOR_EMAIL=_GIT_EMAIL,
+        GIT_COMMITTER_NAME=_GIT_AUTHOR,
+        GIT_COMMITTER_EMAIL=_GIT_EMAIL,
+    )
+
+
+def __getattr__(name: str) -> Any:
+    """Create ``_git`` on first access, plumbum is only imported when git is used."""
+    if name == "_git":
+        return _git_command()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_GIT_FAST_CONFIG = {
+    "core.hooksPath": os.devnull,
+    "core.fsync": "none",
+    "commit.gpgSign": "false",
+    "gc.auto": "0",
+    "maintenance.auto": "false",
+}
+"The git settings of the snapshots: no hooks, no signing, no fsync and no background gc."
+
+
+def _git_snapshot(project_dir: Path, message: str) -> str:
+    """Commit all the files of a directory and return the sha of the commit.
+
+    A new repository is created by writing the few files of an empty ``.git`` directory,
+    saving the ``git init`` process, and the sha is read from the branch reference.
+    """
+    git_dir = project_dir / ".git"
+    if not git_dir.exists():
+        for folder in ("objects", "refs/heads", "refs/tags"):
+            (git_dir / folder).mkdir(parents=True)
+        (git_dir / "HEAD").write_text("ref: refs/heads/main\n")
+        filemode = "false" if os.name == "nt" else "true"
+        core = f"[core]\n\trepositoryformatversion = 0\n\tfilemode = {filemode}\n\tbare = false\n"
+        (git_dir / "config").write_text(core)
+
+    config = [arg for key, value in _GIT_FAST_CONFIG.items() for arg in ("-c", f"{key}={value}")]
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": _GIT_AUTHOR,
+        "GIT_AUTHOR_EMAIL": _GIT_EMAIL,
+        "GIT_COMMITTER_NAME": _GIT_AUTHOR,
+        "GIT_COMMITTER_EMAIL": _GIT_EMAIL,
+    }
+    commit = ["commit", "--quiet", "--no-verify", "--allow-empty", "-m", message]
+    for args in (["add", "--all"], commit):
+        subprocess.run(["git", *config, *args], cwd=project_dir, env=env, check=True)
+
+    # resolve HEAD from the files, with git as a fallback for packed or reftable references
+    head = (git_dir / "HEAD").read_text().strip()
+    ref = git_dir / head[len("ref: ") :] if head.startswith("ref: ") else None
+    if ref is not None and ref.is_file():
+        return ref.read_text().strip()
+    process = subprocess.run(
+        ["git", "rev-parse", "HEAD"], cwd=project_dir, capture_output=True, text=True, check=True
+    )
+    return process.stdout.strip()
+
+
+PHASES = ("config", "clone", "parent", "cache", "render", "tasks", "answers")
+"""The phases timed in :py:attr:`Result.timings <pytest_copie.plugin.Result.timings>`: parsing of copier.yaml, clone of the template, copy of the parent project, lookup of the render cache, rendering, tasks (and migrations) and extraction of the answers."""
+
+_TIMINGS_KEY = pytest.StashKey[List[Tuple[Optional[str], dict, Dict[str, float]]]]()
+"The test id, extra answers and timings of every copy and update of the session."
+
+_FAILED_KEY = pytest.StashKey[bool]()
+"Set on the tests whose setup or call failed, for ``--copie-keep-failed``."
+
+
+@contextmanager
+def _timed(timings: Dict[str, float], phase: str) -> Iterator[None]:
+    """Add the wall-clock time spent in the block to the timings of a phase."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+def _rendered_patterns(template_dir: Path) -> List[str]:
+    """Return glob patterns matching every path the template may render.
+
+    The rendered names of templated paths are unknown, a templated file name matches its whole
+    folder and a templated folder name matches the whole subtree of its parent.
+
+    Args:
+        template_dir: the path to the template
+
+    Returns:
+        the glob patterns, relative to the project directory
+    """
+    from ._config import load_template_config
+
+    data = load_template_config(template_dir).data
+    subdirectory = str(data.get("_subdirectory", ""))
+    suffix = str(data.get("_templates_suffix", ".jinja"))
+    if "{{" in subdirectory or "{%" in subdirectory:
+        return ["**/*"]
+
+    patterns = set()
+    root = template_dir / subdirectory
+    for path in root.rglob("*"):
+        if path.is_dir():
+            continue
+        parts = path.relative_to(root).parts
+        if suffix and parts[-1].endswith(suffix):
+            parts = (*parts[:-1], parts[-1][: -len(suffix)])
+        for j, part in enumerate(parts):
+            if "{{" in part or "{%" in part:
+                wildcard = "*" if j == len(parts) - 1 else "**/*"
+                patterns.add("/".join([*parts[:j], wildcard]))
+                break
+        else:
+            patterns.add("/".join(parts))
+
+    return sorted(patterns)
+
+
+def _import_copier():
+    """Import copier in the worker processes before they receive their first render."""
+    from . import _copier  # noqa: F401
+
+
+def _worker(
+    mirror: Optional[Tuple[str, Path]] = None,
+    timings: Optional[Dict[str, float]] = None,
+    files: Optional[Collection[str]] = None,
+    bytecode_dir: Optional[Path] = None,
+    task_cache: Optional[TaskCache] = None,
+    task_counts: Optional[Dict[str, int]] = None,
+    **kwargs,
+) -> "Worker":
+    """Create a copier Worker, rendering from the session checkout of the template if any.
+
+    Args:
+        mirror: the commit sha and the checkout of the template to use instead of a fresh clone
+        timings: the timings where the execution of the tasks is recorded, if any
+        files: the only template files to render (posix paths relative to the template), all if None
+        bytecode_dir: the directory of the Jinja bytecode cache, compile every time if None
+        task_cache: the cache replaying the effects of the tasks, run them all if None
+        task_counts: the number of task cache "hits" and "misses", incremented by the tasks
+        kwargs: the parameters of the copier Worker
+
+    Returns:
+        the worker, to be used as a context manager
+    """
+    from ._copier import Worker, _operation, cached_worker
+
+    if mirror is not None:
+        kwargs["vcs_ref"] = mirror[0]
+    worker_class = cached_worker(bytecode_dir) if bytecode_dir is not None else Worker
+    worker = worker_class(unsafe=True, defaults=True, **kwargs)
+    if mirror is not None:
+        # copier >= 9.15 only removes the clones it made itself, the checkout is kept
+        worker.template.__dict__["local_abspath"] = mirror[1]
+
+    if timings is not None or task_cache is not None:
+        execute_tasks = worker._execute_tasks
+
+        def _execute_tasks(tasks):
+            with _timed(timings if timings is not None else {}, "tasks"):
+                if task_cache is None:
+                    execute_tasks(tasks)
+                    return
+
+                # each task is memoized on its own, from the state left by the previous ones
+                operation = _operation.get()
+                answers = {k: v for k, v in worker.answers.combined.items() if k[:1] != "_"}
+                for task in tasks:
+                    project_dir = Path(worker.dst_path)
+                    hit = task_cache.run(task, execute_tasks, answers, operation, project_dir)
+                    if task_counts is not None:
+                        task_counts["hits" if hit else "misses"] += 1
+
+        worker._execute_tasks = _execute_tasks
+
+    if files is not None:
+        render_file = worker._render_file
+
+        def _render_file(src_relpath, *args, **kwargs):
+            if Path(src_relpath).as_posix() in files:
+                render_file(src_relpath, *args, **kwargs)
+
+        worker._render_file = _render_file
+
+    return worker
+
+
+def _run(worker: "Worker", operation: Callable[[], None], timings: Dict[str, float]) -> dict:
+    """Run a copier operation and split its duration in phases.
+
+    Args:
+        worker: the worker, already entered
+        operation: the bound ``run_copy`` or ``run_update`` method of the worker
+        timings: the timings to complete with the clone, render, tasks and answers phases
+
+    Returns:
+        the public answers of the generated project
+    """
+    # the template is cloned lazily by copier, do it upfront to time it on its own
+    with _timed(timings, "clone"):
+        worker.template.local_abspath
+    with _timed(timings, "render"):
+        operation()
+    timings["render"] -= timings.get("tasks", 0.0)
+
+    # refresh answers with the generated ones and remove private stuff
+    with _timed(timings, "answers"):
+        answers = worker._answers_to_remember()
+        return {q: a for q, a in answers.items() if not q.startswith("_")}
+
+
+def _merge(project_dir: Path, old_dir: Path, new_dir: Path, answers_file: str) -> List[str]:
+    """Apply the difference between two renders of the same files to a project.
+
+    Like copier, the files the user did not modify are replaced, the modified ones are merged
+    with inline conflict markers and the files removed from the template are only deleted if
+    they were not modified. The answers file is always replaced.
+
+    Args:
+        project_dir: the project to update
+        old_dir: the render of the files with the previous template version and answers
+        new_dir: the render of the same files with the new template version and answers
+        answers_file: the posix path of the answers file, relative to the project
+
+    Returns:
+        the posix paths of the files written or removed, relative to the project
+    """
+    old_files = {p.relative_to(old_dir).as_posix() for p in old_dir.rglob("*") if p.is_file()}
+    new_files = {p.relative_to(new_dir).as_posix() for p in new_dir.rglob("*") if p.is_file()}
+
+    touched = []
+    for relpath in sorted(old_files | new_files):
+        old, new, current = old_dir / relpath, new_dir / relpath, project_dir / relpath
+        old_content = old.read_bytes() if relpath in old_files else None
+        new_content = new.read_bytes() if relpath in new_files else None
+        current_content = current.read_bytes() if current.is_file() else None
+        if new_content == current_content or (
+            new_content == old_content and relpath != answers_file
+        ):
+            continue
+
+        if new_content is None:
+            if current_content != old_content:
+                continue  # modified by the user, kept like copier does
+            current.unlink()
+        elif current_content in (None, old_content) or relpath == answers_file:
+            current.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy(new, current)
+        else:
+            if old_content is None:
+                old.parent.mkdir(parents=True, exist_ok=True)
+                old.touch()
+            labels = ["-L", "before updating", "-L", "last update", "-L", "after updating"]
+            merge = ["git", "merge-file", "-p", *labels, str(current), str(old), str(new)]
+            current.write_bytes(subprocess.run(merge, capture_output=True).stdout)
+        touched.append(relpath)
+
+    return touched
+
+
+def _render(
+    template_dir: Path,
+    output_dir: Path,
+    extra_answers: dict,
+    vcs_ref: Optional[str],
+    mirror: Optional[Tuple[str, Path]] = None,
+    bytecode_dir: Optional[Path] = None,
+    task_cache: Optional[TaskCache] = None,
+    run_tasks: bool = True,
+) -> Result:
+    """Render the template in output_dir and return the associated :py:class:`Result <pytest_copie.plugin.Result>` object.
+
+    The function lives at module level so that it can be executed in worker processes.
+
+    Args:
+        template_dir: the path to the template
+        output_dir: the directory where the project is rendered
+        extra_answers: extra answers to pass to copier and overwrite the default ones
+        vcs_ref: the commit hash, tag or branch to use from the template repo
+        mirror: the commit sha and the session checkout of the template matching vcs_ref
+        bytecode_dir: the directory of the Jinja bytecode cache, if any
+        task_cache: the cache replaying the effects of the tasks, if any
+        run_tasks: run the tasks of the template after rendering it
+
+    Returns:
+        the result of the copier project generation
+    """
+    timings: Dict[str, float] = {}
+    counts = {"hits": 0, "misses": 0}
+    try:
+        with _worker(
+            mirror,
+            timings,
+            bytecode_dir=bytecode_dir,
+            task_cache=task_cache,
+            task_counts=counts,
+            src_path=str(template_dir),
+            dst_path=output_dir,
+            user_defaults=extra_answers,
+            vcs_ref=vcs_ref or "HEAD",
+            skip_tasks=not run_tasks,
+        ) as worker:
+            answers = _run(worker, worker.run_copy, timings)
+
+        # refresh project_dir with the generated one
+        # the project path will be the first child of the ouptut_dir
+        project_dir = Path(worker.dst_path)
+
+        return Result(
+            project_dir=project_dir,
+            answers=answers,
+            timings=timings,
+            task_hits=counts["hits"],
+            task_misses=counts["misses"],
+        )
+
+    except SystemExit as e:
+        return Result(exception=e, exit_code=e.code, timings=timings)
+    except Exception as e:
+        # the exception must travel back from the worker processes
+        try:
+            pickle.dumps(e)
+        except Exception:
+            e = RuntimeError(f"{type(e).__name__}: {e}")
+        return Result(exception=e, exit_code=-1, timings=timings)
+
+
+def _task_groups(specs: List[Any], parallel: bool) -> List[List[int]]:
+    """Split the tasks of a template in groups run one after the other.
+
+    Args:
+        specs: the ``_tasks`` of copier.yaml
+        parallel: group the consecutive tasks marked with ``independent: true``
+
+    Returns:
+        the indices of the tasks of each group
+    """
+    groups: List[List[int]] = []
+    independent = False
+    for i, spec in enumerate(specs):
+        marked = parallel and isinstance(spec, dict) and spec.get("independent") is True
+        if marked and independent:
+            groups[-1].append(i)
+        else:
+            groups.append([i])
+        independent = marked
+    return groups
+
+
+def _execute_concurrently(worker: "Worker", tasks: List[Any]):
+    """Run copier tasks at the same time, each in its own process.
+
+    The commands are rendered like in copier, but started with an explicit working directory
+    and environment: copier changes the ones of the whole process, which is not thread safe.
+    """
+    from ._copier import TaskError, _operation, cast_to_bool
+
+    operation = _operation.get()
+    commands = []
+    for task in tasks:
+        context = {f"_{k}": v for k, v in task.extra_vars.items()}
+        context["_copier_operation"] = operation
+        if not cast_to_bool(worker._render_value(task.condition, context)):
+            continue
+        command: Union[str, List[str]]
+        if isinstance(task.cmd, str):
+            command, shell = worker._render_string(task.cmd, context), True
+        else:
+            command, shell = [worker._render_string(str(p), context) for p in task.cmd], False
+        cwd = Path(worker.subproject.local_abspath) / worker._render_string(
+            str(task.working_directory), context
+        )
+        env = {**os.environ, **{k[1:].upper(): str(v) for k, v in context.items()}}
+        commands.append(partial(subprocess.run, command, shell=shell, cwd=cwd, env=env))
+
+    with ThreadPoolExecutor(len(commands) or 1, thread_name_prefix="copie-task") as pool:
+        processes = list(pool.map(lambda run: run(), commands))
+    for process in processes:
+        if process.returncode:
+            raise TaskError.from_process(process)
+
+
+def _run_tasks(
+    template_dir: Path,
+    extra_answers: dict,
+    vcs_ref: Optional[str],
+    mirror: Optional[Tuple[str, Path]],
+    bytecode_dir: Optional[Path],
+    task_cache: Optional[TaskCache],
+    project_dir: Path,
+    parallel: bool,
+) -> Tuple[Dict[str, float], Dict[str, int]]:
+    """Run the tasks of a template in a project rendered without them.
+
+    The answers are computed again from the same inputs as the render, so that the tasks see
+    the same context as in a regular copy.
+
+    Args:
+        template_dir: the path to the template
+        extra_answers: the extra answers of the render
+        vcs_ref: the reference of the template used by the render
+        mirror: the commit sha and the session checkout of the template used by the render
+        bytecode_dir: the directory of the Jinja bytecode cache, if any
+        task_cache: the cache replaying the effects of the tasks, if any
+        project_dir: the rendered project
+        parallel: run the consecutive independent tasks concurrently
+
+    Returns:
+        the timings of the tasks and the number of task cache "hits" and "misses"
+    """
+    from ._copier import _operation
+
+    timings: Dict[str, float] = {}
+    counts = {"hits": 0, "misses": 0}
+    token = _operation.set("copy")
+    try:
+        with _worker(
+            mirror,
+            timings,
+            bytecode_dir=bytecode_dir,
+            task_cache=task_cache,
+            task_counts=counts,
+            src_path=str(template_dir),
+            dst_path=project_dir,
+            user_defaults=extra_answers,
+            vcs_ref=vcs_ref or "HEAD",
+        ) as worker:
+            worker._ask()
+            tasks = worker.template.tasks
+            specs = worker.template.config_data.get("tasks", [])
+            for group in _task_groups(specs, parallel and task_cache is None):
+                if len(group) > 1:
+                    with _timed(timings, "tasks"):
+                        _execute_concurrently(worker, [tasks[i] for i in group])
+                else:
+                    worker._execute_tasks([tasks[i] for i in group])
+    finally:
+        _operation.reset(token)
+
+    return timings, counts
 
 
 @dataclass
@@ -65,12 +786,68 @@ class Copie:
     counter: int = 0
     "A counter to keep track of the number of projects created."
 
-    def git(self) -> plumbum.machines.LocalCommand:
+    parent_materialization: str = "copy"
+    "How parent_result is reproduced in the output directories, one of 'copy', 'auto', 'reflink' or 'hardlink'."
+
+    render_cache: Optional[RenderCache] = None
+    "The cache used to reuse identical renders, disabled if None."
+
+    template_mirrors: Optional[TemplateMirrors] = None
+    "The session checkouts of the templates used for the copies and updates with a vcs_ref."
+
+    nodeid: Optional[str] = None
+    "The id of the test using the instance, reported in the summary of the slowest renders."
+
+    timings_log: Optional[List[Tuple[Optional[str], dict, Dict[str, float]]]] = None
+    "The list where the timings of every copy and update are recorded, disabled if None."
+
+    venv_cache: Optional[VenvCache] = None
+    "The cache of the virtualenvs handed to the results for :py:meth:`Result.venv <pytest_copie.plugin.Result.venv>`."
+
+    bytecode_dir: Optional[Path] = None
+    "The directory of the Jinja bytecode cache shared by the renders, disabled if None."
+
+    task_cache: Optional[TaskCache] = None
+    "The cache replaying the effects of the template tasks, disabled if None."
+
+    snapshots: Optional[Snapshots] = None
+    "The golden trees handed to the results for :py:meth:`Result.assert_matches_snapshot <pytest_copie.plugin.Result.assert_matches_snapshot>`."
+
+    tmpfs: Optional[Tmpfs] = None
+    "The RAM-backed filesystem where the projects are rendered while it has room, disabled if None."
+
+    scratch: Optional[Tmpfs] = None
+    "The RAM-backed filesystem rendering the projects of the memory backend when tmpfs is None."
+
+    def git(self) -> "plumbum.machines.LocalCommand":
         """A handle to allow execution of git commands during tests."""
-        return _git
+        return _git_command()
+
+    def git_snapshot(
+        self, results: List[Result], message: str = "Initial commit", workers: Optional[int] = None
+    ) -> List[str]:
+        """Commit the projects of several results in git, concurrently.
+
+        See :py:meth:`Result.git_snapshot <pytest_copie.plugin.Result.git_snapshot>`.
+
+        Args:
+            results: the results whose project is committed
+            message: the commit message
+            workers: the number of projects committed at the same time, as many as the CPUs if None
+
+        Returns:
+            the sha of the commit of each result
+        """
+        with ThreadPoolExecutor(workers) as pool:
+            return list(pool.map(lambda result: result.git_snapshot(message), results))
 
     def copy(
-        self, extra_answers: dict = {}, template_dir: Optional[Path] = None, vcs_ref: str = "HEAD"
+        self,
+        extra_answers: dict = {},
+        template_dir: Optional[Path] = None,
+        vcs_ref: str = "HEAD",
+        backend: str = "disk",
+        run_tasks: bool = True,
     ) -> Result:
         """Create a copier Project from the template and return the associated :py:class:`Result <pytest_copie.plugin.Result>` object.
 
@@ -78,82 +855,290 @@ class Copie:
             extra_answers: extra answers to pass to the Copie object and overwrite the default ones
             template_dir: the path to the template to use to create the project instead of the default ".".
             vcs_ref: the commit hash, tag or branch to use from the template repo, for the copy
+            backend: "disk" to keep the project in its ``copieNNN`` directory or "memory" to keep
+                the rendered files in :py:attr:`Result.tree <pytest_copie.plugin.Result.tree>` only,
+                copier renders them on the tmpfs (``/dev/shm`` if ``--copie-tmpfs`` is disabled)
+            run_tasks: run the tasks of the template, or defer them to
+                :py:meth:`Result.run_tasks <pytest_copie.plugin.Result.run_tasks>` if False
 
         Returns:
             the result of the copier project generation
         """
-        # Check for valid parent_result if provided
-        if self.parent_result is not None:
-            if self.parent_result.project_dir is None:
-                raise ValueError("parent_result.project_dir must be set.")
-            if not isinstance(self.parent_result.project_dir, Path):
-                raise ValueError("parent_result.project_dir must be a Path object.")
-            if not self.parent_result.project_dir.exists():
-                raise ValueError("parent_result.project_dir must exist.")
-            if not self.parent_result.exit_code == 0:
-                raise ValueError(
-                    "parent_result must have a successful exit code (0) to be used as a parent."
-                )
+        return self.copy_many(
+            [extra_answers],
+            template_dir=template_dir,
+            vcs_ref=vcs_ref,
+            backend=backend,
+            run_tasks=run_tasks,
+        )[0]
+
+    def copy_many(
+        self,
+        list_of_answers: List[dict],
+        template_dir: Optional[Path] = None,
+        vcs_ref: str = "HEAD",
+        workers: Optional[int] = None,
+        backend: str = "disk",
+        run_tasks: bool = True,
+    ) -> List[Result]:
+        """Create one copier Project per set of answers, rendering them concurrently.
+
+        Each project is rendered in its own ``copieNNN`` directory by a pool of worker processes.
 
-        # set the template dir and the associated copier.yaml file
-        template_dir = template_dir or self.default_template_dir
-        files = template_dir.glob("copier.*")
-        try:
-            copier_yaml = next(f for f in files if f.suffix in [".yaml", ".yml"])
-        except StopIteration:
-            raise FileNotFoundError("No copier.yaml configuration file found.")
+        Args:
+            list_of_answers: the extra answers of each project to create
+            template_dir: the path to the template to use to create the projects instead of the default ".".
+            vcs_ref: the commit hash, tag or branch to use from the template repo, for the copies
+            workers: the number of worker processes, the number of CPUs if None and no pool at all if 1
+            backend: "disk" to keep the projects in their ``copieNNN`` directory or "memory" to
+                keep the rendered files in :py:attr:`Result.tree <pytest_copie.plugin.Result.tree>` only,
+                copier renders them on the tmpfs (``/dev/shm`` if ``--copie-tmpfs`` is disabled)
+            run_tasks: run the tasks of the template, or defer them to
+                :py:meth:`Result.run_tasks <pytest_copie.plugin.Result.run_tasks>` if False
 
-        # create a new output_dir in the test dir based on the counter value
-        (output_dir := self.test_dir / f"copie{self.counter:03d}").mkdir()
-        self.counter += 1
+        Returns:
+            the results of the copier project generations, in the order of ``list_of_answers``
+        """
+        from ._config import ConfigNotFoundError, load_template_config
 
-        # Copy contents from parent_result.project_dir into output_dir
-        if self.parent_result:
-            if self.parent_result.project_dir is None:
-                raise ValueError("parent_result.project_dir must be set.")
-            else:
-                for item in self.parent_result.project_dir.iterdir():
-                    dest = output_dir / item.name
-                    copy_method = copytree if item.is_dir() else copy2
-                    copy_method(item, dest)
+        self._check_parent_result()
+        if backend not in ("disk", "memory"):
+            raise ValueError('backend must be either "disk" or "memory".')
 
+        # set the template dir and parse the associated copier.yaml file (once per template)
+        template_dir = template_dir or self.default_template_dir
+        error: Optional[Exception] = None
+        shared: Dict[str, float] = {}
         try:
-            # make sure the copiercopier project is using subdirectories
-            _add_yaml_include_constructor(template_dir)
-
-            all_params = yaml.safe_load_all(copier_yaml.read_text())
-            if not any("_subdirectory" in params for params in all_params):
+            # make sure the copier project is using subdirectories
+            with _timed(shared, "config"):
+                config = load_template_config(template_dir)
+            if not config.has_subdirectory:
                 raise ValueError(
                     "The plugin can only work for templates using subdirectories, "
                     '"_subdirectory" key is missing from copier.yaml'
                 )
+        except ConfigNotFoundError:
+            raise
+        except Exception as e:
+            error = e
+
+        # pin the reference to a commit checked out once per session
+        with _timed(shared, "clone"):
+            mirror = self._mirror(template_dir, vcs_ref)
+        if mirror is not None:
+            vcs_ref = mirror[0]
+
+        results: List[Optional[Result]] = [None] * len(list_of_answers)
+        jobs: Dict[int, Tuple[Path, dict, Optional[str]]] = {}
+        pending: Dict[int, Tuple[Path, dict, str]] = {}
+        strategies: Dict[int, Optional[str]] = {}
+        timings = [dict(shared) for _ in list_of_answers]
+        locked: List[str] = []
+        try:
+            for i, extra_answers in enumerate(list_of_answers):
+                output_dir = self._new_output_dir(backend)
+                if error is not None:
+                    results[i] = Result(exception=error, exit_code=-1)
+                    continue
+
+                # reuse an identical render from the cache if any
+                cache_key = None
+                if self.render_cache is not None:
+                    parent_dir = self.parent_result.project_dir if self.parent_result else None
+                    with _timed(timings[i], "cache"):
+                        cache_key = self.render_cache.key(
+                            template_dir, extra_answers, vcs_ref, parent_dir, run_tasks
+                        )
+                        cached = self._from_cache(cache_key, output_dir, backend)
+                    if cached is not None:
+                        results[i] = cached
+                        continue
+
+                    # the same render is already in progress, here or in another xdist worker
+                    if not self.render_cache.acquire(cache_key):
+                        pending[i] = (output_dir, extra_answers, cache_key)
+                        continue
+                    locked.append(cache_key)
+
+                with _timed(timings[i], "parent"):
+                    strategies[i] = self._copy_parent(output_dir, template_dir)
+                jobs[i] = (output_dir, extra_answers, cache_key)
+
+            options = (vcs_ref, mirror, self.bytecode_dir, self.task_cache, run_tasks)
+            args = {i: (template_dir, d, a, *options) for i, (d, a, _) in jobs.items()}
+            if workers == 1 or len(jobs) <= 1:
+                rendered = {i: _render(*a) for i, a in args.items()}
+            else:
+                with ProcessPoolExecutor(workers, initializer=_import_copier) as pool:
+                    futures = {i: pool.submit(_render, *a) for i, a in args.items()}
+                    rendered = {i: f.result() for i, f in futures.items()}
+
+            for i, result in rendered.items():
+                cache_key = jobs[i][2]
+                if self.render_cache is not None and cache_key is not None:
+                    if result.exit_code == 0:
+                        self.render_cache.store(
+                            cache_key, cast(Path, result.project_dir), result.answers
+                        )
+                    self.render_cache.release(cache_key)
+                    locked.remove(cache_key)
+                result.materialization = strategies.get(i)
+                result.timings = {**timings[i], **result.timings}
+                results[i] = result
+
+        finally:
+            for cache_key in locked:
+                cast(RenderCache, self.render_cache).release(cache_key)
+
+        # wait for the renders owned by someone else, render them here if they failed
+        for i, (output_dir, extra_answers, cache_key) in pending.items():
+            render_cache = cast(RenderCache, self.render_cache)
+            with _timed(timings[i], "cache"):
+                render_cache.wait(cache_key)
+                cached = self._from_cache(cache_key, output_dir, backend)
+            if cached is not None:
+                results[i] = cached
+            else:
+                with _timed(timings[i], "parent"):
+                    strategy = self._copy_parent(output_dir, template_dir)
+                result = _render(
+                    template_dir,
+                    output_dir,
+                    extra_answers,
+                    vcs_ref,
+                    mirror,
+                    self.bytecode_dir,
+                    self.task_cache,
+                    run_tasks,
+                )
+                result.materialization = strategy
+                result.timings = {**timings[i], **result.timings}
+                results[i] = result
+
+        # move the rendered files in memory and drop them from the disk (or the tmpfs), the
+        # trees are materialized in the test directory
+        if backend == "memory":
+            for result in cast(List[Result], results):
+                if result.exit_code == 0 and result.tree is None and result.project_dir:
+                    root = self.test_dir / result.project_dir.name
+                    result.tree = MemoryTree.load(result.project_dir, root=root)
+                    rmtree(result.project_dir)
+                    result.project_dir = None
+
+        # the copies served by the cache or failing early only carry the timings measured here
+        for i, result in enumerate(cast(List[Result], results)):
+            if not result.timings:
+                result.timings = timings[i]
+            if not run_tasks and result.exit_code == 0:
+                result.deferred_tasks = partial(
+                    _run_tasks,
+                    template_dir,
+                    list_of_answers[i],
+                    vcs_ref,
+                    mirror,
+                    self.bytecode_dir,
+                    self.task_cache,
+                )
+        self._record(list_of_answers, cast(List[Result], results))
 
-            worker = run_copy(
-                src_path=str(template_dir),
-                dst_path=str(output_dir),
-                unsafe=True,
-                defaults=True,
-                user_defaults=extra_answers,
-                vcs_ref=vcs_ref or "HEAD",
-            )
+        return cast(List[Result], results)
 
-            # refresh project_dir with the generated one
-            # the project path will be the first child of the ouptut_dir
-            project_dir = Path(worker.dst_path)
+    def _record(self, list_of_answers: List[dict], results: List[Result]):
+        """Record the timings of the results for the summary of the slowest renders.
 
-            # refresh answers with the generated ones and remove private stuff
-            answers = worker._answers_to_remember()
-            answers = {q: a for q, a in answers.items() if not q.startswith("_")}
+        The results also receive the virtualenv cache and the snapshots of the instance.
+        """
+        for result in results:
+            result.venv_cache, result.snapshots = self.venv_cache, self.snapshots
+        if self.timings_log is not None:
+            for extra_answers, result in zip(list_of_answers, results):
+                self.timings_log.append((self.nodeid, extra_answers, result.timings))
 
-            return Result(project_dir=project_dir, answers=answers)
+    def _from_cache(self, key: str, output_dir: Path, backend: str) -> Optional[Result]:
+        """Return the result of a cached render, None if the render is not cached.
 
-        except SystemExit as e:
-            return Result(exception=e, exit_code=e.code)
-        except Exception as e:
-            return Result(exception=e, exit_code=-1)
+        With the memory backend the cached files are read directly, nothing is written.
+        """
+        render_cache = cast(RenderCache, self.render_cache)
+        if backend == "memory":
+            if (entry := render_cache.lookup(key)) is None:
+                return None
+            output_dir.rmdir()
+            root = self.test_dir / output_dir.name
+            return Result(answers=entry[0], tree=MemoryTree.load(entry[1], root=root))
+
+        if (cached := render_cache.fetch(key, output_dir)) is None:
+            return None
+        return Result(project_dir=output_dir, answers=cached[0], materialization=cached[1])
+
+    def _mirror(self, template_dir: Path, vcs_ref: Optional[str]) -> Optional[Tuple[str, Path]]:
+        """Return the commit and the session checkout of a template reference, if any."""
+        if self.template_mirrors is None:
+            return None
+        try:
+            return self.template_mirrors.get(template_dir, vcs_ref)
+        except subprocess.CalledProcessError:
+            # let copier clone the template and report the error if any
+            return None
+
+    def _copy_parent(self, output_dir: Path, template_dir: Path) -> Optional[str]:
+        """Reproduce parent_result.project_dir into output_dir.
+
+        When the files are hardlinked, the ones the template may render are copied back so that
+        copier never writes into a file shared with the parent project.
+
+        Args:
+            output_dir: the directory where the child project is rendered
+            template_dir: the child template
+
+        Returns:
+            the strategy used, None if there is no parent
+        """
+        if self.parent_result is None or self.parent_result.project_dir is None:
+            return None
+
+        strategies = PARENT_STRATEGIES[self.parent_materialization]
+        strategy = materialize(self.parent_result.project_dir, output_dir, strategies)
+        if strategy == "hardlink":
+            break_links(output_dir, _rendered_patterns(template_dir))
+
+        return strategy
+
+    def _check_parent_result(self):
+        """Check that parent_result, if provided, can be used as a parent."""
+        if self.parent_result is not None:
+            if self.parent_result.project_dir is None:
+                raise ValueError("parent_result.project_dir must be set.")
+            if not isinstance(self.parent_result.project_dir, Path):
+                raise ValueError("parent_result.project_dir must be a Path object.")
+            if not self.parent_result.project_dir.exists():
+                raise ValueError("parent_result.project_dir must exist.")
+            if not self.parent_result.exit_code == 0:
+                raise ValueError(
+                    "parent_result must have a successful exit code (0) to be used as a parent."
+                )
+
+    def _new_output_dir(self, backend: str = "disk") -> Path:
+        """Create a new output_dir in the test dir based on the counter value.
+
+        The output_dir is created in the mirror of the test dir on the tmpfs while its budget is
+        not exceeded, the scratch tmpfs is used for the memory backend when there is no tmpfs.
+        """
+        test_dir = self.test_dir
+        tmpfs = self.tmpfs or (self.scratch if backend == "memory" else None)
+        if tmpfs is not None and (mirror := tmpfs.reserve(self.test_dir)) is not None:
+            test_dir = mirror
+        (output_dir := test_dir / f"copie{self.counter:03d}").mkdir()
+        self.counter += 1
+        return output_dir
 
     def update(
-        self, result: Result, extra_answers: Optional[dict] = None, vcs_ref: str = "HEAD"
+        self,
+        result: Result,
+        extra_answers: Optional[dict] = None,
+        vcs_ref: str = "HEAD",
+        incremental: bool = False,
     ) -> Result:
         """Update a copier Project from the template and return the associated :py:class:`Result <pytest_copie.plugin.Result>` object, returns a new :py:class:`Result <pytest_copie.plugin.Result>`.
 
@@ -161,39 +1146,172 @@ class Copie:
             result: results obtained when the project was first created
             extra_answers: extra answers to pass to the Copie object and overwrite the default ones
             vcs_ref: the commit/tag to use for the update
+            incremental: only render the files depending on the template files changed between
+                the versions, falls back to a full copier update when the template has tasks,
+                migrations, a modified copier.yaml or a changed file the index doesn't cover
 
         Returns:
             the result of the copier project update
         """
+        from ._copier import Worker
+
         assert (
             result.project_dir is not None
         ) and result.project_dir.exists(), "To update, `result.project_dir` must exist"
+        result.__dict__.pop("files", None)  # the manifest of the project is outdated
 
+        timings: Dict[str, float] = {}
         try:
-            worker = run_update(
-                dst_path=str(result.project_dir),
-                unsafe=True,
-                defaults=True,
+            if incremental:
+                updated = self._update_incremental(
+                    result.project_dir, extra_answers or {}, vcs_ref, timings
+                )
+                if updated is not None:
+                    self._record([extra_answers or {}], [updated])
+                    return updated
+
+            # render the new version from the session checkout of the template if any
+            mirror = None
+            if vcs_ref != "HEAD":
+                with _timed(timings, "clone"):
+                    with Worker(dst_path=result.project_dir) as reader:
+                        template = reader.subproject.template
+                    if template is not None:
+                        mirror = self._mirror(Path(template.url), vcs_ref)
+
+            counts = {"hits": 0, "misses": 0}
+            with _worker(
+                mirror,
+                timings,
+                bytecode_dir=self.bytecode_dir,
+                task_cache=self.task_cache,
+                task_counts=counts,
+                dst_path=result.project_dir,
                 overwrite=True,
                 user_defaults=extra_answers if extra_answers is not None else {},
                 vcs_ref=vcs_ref,
+            ) as worker:
+                answers = _run(worker, worker.run_update, timings)
+
+            updated = Result(
+                project_dir=result.project_dir,
+                answers=answers,
+                timings=timings,
+                task_hits=counts["hits"],
+                task_misses=counts["misses"],
             )
 
-            # refresh answers with the generated ones and remove private stuff
-            answers = worker._answers_to_remember()
-            answers = {q: a for q, a in answers.items() if not q.startswith("_")}
-
-            return Result(project_dir=result.project_dir, answers=answers)
-
         except SystemExit as e:
-            return Result(exception=e, exit_code=e.code)
+            updated = Result(exception=e, exit_code=e.code, timings=timings)
         except Exception as e:
-            return Result(exception=e, exit_code=-1)
+            updated = Result(exception=e, exit_code=-1, timings=timings)
+
+        self._record([extra_answers or {}], [updated])
+        return updated
+
+    def _update_incremental(
+        self, project_dir: Path, extra_answers: dict, vcs_ref: str, timings: Dict[str, float]
+    ) -> Optional[Result]:
+        """Update a project by rendering only the files affected by the changes.
+
+        The old and new versions of the affected files are rendered in temporary directories
+        and merged into the project with :py:func:`_merge`.
+
+        Args:
+            project_dir: the project to update
+            extra_answers: the answers of the questions the project didn't answer yet
+            vcs_ref: the commit/tag to use for the update
+            timings: the timings of the update, completed in place
+
+        Returns:
+            the result of the update, None if it can't be done incrementally
+        """
+        from ._config import load_template_config
+        from ._copier import Worker, _operation
+        from ._index import TemplateIndex
+
+        with _timed(timings, "clone"):
+            with Worker(dst_path=project_dir) as reader:
+                last_answers = reader.subproject.last_answers
+                dirty = reader.subproject.is_dirty()
+
+            # the errors are reported by copier in the full update
+            src_path, old_ref = last_answers.get("_src_path"), last_answers.get("_commit")
+            if dirty or not src_path or not old_ref or not (Path(src_path) / ".git").exists():
+                return None
+            template_dir = Path(src_path)
+            old_mirror = self._mirror(template_dir, old_ref)
+            new_mirror = self._mirror(template_dir, vcs_ref)
+            if old_mirror is None or (vcs_ref != "HEAD" and new_mirror is None):
+                return None
+            new_root = new_mirror[1] if new_mirror is not None else template_dir
+
+        with _timed(timings, "config"):
+            config = load_template_config(new_root)
+            data = config.data
+            files = changed_files(template_dir, old_mirror[0], new_mirror and new_mirror[0])
+            config_files = {p.relative_to(new_root).as_posix() for p in config.files}
+            unsupported = ("_tasks", "_migrations", "_skip_if_exists", "_preserve_symlinks")
+            if config_files & set(files) or any(data.get(key) for key in unsupported):
+                return None
+
+            # like in copier, the previous answers take precedence over the extra ones and both
+            # versions are rendered with the same answers: only the answers file records them
+            old_answers = {q: a for q, a in last_answers.items() if not q.startswith("_")}
+            render_answers = {**extra_answers, **old_answers}
+            index = TemplateIndex.build(new_root)
+            if not index.covers(files):
+                return None
+
+            # the answers file is always rendered again as it records the template commit
+            subdirectory = f"{index.subdirectory}/" if index.subdirectory else ""
+            affected = index.affected_by({"_commit"}, files)
+            affected |= {f for f in files if f.startswith(subdirectory)}
+
+        token = _operation.set("update")
+        try:
+            with tempfile.TemporaryDirectory(prefix="copie-update-") as tmp_dir:
+                old_dir, new_dir = Path(tmp_dir) / "old", Path(tmp_dir) / "new"
+                with _timed(timings, "render"):
+                    with _worker(
+                        old_mirror,
+                        files=affected,
+                        bytecode_dir=self.bytecode_dir,
+                        src_path=str(template_dir),
+                        dst_path=old_dir,
+                        data=render_answers,
+                        vcs_ref=old_ref,
+                        quiet=True,
+                    ) as worker:
+                        worker.run_copy()
+                with _worker(
+                    new_mirror,
+                    timings,
+                    affected,
+                    self.bytecode_dir,
+                    src_path=str(template_dir),
+                    dst_path=new_dir,
+                    data=render_answers,
+                    vcs_ref=vcs_ref,
+                    quiet=True,
+                ) as worker:
+                    answers = _run(worker, worker.run_copy, timings)
+                with _timed(timings, "render"):
+                    answers_file = str(data.get("_answers_file", ".copier-answers.yml"))
+                    touched = _merge(project_dir, old_dir, new_dir, answers_file)
+        finally:
+            _operation.reset(token)
+
+        return Result(
+            project_dir=project_dir, answers=answers, timings=timings, touched_files=touched
+        )
 
 
 @pytest.fixture(scope="session")
 def _copier_config_file(tmp_path_factory) -> Path:
     """Return a temporary copier config file."""
+    import yaml
+
     # create a user from the tmp_path_factory fixture
     user_dir = tmp_path_factory.mktemp("user_dir")
 
@@ -208,11 +1326,254 @@ def _copier_config_file(tmp_path_factory) -> Path:
     return config_file
 
 
+def _shared_dir(request, tmp_path_factory: TempPathFactory, name: str) -> Path:
+    """Return a new directory of the session, shared by the pytest-xdist workers if any.
+
+    The workers share the directory in the common parent of their base temp dirs.
+
+    Args:
+        request: the pytest request object
+        tmp_path_factory: the temporary directory factory
+        name: the name of the directory
+
+    Returns:
+        the directory
+    """
+    if hasattr(request.config, "workerinput"):
+        (root := tmp_path_factory.getbasetemp().parent / name).mkdir(exist_ok=True)
+        return root
+    return tmp_path_factory.mktemp(name)
+
+
+@pytest.fixture(scope="session")
+def _copie_render_cache(request, tmp_path_factory) -> Optional[RenderCache]:
+    """Return the render cache shared by the session, in the pytest cache directory if persistent."""
+    if request.config.option.copie_cache == "none":
+        return None
+
+    if request.config.option.copie_cache == "persistent" and getattr(request.config, "cache", None):
+        root = request.config.cache.mkdir("copie-renders")
+    else:
+        root = _shared_dir(request, tmp_path_factory, "copie_cache")
+
+    return RenderCache(
+        root=root,
+        link_mode=request.config.option.copie_link_mode,
+    )
+
+
+@pytest.fixture(scope="session")
+def _copie_bytecode_dir(request, tmp_path_factory) -> Optional[Path]:
+    """Return the directory of the Jinja bytecode cache shared by the session, None if disabled."""
+    if request.config.option.copie_jinja_cache == "none":
+        return None
+    return _shared_dir(request, tmp_path_factory, "copie_jinja")
+
+
+@pytest.fixture(scope="session")
+def _copie_task_cache(request, tmp_path_factory) -> Optional[TaskCache]:
+    """Return the cache of the template tasks shared by the session, None if disabled."""
+    if request.config.option.copie_task_cache == "none":
+        return None
+    return TaskCache(root=_shared_dir(request, tmp_path_factory, "copie_tasks"))
+
+
+@pytest.fixture(scope="session")
+def _copie_template_mirrors(tmp_path_factory) -> TemplateMirrors:
+    """Return the session checkouts of the git templates."""
+    return TemplateMirrors(root=tmp_path_factory.mktemp("copie_mirrors"))
+
+
+@pytest.fixture(scope="session")
+def _copie_timings_log(request) -> Optional[List[Tuple[Optional[str], dict, Dict[str, float]]]]:
+    """Return the list collecting the timings of the renders, None if no summary is requested."""
+    if not request.config.option.copie_durations:
+        return None
+    return request.config.stash.setdefault(_TIMINGS_KEY, [])
+
+
+@pytest.fixture(scope="session")
+def _copie_template_histories(tmp_path_factory) -> TemplateHistories:
+    """Return the tagged histories of the templates built during the session."""
+    return TemplateHistories(root=tmp_path_factory.mktemp("copie_histories"))
+
+
+@pytest.fixture
+def copie_versioned_template(
+    request, tmp_path: Path, _copie_template_histories: TemplateHistories
+) -> Callable[..., Path]:
+    """Return a factory of template git repositories with a tagged history.
+
+    The history is built once per session from a declarative spec and each call returns a
+    cheap ``git clone --shared`` of it, at the last version:
+
+    .. code-block:: python
+
+        def test_update(copie, copie_versioned_template):
+            template = copie_versioned_template(
+                {"v1": {}, "v2": {"project/README.rst.jinja": "new content"}}
+            )
+            result = copie.copy(template_dir=template, vcs_ref="v1")
+
+    Args:
+        request: the pytest request object
+        tmp_path: the temporary directory
+        _copie_template_histories: the histories built during the session
+
+    Returns:
+        the factory, taking the changes of each version keyed on the tag name (a str or bytes
+        content writes a file, None deletes it) and optionally the template providing the
+        files of the first version, the ``--template`` one by default
+    """
+    clones: List[Path] = []
+
+    def _clone(versions: Dict[str, Dict[str, Union[str, bytes, None]]], template_dir=None) -> Path:
+        template_dir = Path(template_dir or request.config.option.template)
+        dst = tmp_path / f"copie_template_{len(clones):03d}"
+        clones.append(_copie_template_histories.clone(template_dir, versions, dst))
+        return dst
+
+    return _clone
+
+
+@pytest.fixture
+def copie_answers(request) -> dict:
+    """Return the answer set of a test parametrized with the ``copie_matrix`` marker."""
+    raise pytest.UsageError(
+        f"{request.node.nodeid} uses 'copie_answers' without the 'copie_matrix' marker."
+    )
+
+
+@pytest.fixture(scope="session")
+def _copie_tmpfs(request, tmp_path_factory) -> Generator:
+    """Yield the RAM-backed filesystem of the session, None if disabled or missing."""
+    option = request.config.option
+    if option.copie_tmpfs is None or not Path(option.copie_tmpfs).is_dir():
+        yield None
+        return
+
+    tmpfs = _session_tmpfs(request, tmp_path_factory, Path(option.copie_tmpfs))
+    yield tmpfs
+    tmpfs.close()
+
+
+@pytest.fixture(scope="session")
+def _copie_scratch(request, tmp_path_factory, _copie_tmpfs: Optional[Tmpfs]) -> Generator:
+    """Yield the RAM-backed filesystem rendering the projects of the memory backend.
+
+    Copier can only render into a directory, the projects kept in memory are rendered on the
+    default tmpfs when ``--copie-tmpfs`` is disabled. None if it is enabled or missing.
+    """
+    if _copie_tmpfs is not None or not Path(TMPFS_DEFAULT).is_dir():
+        yield None
+        return
+
+    tmpfs = _session_tmpfs(request, tmp_path_factory, Path(TMPFS_DEFAULT))
+    yield tmpfs
+    tmpfs.close()
+
+
+def _session_tmpfs(request, tmp_path_factory, path: Path) -> Tmpfs:
+    """Return the directory of the session on a tmpfs, within the budget of the options."""
+    # pytest-xdist workers share the directory, and the budget, of the session
+    basetemp = tmp_path_factory.getbasetemp()
+    if hasattr(request.config, "workerinput"):
+        basetemp = basetemp.parent
+    digest = hashlib.sha1(str(basetemp).encode()).hexdigest()[:12]
+    return Tmpfs(
+        root=path / f"copie-{digest}",
+        budget=request.config.option.copie_tmpfs_budget * 1024 * 1024,
+    )
+
+
+@pytest.fixture(scope="session")
+def _copie_venv_cache(request, tmp_path_factory) -> VenvCache:
+    """Return the cache of the base virtualenvs, in the pytest cache directory if persistent."""
+    option = request.config.option
+    if option.copie_venv_cache == "persistent" and getattr(request.config, "cache", None):
+        root = request.config.cache.mkdir("copie-venvs")
+    else:
+        root = _shared_dir(request, tmp_path_factory, "copie_venvs")
+
+    pip_args = []
+    if option.copie_wheelhouse is not None:
+        pip_args = ["--no-index", "--find-links", str(Path(option.copie_wheelhouse).resolve())]
+    return VenvCache(root=root, pip_args=pip_args)
+
+
+@pytest.fixture(scope="session")
+def _copie_cleaner(request, tmp_path_factory) -> Generator:
+    """Yield the cleaner of the generated projects, waiting for it at the end of the session."""
+    cleaner = Cleaner(
+        mode=request.config.option.copie_cleanup,
+        trash_factory=lambda: tmp_path_factory.mktemp("copie_trash"),
+    )
+    yield cleaner
+    cleaner.close()
+
+
+@pytest.fixture(scope="session")
+def _copie_factory(
+    _copier_config_file: Path,
+    _copie_render_cache: Optional[RenderCache],
+    _copie_template_mirrors: TemplateMirrors,
+    _copie_bytecode_dir: Optional[Path],
+    _copie_task_cache: Optional[TaskCache],
+    _copie_timings_log: Optional[List[Tuple[Optional[str], dict, Dict[str, float]]]],
+    _copie_venv_cache: VenvCache,
+    _copie_tmpfs: Optional[Tmpfs],
+    _copie_scratch: Optional[Tmpfs],
+) -> Callable[..., Copie]:
+    """Return a factory of :py:class:`Copie <pytest_copie.plugin.Copie>` using the session resources.
+
+    The factory takes the fields specific to each instance (template, test directory, parent
+    project...), the resources shared by the session are only wired here.
+
+    Args:
+        _copier_config_file: the temporary copier config file
+        _copie_render_cache: the render cache of the session, None if disabled
+        _copie_template_mirrors: the session checkouts of the git templates
+        _copie_bytecode_dir: the directory of the Jinja bytecode cache, None if disabled
+        _copie_task_cache: the cache of the template tasks, None if disabled
+        _copie_timings_log: the timings of the renders of the session, None if not collected
+        _copie_venv_cache: the cache of the base virtualenvs of the projects
+        _copie_tmpfs: the RAM-backed filesystem of the projects, None if disabled
+        _copie_scratch: the RAM-backed filesystem of the memory backend, None if not needed
+
+    Returns:
+        the factory
+    """
+    return partial(
+        Copie,
+        config_file=_copier_config_file,
+        render_cache=_copie_render_cache,
+        template_mirrors=_copie_template_mirrors,
+        bytecode_dir=_copie_bytecode_dir,
+        task_cache=_copie_task_cache,
+        timings_log=_copie_timings_log,
+        venv_cache=_copie_venv_cache,
+        tmpfs=_copie_tmpfs,
+        scratch=_copie_scratch,
+    )
+
+
+def _release(test_dir: Path, keep: bool, copie: Copie, cleaner: Cleaner):
+    """Remove the projects of a test directory, or move the ones kept on the tmpfs to disk."""
+    for tmpfs in (copie.tmpfs, copie.scratch):
+        if tmpfs is not None and keep:
+            tmpfs.evacuate(test_dir)
+        elif tmpfs is not None and (mirror := tmpfs.release(test_dir)).exists():
+            cleaner.remove(mirror)
+    if not keep:
+        cleaner.remove(test_dir)
+
+
 @pytest.fixture
 def copie(
     request: Union[pytest.FixtureRequest, None],
     tmp_path: Path,
-    _copier_config_file: Path,
+    _copie_factory: Callable[..., Copie],
+    _copie_cleaner: Cleaner,
     parent_tpl: Optional[Path] = None,
 ) -> Generator:
     """Yield an instance of the :py:class:`Copie <pytest_copie.plugin.Copie>` helper class.
@@ -222,7 +1583,8 @@ def copie(
     Args:
         request: the pytest request object (None when used outside of pytest)
         tmp_path: the temporary directory
-        _copier_config_file: the temporary copier config file
+        _copie_factory: the factory of the instances using the session resources
+        _copie_cleaner: the cleaner removing the projects at the end of the test
         parent_tpl: the path to the parent template directory,
             must be provided when used outside of pytest.
 
@@ -253,16 +1615,20 @@ def copie(
 
     # Create the primary Copie instance
     # which will be used to apply the first template
-    primary = Copie(
-        default_template_dir=parent_tpl,
-        test_dir=parent_dir,
-        config_file=_copier_config_file,
+    nodeid = request.node.nodeid if request is not None else None
+    snapshots = None
+    if request is not None:
+        update = request.config.option.copie_snapshot_update
+        snapshots = Snapshots(root=request.path.parent / "snapshots", update=update)
+    primary = _copie_factory(
+        default_template_dir=parent_tpl, test_dir=parent_dir, nodeid=nodeid, snapshots=snapshots
     )
 
     def _spawn_child(
         *,
         parent_result: Optional[Result] = None,
         child_tpl: Path,
+        materialization: str = "copy",
     ) -> "Copie":
         """
         Create a child Copie instance to apply a new template.
@@ -270,19 +1636,27 @@ def copie(
         Args:
             parent_result: the result of the parent Copie instance, if any
             child_tpl: the path to the child template directory
+            materialization: how the parent project is reproduced in the child output
+                directories: "copy", "auto" (reflink, then copy), "reflink" or "hardlink"
+                (only for tests and tasks that never modify the parent files in place)
 
         Returns:
             A new instance of the Copie class, ready to copy a new template.
         """
+        if materialization not in PARENT_MODES:
+            raise ValueError(f"materialization must be one of {PARENT_MODES}.")
+
         child_dir = tmp_path / f"copie_{len(created_dirs):03d}"
         child_dir.mkdir()
         created_dirs.append(child_dir)
 
-        return Copie(
+        return _copie_factory(
             default_template_dir=child_tpl,
             test_dir=child_dir,
-            config_file=_copier_config_file,
             parent_result=parent_result,
+            parent_materialization=materialization,
+            nodeid=nodeid,
+            snapshots=snapshots,
         )
 
     class CopieHandle:
@@ -304,17 +1678,21 @@ def copie(
     handle = CopieHandle(primary, _spawn_child)
     yield handle
 
-    # Common cleanup after tests
-    if request is not None and not request.config.option.keep_copied_projects:
+    # Common cleanup after tests, the projects kept on the tmpfs are moved to disk
+    if request is not None:
+        option = request.config.option
+        failed = option.copie_keep_failed and request.node.stash.get(_FAILED_KEY, False)
+        keep = option.keep_copied_projects or failed
         for d in reversed(created_dirs):
-            rmtree(d, ignore_errors=True)
+            _release(d, keep, primary, _copie_cleaner)
 
 
 @pytest.fixture(scope="session")
 def copie_session(
     request,
     tmp_path_factory: TempPathFactory,
-    _copier_config_file: Path,
+    _copie_factory: Callable[..., Copie],
+    _copie_cleaner: Cleaner,
 ) -> Generator:
     """Yield an instance of the :py:class:`Copie <pytest_copie.plugin.Copie>` helper class.
 
@@ -323,7 +1701,8 @@ def copie_session(
     Args:
         request: the pytest request object
         tmp_path_factory: the temporary directory
-        _copier_config_file: the temporary copier config file
+        _copie_factory: the factory of the instances using the session resources
+        _copie_cleaner: the cleaner removing the projects at the end of the session
 
     Returns:
         the object instance, ready to copy !
@@ -334,11 +1713,21 @@ def copie_session(
     # set up a test directory in the tmp folder
     test_dir = tmp_path_factory.mktemp("copie")
 
-    yield Copie(template_dir, test_dir, _copier_config_file)
+    snapshots = Snapshots(
+        root=request.config.rootpath / "snapshots",
+        update=request.config.option.copie_snapshot_update,
+    )
+    instance = _copie_factory(
+        default_template_dir=template_dir,
+        test_dir=test_dir,
+        nodeid="copie_session",
+        snapshots=snapshots,
+    )
+    yield instance
 
     # don't delete the files at the end of the test if requested
-    if not request.config.option.keep_copied_projects:
-        rmtree(test_dir, ignore_errors=True)
+    keep = request.config.option.keep_copied_projects
+    _release(test_dir, keep, instance, _copie_cleaner)
 
 
 def pytest_addoption(parser):
@@ -362,27 +1751,306 @@ def pytest_addoption(parser):
         help="Keep projects directories generated with 'copie.copie()'.",
     )
 
+    group.addoption(
+        "--copie-cleanup",
+        action="store",
+        default="sync",
+        choices=list(CLEANUP_MODES),
+        dest="copie_cleanup",
+        help="How the generated projects are removed: 'sync' (at the end of each test), "
+        "'background' (by a pool of threads) or 'trash' (moved aside and removed at the end of "
+        "the session).",
+    )
+
+    group.addoption(
+        "--copie-cache",
+        action="store",
+        default="none",
+        choices=list(RENDER_CACHES),
+        dest="copie_cache",
+        help="Reuse identical renders (same template, answers and vcs_ref) within the session or, "
+        "with 'persistent', across the runs from the pytest cache directory.",
+    )
+
+    group.addoption(
+        "--copie-cache-max-size",
+        action="store",
+        default=512,
+        dest="copie_cache_max_size",
+        help="The size in MB of the persistent render cache, the least recently used renders are "
+        "removed at the end of the session.",
+        metavar="MB",
+        type=int,
+    )
+
+    group.addoption(
+        "--copie-cache-clear",
+        action="store_true",
+        default=False,
+        dest="copie_cache_clear",
+        help="Remove the renders of the persistent render cache before the session.",
+    )
+
+    group.addoption(
+        "--copie-jinja-cache",
+        action="store",
+        default="none",
+        choices=list(JINJA_CACHES),
+        dest="copie_jinja_cache",
+        help="Compile the Jinja templates at every render ('none', default) or reuse the "
+        "compiled templates across the renders of the session ('session').",
+    )
+
+    group.addoption(
+        "--copie-task-cache",
+        action="store",
+        default="none",
+        choices=list(TASK_CACHES),
+        dest="copie_task_cache",
+        help="Replay the effects of the template tasks already executed with the same inputs "
+        "(task, answers and project content) within the session.",
+    )
+
+    group.addoption(
+        "--copie-link-mode",
+        action="store",
+        default="auto",
+        choices=list(LINK_MODES),
+        dest="copie_link_mode",
+        help="How cached renders are reproduced: 'auto' (reflink with a fallback to copy), "
+        "'hardlink' (only for tests that never modify the generated files) or 'copy'.",
+    )
+
+    group.addoption(
+        "--copie-venv-cache",
+        action="store",
+        default="session",
+        choices=list(VENV_CACHES),
+        dest="copie_venv_cache",
+        help="Where the base virtualenvs of Result.venv() are kept: 'session' (temporary) or "
+        "'persistent' (in the pytest cache directory, reused by the next runs).",
+    )
+
+    group.addoption(
+        "--copie-venv-max",
+        action="store",
+        default=8,
+        dest="copie_venv_max",
+        help="The number of base virtualenvs kept in the persistent cache, the least recently "
+        "used ones are removed at the end of the session.",
+        metavar="N",
+        type=int,
+    )
+
+    group.addoption(
+        "--copie-wheelhouse",
+        action="store",
+        default=None,
+        dest="copie_wheelhouse",
+        help="Install the dependencies of the virtualenvs from this folder of wheels only, "
+        "without any package index.",
+        metavar="DIR",
+        type=str,
+    )
+
+    group.addoption(
+        "--copie-snapshot-update",
+        action="store_true",
+        default=False,
+        dest="copie_snapshot_update",
+        help="Rewrite the golden trees of Result.assert_matches_snapshot() with the generated "
+        "projects instead of comparing them.",
+    )
+
+    group.addoption(
+        "--copie-affected-since",
+        action="store",
+        default=None,
+        dest="copie_affected_since",
+        help="Deselect the tests using the copie fixtures that can't be affected by the changes "
+        "of the template since the given git reference.",
+        metavar="REF",
+        type=str,
+    )
+
+    group.addoption(
+        "--copie-durations",
+        action="store",
+        default=0,
+        dest="copie_durations",
+        help="Show the N slowest copies and updates with the time spent in each phase.",
+        metavar="N",
+        type=int,
+    )
+
+    group.addoption(
+        "--copie-tmpfs",
+        action="store",
+        nargs="?",
+        const=TMPFS_DEFAULT,
+        default=None,
+        dest="copie_tmpfs",
+        help=f"Render the projects on a RAM-backed filesystem ({TMPFS_DEFAULT} by default), "
+        "they fall back to the temporary directory of pytest when it is missing or full.",
+        metavar="PATH",
+    )
+
+    group.addoption(
+        "--copie-tmpfs-budget",
+        action="store",
+        default=1024,
+        dest="copie_tmpfs_budget",
+        help="The size in MB the projects may use on the tmpfs, the next projects are rendered "
+        "on disk beyond.",
+        metavar="MB",
+        type=int,
+    )
+
+    group.addoption(
+        "--copie-keep-failed",
+        action="store_true",
+        default=False,
+        dest="copie_keep_failed",
+        help="Keep the projects of the failing tests, moved to disk if rendered on the tmpfs.",
+    )
+
 
 def pytest_configure(config):
     """Force the template path to be absolute to protect ourselves from fixtures that changes path."""
     config.option.template = str(Path(config.option.template).resolve())
+    config.addinivalue_line(
+        "markers",
+        "copie_matrix(coverage='pairwise', questions=None, template=None): parametrize the "
+        "copie_answers fixture with the answer sets covering the choices and bool questions of "
+        "the template ('cartesian', 'pairwise' or N-wise coverage).",
+    )
 
+    # the workers of pytest-xdist are started later and find the cache already cleared
+    if config.option.copie_cache_clear and not hasattr(config, "workerinput"):
+        if getattr(config, "cache", None):
+            RenderCache(root=config.cache.mkdir("copie-renders")).clear()
+
+
+def pytest_generate_tests(metafunc):
+    """Parametrize the ``copie_answers`` argument of the tests marked with ``copie_matrix``."""
+    marker = metafunc.definition.get_closest_marker("copie_matrix")
+    if marker is None or "copie_answers" not in metafunc.fixturenames:
+        return
+
+    from ._matrix import answer_matrix
+
+    template = marker.kwargs.get("template") or metafunc.config.option.template
+    matrix = answer_matrix(
+        Path(template),
+        coverage=marker.kwargs.get("coverage", "pairwise"),
+        questions=marker.kwargs.get("questions"),
+    )
+    ids = ["-".join(f"{q}={a}" for q, a in answers.items()) or "defaults" for answers in matrix]
+    metafunc.parametrize("copie_answers", matrix, ids=ids)
 
-def _add_yaml_include_constructor(
-    template_dir: Path,
-):
-    """Adds an include constructor to yaml.SafeLoader."""
 
-    def include_constructor(
-        loader: yaml.SafeLoader,
-        node: yaml.Node,
-    ):
-        fullpath = template_dir / node.value
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    """Record the failing tests, their projects are kept with ``--copie-keep-failed``."""
+    outcome = yield
+    if outcome.get_result().failed:
+        item.stash[_FAILED_KEY] = True
 
-        if not fullpath.is_file():
-            raise FileNotFoundError(f"The filename '{fullpath}' does not exist.")
 
-        with fullpath.open("rb") as f:
-            return yaml.safe_load(f)
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    """Report the slowest renders of the session when requested with ``--copie-durations``."""
+    if not (count := config.option.copie_durations) or _TIMINGS_KEY not in config.stash:
+        return
 
-    yaml.add_constructor("!include", include_constructor, yaml.SafeLoader)
+    renders = sorted(config.stash[_TIMINGS_KEY], key=lambda r: sum(r[2].values()), reverse=True)
+    terminalreporter.write_sep("=", f"slowest {count} copie renders")
+    for nodeid, extra_answers, timings in renders[:count]:
+        phases = " ".join(f"{p} {timings[p]:.2f}s" for p in PHASES if p in timings)
+        terminalreporter.write_line(f"{sum(timings.values()):.2f}s {nodeid} {extra_answers}")
+        terminalreporter.write_line(f"    {phases}")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """Evict the least recently used renders and base virtualenvs of the persistent caches.
+
+    Only the main process evicts, once all the pytest-xdist workers are done.
+    """
+    config = session.config
+    if hasattr(config, "workerinput") or not getattr(config, "cache", None):
+        return
+    if config.option.copie_cache == "persistent":
+        max_size = config.option.copie_cache_max_size * 1024 * 1024
+        RenderCache(root=config.cache.mkdir("copie-renders")).evict(max_size)
+    if config.option.copie_venv_cache == "persistent":
+        VenvCache(root=config.cache.mkdir("copie-venvs")).evict(config.option.copie_venv_max)
+
+
+def pytest_collection_modifyitems(config, items):
+    """Deselect the tests that can't be affected by the template changes since ``--copie-affected-since``.
+
+    A test using the copie fixtures is kept if its source references a rendered path using a
+    changed template file, if it is parametrized with a question used by a changed file, or if
+    it references no rendered path at all. Any change of the copier configuration or of a file
+    the index doesn't cover (task scripts, extensions...) keeps them all.
+    """
+    if (ref := config.option.copie_affected_since) is None:
+        return
+    from ._config import load_template_config
+    from ._index import ALL, TemplateIndex
+
+    template_dir = Path(config.option.template)
+    if not is_sha(sha := resolve_ref(template_dir, ref)):
+        raise pytest.UsageError(f"--copie-affected-since: can't resolve '{ref}' in {template_dir}")
+    changed = set(changed_files(template_dir, sha, None))
+    config_files = load_template_config(template_dir).files
+    if changed & {p.relative_to(template_dir).as_posix() for p in config_files}:
+        return
+
+    index = TemplateIndex.build(template_dir)
+    test_files = {
+        item.path.resolve().relative_to(template_dir).as_posix()
+        for item in items
+        if item.path.resolve().is_relative_to(template_dir)
+    }
+    if not index.covers(changed - test_files):
+        return
+    file_paths = index.file_paths()
+    affected = index.affected_by(files=changed - test_files)
+    prefix = f"{index.subdirectory}/" if index.subdirectory else ""
+    paths = {
+        index.rendered_path(f) for f in {*index.project_files(), *changed} if f.startswith(prefix)
+    }
+    affected_paths = {index.rendered_path(f) for f in changed if f.startswith(prefix)}
+    affected_paths.update(*(file_paths.get(f, ()) for f in changed))
+    affected_questions = set().union(*(index.variables[f] for f in affected)) - {ALL}
+    patterns = {path: pattern for path in paths if (pattern := index.path_pattern(path))}
+
+    def is_affected(item) -> bool:
+        if not {"copie", "copie_session"} & set(getattr(item, "fixturenames", ())):
+            return True
+        if item.path.resolve().is_relative_to(template_dir):
+            if item.path.resolve().relative_to(template_dir).as_posix() in changed:
+                return True
+        try:
+            source = inspect.getsource(item.obj)
+        except (AttributeError, OSError, TypeError):
+            return True
+
+        referenced = {path for path, pattern in patterns.items() if pattern.search(source)}
+        if not referenced or referenced & affected_paths:
+            return True
+
+        # the answers of the parametrized tests, as argument names or dictionaries of answers
+        params = getattr(getattr(item, "callspec", None), "params", {})
+        questions = set(params)
+        for value in params.values():
+            if isinstance(value, dict):
+                questions.update(value)
+        return bool(questions & affected_questions)
+
+    selected, deselected = [], []
+    for item in items:
+        (selected if is_affected(item) else deselected).append(item)
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
@@ -1,10 +1,24 @@
 """Test the pytest_copie package."""
 
+import itertools
+import os
+import shutil
+import subprocess
+import sys
 import textwrap
 from pathlib import Path
 
 import plumbum
-
+import yaml
+
+from pytest_copie import _tmpfs
+from pytest_copie._cleanup import Cleaner
+from pytest_copie._config import load_template_config
+from pytest_copie._index import TemplateIndex
+from pytest_copie._matrix import covering_array
+from pytest_copie._tmpfs import Tmpfs
+from pytest_copie._vcs import TemplateHistories
+from pytest_copie._venv import VenvCache
 from pytest_copie.plugin import _git as git
 
 
@@ -146,6 +160,747 @@ def test_copie_update(testdir, copier_template, test_check, template_default_con
     assert result.ret == 0
 
 
+def test_template_histories_value_types(copier_template, tmp_path):
+    """A bytes content and its hex representation as str are different histories."""
+    histories = TemplateHistories(root=tmp_path)
+    as_bytes = histories.get(copier_template, {"v1": {"file.txt": b"a"}})
+    as_str = histories.get(copier_template, {"v1": {"file.txt": "61"}})
+    assert as_bytes != as_str
+    assert histories.get(copier_template, {"v1": {"file.txt": b"a"}}) == as_bytes
+
+
+def test_copie_update_incremental(testdir, copier_template, test_check):
+    """Check that an incremental update renders only the affected files and matches a full update."""
+    testdir.makepyfile(
+        """
+        import plumbum
+
+        def _copy(copie):
+            result = copie.copy(vcs_ref="v1")
+            readme = result.project_dir / "README.rst"
+            readme.write_text("user content\\n" + readme.read_text())
+            with plumbum.local.cwd(result.project_dir):
+                copie.git()("init")
+                copie.git()("add", ".")
+                copie.git()("commit", "-m", "Initial commit")
+            return result
+
+        def test_incremental_update(copie):
+            full, partial = _copy(copie), _copy(copie)
+            full_update = copie.update(full, vcs_ref="v2")
+            partial_update = copie.update(partial, vcs_ref="v2", incremental=True)
+
+            assert full_update.touched_files is None
+            assert partial_update.exit_code == 0
+            assert partial_update.touched_files == [".copier-answers.yml", "README.rst"]
+            assert partial_update.answers == full_update.answers
+            for name in [".copier-answers.yml", "README.rst", "foobar.txt"]:
+                assert (partial.project_dir / name).read_text() == (
+                    full.project_dir / name
+                ).read_text()
+            readme = (partial.project_dir / "README.rst").read_text()
+            assert readme.startswith("user content") and readme.endswith("New content")
+        """
+    )
+
+    with plumbum.local.cwd(copier_template):
+        git("init")
+        git("add", ".")
+        git("commit", "-m", "Initial commit")
+        git("tag", "v1")
+        with (copier_template / "project" / "README.rst.jinja").open("a") as f:
+            f.write("\nNew content")
+        git("commit", "-am", "Update README")
+        git("tag", "v2")
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    test_check(result, "test_incremental_update")
+    assert result.ret == 0
+
+
+def test_copie_update_incremental_answers(testdir, copier_template, test_check):
+    """Check that an incremental update handles the answers like copier and falls back when needed."""
+    testdir.makepyfile(
+        """
+        import plumbum
+        import yaml
+
+        def _copy(copie):
+            result = copie.copy(vcs_ref="v1")
+            answers_file = result.project_dir / ".copier-answers.yml"
+            answers = yaml.safe_load(answers_file.read_text())
+            del answers["short_description"]
+            answers_file.write_text(yaml.dump(answers))
+            with plumbum.local.cwd(result.project_dir):
+                copie.git()("init")
+                copie.git()("add", ".")
+                copie.git()("commit", "-m", "Initial commit")
+            return result
+
+        def test_incremental_answers(copie):
+            full, partial = _copy(copie), _copy(copie)
+            answers = {"short_description": "other"}
+            full_update = copie.update(full, answers, vcs_ref="v1")
+            partial_update = copie.update(partial, answers, vcs_ref="v1", incremental=True)
+
+            # like copier, the answer is recorded but the files using it are not rendered again
+            assert partial_update.touched_files == [".copier-answers.yml"]
+            assert partial_update.answers["short_description"] == "other"
+            for name in [".copier-answers.yml", "README.rst", "foobar.txt"]:
+                assert (partial.project_dir / name).read_text() == (
+                    full.project_dir / name
+                ).read_text()
+
+        def test_incremental_fallback(copie):
+            updated = copie.update(_copy(copie), vcs_ref="v2", incremental=True)
+            assert updated.exit_code == 0
+            assert updated.touched_files is None
+        """
+    )
+
+    with plumbum.local.cwd(copier_template):
+        git("init")
+        git("add", ".")
+        git("commit", "-m", "Initial commit")
+        git("tag", "v1")
+        # a file outside of the subdirectory, like a Jinja extension, may change any file
+        (copier_template / "extensions.py").write_text("EXTENSIONS = []\n")
+        git("add", ".")
+        git("commit", "-m", "Add extensions")
+        git("tag", "v2")
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    test_check(result, "test_incremental_answers")
+    test_check(result, "test_incremental_fallback")
+    assert result.ret == 0
+
+
+def test_copie_affected_since(testdir, copier_template):
+    """Check that the tests that can't be affected by the template changes are deselected."""
+    testdir.makepyfile(
+        """
+        import pytest
+
+        def test_readme(copie):
+            assert (copie.copy().project_dir / "README.rst").is_file()
+
+        def test_templated_name(copie):
+            assert (copie.copy().project_dir / "foobar.txt").is_file()
+
+        @pytest.mark.parametrize("answers", [{"short_description": "other"}])
+        def test_templated_name_with_answers(copie, answers):
+            assert (copie.copy(answers).project_dir / "foobar.txt").is_file()
+
+        def test_exit_code(copie):
+            assert copie.copy().exit_code == 0
+
+        def test_no_copie():
+            pass
+        """
+    )
+
+    with plumbum.local.cwd(copier_template):
+        git("init")
+        git("add", ".")
+        git("commit", "-m", "Initial commit")
+    with (copier_template / "project" / "README.rst.jinja").open("a") as f:
+        f.write("New content")
+
+    args = [f"--template={copier_template}", "--copie-affected-since=HEAD"]
+    result = testdir.runpytest("-v", *args)
+    result.assert_outcomes(passed=4, deselected=1)
+    result.stdout.no_fnmatch_line("*::test_templated_name PASSED*")
+
+    # so may a file the index doesn't cover, like a task script
+    (copier_template / "tasks.py").write_text("print('task')\n")
+    testdir.runpytest("-v", *args).assert_outcomes(passed=5)
+    (copier_template / "tasks.py").unlink()
+
+    # a change of the configuration may affect every test
+    (copier_template / "copier.yaml").write_text(
+        (copier_template / "copier.yaml").read_text() + "extra: value\n"
+    )
+    testdir.runpytest("-v", *args).assert_outcomes(passed=5)
+
+
+def test_copie_affected_since_subdirectory(testdir, copier_template):
+    """Check that the template can live in a subdirectory of a git repository."""
+    testdir.makepyfile(
+        """
+        def test_readme(copie):
+            assert (copie.copy().project_dir / "README.rst").is_file()
+
+        def test_templated_name(copie):
+            assert (copie.copy().project_dir / "foobar.txt").is_file()
+        """
+    )
+
+    with plumbum.local.cwd(copier_template.parent):
+        git("init")
+        git("add", ".")
+        git("commit", "-m", "Initial commit")
+        with (copier_template / "project" / "README.rst.jinja").open("a") as f:
+            f.write("New content")
+        git("commit", "-am", "Update README")
+
+    args = [f"--template={copier_template}", "--copie-affected-since=HEAD~1"]
+    result = testdir.runpytest("-v", *args)
+    result.assert_outcomes(passed=1, deselected=1)
+    result.stdout.fnmatch_lines(["*::test_readme PASSED*"])
+
+
+def test_template_index(copier_template):
+    """Check the map of the questions and template files to the rendered paths."""
+    (copier_template / "project" / "macros.jinja").write_text("{{ short_description }}")
+    (copier_template / "project" / "LICENSE.jinja").write_text(
+        '{% include "project/macros.jinja" %}'
+    )
+
+    index = TemplateIndex.build(copier_template)
+    question_paths = index.question_paths()
+    assert question_paths["repo_name"] == {"README.rst", "{{repo_name}}.txt"}
+    assert question_paths["short_description"] == {"README.rst", "LICENSE", "macros"}
+    assert index.file_paths()["project/macros.jinja"] == {"LICENSE", "macros"}
+    assert index.affected_by(files=["project/macros.jinja"]) == {
+        "project/macros.jinja",
+        "project/LICENSE.jinja",
+    }
+    assert index.covers(["project/deleted.txt", "project/macros.jinja"])
+    assert not index.covers(["extensions.py"])
+    assert index.affected_by(files=["extensions.py"]) == set(index.project_files())
+    assert index.path_pattern("{{repo_name}}.txt").search('"helloworld.txt"')
+
+
+def test_copie_template_mirrors(testdir, copier_template, test_check):
+    """The template references are checked out once per session and used by copy and update."""
+    testdir.makepyfile(
+        """
+        import plumbum
+        import yaml
+
+        def test_copie_project(copie, tmp_path_factory):
+            first = copie.copy(vcs_ref="v1")
+            second = copie.copy(vcs_ref="v1")
+            assert first.exit_code == second.exit_code == 0
+
+            mirrors = next(tmp_path_factory.getbasetemp().glob("copie_mirrors*"))
+            assert len(list(mirrors.iterdir())) == 1
+
+            # copier doesn't remove the checkout after rendering from it
+            assert (next(mirrors.iterdir()) / "copier.yaml").is_file()
+            assert (second.project_dir / "README.rst").read_text() == (
+                first.project_dir / "README.rst"
+            ).read_text()
+
+            answers = yaml.safe_load((first.project_dir / ".copier-answers.yml").read_text())
+            assert answers["_commit"] == "v1"
+            assert answers["_src_path"] == r"%s"
+
+            with plumbum.local.cwd(first.project_dir):
+                git = copie.git()
+                git("init")
+                git("add", ".")
+                git("commit", "-m", "Initial commit")
+
+            updated = copie.update(first, vcs_ref="v2")
+            assert updated.exit_code == 0
+            assert (updated.project_dir / "README.rst").read_text().endswith("v2 content")
+            assert len(list(mirrors.iterdir())) == 2
+        """
+        % copier_template
+    )
+
+    with plumbum.local.cwd(copier_template):
+        git("init")
+        git("add", ".")
+        git("commit", "-m", "Initial commit")
+        git("tag", "v1")
+        with (copier_template / "project" / "README.rst.jinja").open("a") as f:
+            f.write("\nv2 content")
+        git("commit", "-am", "Second commit")
+        git("tag", "v2")
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    test_check(result, "test_copie_project")
+    assert result.ret == 0
+
+
+def test_copie_versioned_template(testdir, copier_template):
+    """Check that the template history is built once and cloned for each test."""
+    testdir.makepyfile(
+        """
+        import plumbum
+        import pytest
+
+        VERSIONS = {
+            "v1": {},
+            "v2": {"project/README.rst.jinja": "{{ repo_name }} v2", "project/new.txt": "new"},
+        }
+
+        @pytest.mark.parametrize("i", range(2))
+        def test_update(copie, copie_versioned_template, tmp_path_factory, i):
+            template = copie_versioned_template(VERSIONS)
+            assert (template / "project" / "new.txt").is_file()
+            assert not (template / ".venv").exists()
+
+            result = copie.copy(template_dir=template, vcs_ref="v1")
+            assert result.exit_code == 0
+            assert not (result.project_dir / "new.txt").exists()
+            with plumbum.local.cwd(result.project_dir):
+                copie.git()("init")
+                copie.git()("add", ".")
+                copie.git()("commit", "-m", "Initial commit")
+
+            updated = copie.update(result, vcs_ref="v2")
+            assert updated.exit_code == 0
+            assert (result.project_dir / "README.rst").read_text() == "foobar v2"
+            assert (result.project_dir / "new.txt").read_text() == "new"
+
+            histories = next(tmp_path_factory.getbasetemp().glob("copie_histories*"))
+            assert len(list(histories.iterdir())) == 1
+        """
+    )
+    # the files ignored by git are not part of the history
+    (copier_template / ".gitignore").write_text(".venv/\n")
+    (copier_template / ".venv").mkdir()
+    (copier_template / ".venv" / "pyvenv.cfg").write_text("home = /usr/bin")
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    result.assert_outcomes(passed=2)
+
+
+def test_result_git_snapshot(testdir, copier_template):
+    """Check that the snapshots commit the whole projects with the pinned author."""
+    testdir.makepyfile(
+        """
+        import plumbum
+
+        def test_snapshot(copie, copie_versioned_template):
+            template = copie_versioned_template({"v1": {}, "v2": {"project/new.txt": "new"}})
+            extra = {"repo_name": "other"}
+            results = [copie.copy(template_dir=template, vcs_ref="v1", extra_answers=extra)]
+            results.append(copie.copy(template_dir=template, vcs_ref="v1"))
+            shas = copie.git_snapshot(results)
+            for result, sha in zip(results, shas):
+                with plumbum.local.cwd(result.project_dir):
+                    assert copie.git()("rev-parse", "HEAD").strip() == sha
+                    assert copie.git()("log", "--format=%an").strip() == "Pytest Copie"
+                    assert copie.git()("status", "--porcelain") == ""
+
+            (results[0].project_dir / "other.txt").write_text("other")
+            sha = results[0].git_snapshot("Second commit")
+            assert len(sha) == 40 and sha != shas[0]
+
+            updated = copie.update(results[0], vcs_ref="v2")
+            assert updated.exit_code == 0
+            assert (results[0].project_dir / "new.txt").read_text() == "new"
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    result.assert_outcomes(passed=1)
+
+
+def test_result_run(testdir, copier_template):
+    """Check that the commands run concurrently in the project and their outputs are captured."""
+    testdir.makepyfile(
+        """
+        import sys
+
+        # each command waits for the file of the other one, they only finish if run concurrently
+        WAIT = "import pathlib, time; pathlib.Path('{}').touch()\\n"
+        WAIT += "while not pathlib.Path('{}').exists(): time.sleep(0.01)\\nprint('{}')"
+
+        def test_run(copie):
+            result = copie.copy()
+            commands = [
+                [sys.executable, "-c", WAIT.format("a", "b", "a")],
+                [sys.executable, "-c", WAIT.format("b", "a", "b")],
+                [sys.executable, "-c", "import sys; sys.exit('README.rst' in __import__('os').listdir())"],
+                [sys.executable, "-c", "import time; time.sleep(30)"],
+            ]
+            a, b, readme, sleep = result.run(commands, timeout=5)
+            assert (a.exit_code, a.stdout.strip()) == (0, "a")
+            assert (b.exit_code, b.stdout.strip()) == (0, "b")
+            assert readme.exit_code == 1
+            assert sleep.timed_out and sleep.exit_code is None and sleep.duration < 20
+
+            echo, = result.run(["python -c 'import os; print(os.environ[\\"FOO\\"])'"], env={"FOO": "bar"})
+            assert echo.stdout.strip() == "bar" and echo.stderr == ""
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    result.assert_outcomes(passed=1)
+
+
+_WHEEL_BACKEND = """
+import os
+import zipfile
+
+
+def make_wheel(wheel_directory, name, files):
+    dist_info = f"{name}-1.0.dist-info"
+    files = {
+        **files,
+        f"{dist_info}/METADATA": f"Metadata-Version: 2.1\\nName: {name}\\nVersion: 1.0\\n",
+        f"{dist_info}/WHEEL": "Wheel-Version: 1.0\\nRoot-Is-Purelib: true\\nTag: py3-none-any\\n",
+    }
+    files[f"{dist_info}/RECORD"] = "".join(f"{path},,\\n" for path in [*files, f"{dist_info}/RECORD"])
+    wheel_name = f"{name}-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(os.path.join(wheel_directory, wheel_name), "w") as wheel:
+        for path, content in files.items():
+            wheel.writestr(path, content)
+    return wheel_name
+
+
+def build_editable(wheel_directory, config_settings=None, metadata_directory=None):
+    return make_wheel(wheel_directory, "proj", {"proj.pth": os.path.abspath("src") + "\\n"})
+"""
+
+
+def test_result_venv(testdir, copier_template, tmp_path):
+    """Check that the projects with the same dependencies share their base virtualenv, offline."""
+    # a wheelhouse with a single dependency and a project built by an in-tree backend
+    (wheelhouse := tmp_path / "wheelhouse").mkdir()
+    (backend := copier_template / "project" / "_build").mkdir()
+    (backend / "backend.py").write_text(_WHEEL_BACKEND)
+    namespace: dict = {}
+    exec(_WHEEL_BACKEND, namespace)
+    namespace["make_wheel"](str(wheelhouse), "copiedep", {"copiedep.py": "VALUE = 42\n"})
+
+    (src := copier_template / "project" / "src").mkdir()
+    (src / "proj.py.jinja").write_text("NAME = '{{ repo_name }}'\n")
+    (copier_template / "project" / "requirements.txt").write_text("copiedep\n")
+    (copier_template / "project" / "pyproject.toml").write_text(
+        '[build-system]\nrequires = []\nbuild-backend = "backend"\nbackend-path = ["_build"]\n'
+    )
+
+    testdir.makepyfile(
+        """
+        import subprocess
+
+        def test_venv(copie, tmp_path_factory):
+            results = [copie.copy(extra_answers={"repo_name": name}) for name in ("foo", "bar")]
+            for result in results:
+                venv = result.venv()
+                code = "import proj, copiedep; print(proj.NAME, copiedep.VALUE)"
+                python = subprocess.run([venv.python, "-c", code], capture_output=True, text=True)
+                assert python.stdout.split() == [result.answers["repo_name"], "42"]
+
+                python, = result.run([[str(venv.python), "-c", code]])
+                assert python.stdout.split() == [result.answers["repo_name"], "42"]
+
+            venvs = next(tmp_path_factory.getbasetemp().glob("copie_venvs*"))
+            assert len([p for p in venvs.iterdir() if p.is_dir()]) == 1
+            assert results[0].venv().path == results[0].venv().path
+        """
+    )
+
+    result = testdir.runpytest(
+        "-v", f"--template={copier_template}", f"--copie-wheelhouse={wheelhouse}"
+    )
+    result.assert_outcomes(passed=1)
+
+
+def test_result_assert_matches_snapshot(testdir, copier_template):
+    """Check the snapshots are created on request and report the mismatching files."""
+    testdir.makepyfile(
+        """
+        def test_snapshot(copie):
+            copie.copy().assert_matches_snapshot("default")
+            copie.copy(backend="memory").assert_matches_snapshot("default")
+        """
+    )
+
+    result = testdir.runpytest(f"--template={copier_template}")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*No snapshot 'default'*--copie-snapshot-update*"])
+
+    result = testdir.runpytest(f"--template={copier_template}", "--copie-snapshot-update")
+    result.assert_outcomes(passed=1)
+    snapshot = Path(testdir.tmpdir) / "snapshots" / "default"
+    assert (snapshot / "README.rst").is_file()
+    assert not (snapshot / ".copier-answers.yml").exists()
+
+    result = testdir.runpytest(f"--template={copier_template}")
+    result.assert_outcomes(passed=1)
+
+    (snapshot / "README.rst").write_text("foobar\n")
+    (snapshot / "old.txt").write_text("old")
+    result = testdir.runpytest(f"--template={copier_template}")
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(
+        ["*- missing: old.txt", "*- changed: README.rst", "*+======", "*+Test Project"]
+    )
+    result.stdout.no_fnmatch_line("*changed: foobar.txt*")
+
+
+def test_result_files(testdir, copier_template):
+    """Check the manifest of the files is memoized until the project changes."""
+    testdir.makepyfile(
+        """
+        import hashlib
+        import sys
+
+        def test_files(copie):
+            result = copie.copy()
+            other = copie.copy(extra_answers={"repo_name": "other"})
+            files = result.files
+            assert result.files is files
+            assert "README.rst" in files and ".copier-answers.yml" in files
+            assert list(files.glob("*.txt")) == ["foobar.txt"]
+            assert files["README.rst"].size == (result.project_dir / "README.rst").stat().st_size
+            assert files["README.rst"].read_text().startswith("foobar")
+            content = (result.project_dir / "README.rst").read_bytes()
+            assert files["README.rst"].digest == hashlib.sha256(content).hexdigest()
+
+            assert files - other.files == {"foobar.txt"}
+            assert other.files ^ files == {"foobar.txt", "other.txt"}
+            assert files.changed(other.files) == [".copier-answers.yml", "README.rst"]
+
+            result.git_snapshot()
+            assert not any(path.startswith(".git/") for path in result.files)
+            result.run([[sys.executable, "-c", "open('new.txt', 'w').close()"]])
+            assert "new.txt" in result.files and result.files is not files
+            (result.project_dir / "other.txt").touch()
+            del result.files
+            assert "other.txt" in result.files
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    result.assert_outcomes(passed=1)
+
+
+def test_copie_jinja_cache(testdir, copier_template):
+    """Check the compiled templates are reused and compiled again when the source changes."""
+    testdir.makepyfile(
+        f"""
+        from pathlib import Path
+
+        def test_jinja_cache(copie, tmp_path_factory):
+            result = copie.copy()
+            cache = next(tmp_path_factory.getbasetemp().glob("copie_jinja*"))
+            compiled = sorted(cache.iterdir())
+            assert compiled
+
+            other = copie.copy(extra_answers={{"repo_name": "other"}})
+            assert (other.project_dir / "README.rst").read_text().startswith("other")
+            assert sorted(cache.iterdir()) == compiled
+
+            Path(r"{copier_template}", "project", "README.rst.jinja").write_text("{{{{ repo_name }}}} v2")
+            updated = copie.copy()
+            assert (updated.project_dir / "README.rst").read_text() == "foobar v2"
+            assert sorted(cache.iterdir()) == compiled
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}", "--copie-jinja-cache=session")
+    result.assert_outcomes(passed=1)
+
+
+def test_copie_task_cache(testdir, copier_template, tmp_path):
+    """Check the tasks with the same inputs are replayed instead of executed again."""
+    counter = tmp_path / "counter.txt"
+    code = (
+        "import pathlib; readme = pathlib.Path('README.rst');"
+        "pathlib.Path('task.txt').write_text(readme.read_text().upper()); readme.unlink();"
+        f"open({str(counter)!r}, 'a').write('x')"
+    )
+    config = yaml.safe_load((copier_template / "copier.yaml").read_text())
+    config["_tasks"] = [[sys.executable, "-c", code]]
+    (copier_template / "copier.yaml").write_text(yaml.dump(config))
+
+    testdir.makepyfile(
+        f"""
+        from pathlib import Path
+
+        def test_tasks(copie):
+            first = copie.copy()
+            assert (first.task_hits, first.task_misses) == (0, 1)
+
+            second = copie.copy()
+            assert (second.task_hits, second.task_misses) == (1, 0)
+            assert (second.project_dir / "task.txt").read_text().startswith("FOOBAR")
+            assert not (second.project_dir / "README.rst").exists()
+
+            other = copie.copy(extra_answers={{"repo_name": "other"}})
+            assert (other.task_hits, other.task_misses) == (0, 1)
+            assert (other.project_dir / "task.txt").read_text().startswith("OTHER")
+            assert Path(r"{counter}").read_text() == "xx"
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}", "--copie-task-cache=session")
+    result.assert_outcomes(passed=1)
+
+
+def test_copie_task_cache_git_and_directories(testdir, copier_template):
+    """Check the git metadata doesn't change the key and the empty directories are replayed."""
+    config = yaml.safe_load((copier_template / "copier.yaml").read_text())
+    config["_tasks"] = [[sys.executable, "-c", "import os; os.makedirs('empty/nested')"]]
+    (copier_template / "copier.yaml").write_text(yaml.dump(config))
+
+    testdir.makepyfile(
+        """
+        import plumbum
+
+        def _committed(copie):
+            result = copie.copy(run_tasks=False)
+            with plumbum.local.cwd(result.project_dir):
+                copie.git()("init")
+                copie.git()("add", ".")
+                copie.git()("commit", "-m", "Initial commit")
+            result.run_tasks()
+            return result
+
+        def test_tasks(copie):
+            first = _committed(copie)
+            assert (first.task_hits, first.task_misses) == (0, 1)
+
+            second = _committed(copie)
+            assert (second.task_hits, second.task_misses) == (1, 0)
+            assert (second.project_dir / "empty" / "nested").is_dir()
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}", "--copie-task-cache=session")
+    result.assert_outcomes(passed=1)
+
+
+def test_copie_run_tasks(testdir, copier_template, tmp_path):
+    """Check the tasks can be deferred after the copy and the independent ones run concurrently."""
+    # each independent task waits for the other one to start, they only succeed concurrently
+    (script := tmp_path / "task.py").write_text(
+        "import pathlib, sys, time\n"
+        "name, content = sys.argv[1:]\n"
+        "pathlib.Path(name + '.started').touch()\n"
+        "deadline = time.time() + 30\n"
+        "while not (pathlib.Path('a.started').exists() and pathlib.Path('b.started').exists()):\n"
+        "    assert time.time() < deadline, 'the independent tasks did not run concurrently'\n"
+        "    time.sleep(0.01)\n"
+        "pathlib.Path(name + '.txt').write_text(content)\n"
+    )
+    check = "import pathlib; assert pathlib.Path('b.txt').exists(); pathlib.Path('c.txt').touch()"
+    config = yaml.safe_load((copier_template / "copier.yaml").read_text())
+    config["_tasks"] = [
+        {"command": [sys.executable, str(script), "a", "{{ repo_name }}"], "independent": True},
+        {"command": [sys.executable, str(script), "b", "{{ repo_name }}"], "independent": True},
+        [sys.executable, "-c", check],
+    ]
+    (copier_template / "copier.yaml").write_text(yaml.dump(config))
+
+    testdir.makepyfile(
+        """
+        import pytest
+
+        def test_run_tasks(copie):
+            result = copie.copy(extra_answers={"repo_name": "deferred"}, run_tasks=False)
+            assert result.exit_code == 0
+            assert not (result.project_dir / "a.txt").exists()
+
+            result.run_tasks(parallel=True)
+            assert (result.project_dir / "a.txt").read_text() == "deferred"
+            assert (result.project_dir / "b.txt").read_text() == "deferred"
+            assert "c.txt" in result.files
+            with pytest.raises(ValueError):
+                result.run_tasks()
+
+            # the render without the tasks is cached on its own
+            cached = copie.copy(extra_answers={"repo_name": "deferred"}, run_tasks=False)
+            assert cached.materialization is not None
+            assert not (cached.project_dir / "c.txt").exists()
+            cached.run_tasks(parallel=True)
+            assert (cached.project_dir / "c.txt").exists()
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}", "--copie-cache=session")
+    result.assert_outcomes(passed=1)
+
+
+def test_copie_tmpfs(testdir, copier_template, tmp_path, monkeypatch):
+    """The projects are rendered on the tmpfs within its budget and moved to disk to be kept."""
+    (tmpfs := tmp_path / "shm").mkdir()
+    kept = tmp_path / "kept.txt"
+    testdir.makepyfile(
+        f"""
+        import os
+        from pathlib import Path
+
+        def test_tmpfs(copie):
+            result = copie.copy()
+            assert (result.project_dir / "README.rst").is_file()
+            on_tmpfs = result.project_dir.is_relative_to(Path(r"{tmpfs}"))
+            assert on_tmpfs == ("COPIE_DISK" not in os.environ)
+
+            # the projects rendered in memory are materialized in the test directory
+            in_memory = copie.copy(backend="memory")
+            assert in_memory.materialize().parent == copie.test_dir
+
+        def test_failed(copie, tmp_path):
+            Path(r"{kept}").write_text(str(tmp_path / "copie" / "copie000"))
+            assert copie.copy().project_dir is None
+        """
+    )
+    args = [f"--template={copier_template}", f"--copie-tmpfs={tmpfs}"]
+
+    testdir.runpytest(*args).assert_outcomes(passed=1, failed=1)
+    assert list(tmpfs.iterdir()) == []
+    assert not Path(kept.read_text()).exists()
+
+    # the project of the failing test is moved to disk and kept
+    testdir.runpytest(*args, "--copie-keep-failed").assert_outcomes(passed=1, failed=1)
+    assert list(tmpfs.iterdir()) == []
+    assert (Path(kept.read_text()) / "README.rst").is_file()
+
+    # beyond the budget the projects are rendered on disk
+    monkeypatch.setenv("COPIE_DISK", "1")
+    testdir.runpytest(*args, "--copie-tmpfs-budget=0").assert_outcomes(passed=1, failed=1)
+
+
+def test_tmpfs_budget(tmp_path):
+    """The budget of the tmpfs counts the bytes published by the other processes."""
+    tmpfs = Tmpfs(root=tmp_path / "shm", budget=1000)
+    mirror = tmpfs.reserve(tmp_path / "test")
+    assert mirror is not None
+    (mirror / "file.txt").write_bytes(b"x" * 600)
+    assert tmpfs.used() == 600
+
+    (tmp_path / "shm" / ".usage-0").write_text("400")
+    assert tmpfs.reserve(tmp_path / "test") is None
+
+    tmpfs.evacuate(tmp_path / "test")
+    assert (tmp_path / "test" / "file.txt").is_file()
+    assert tmpfs.used() == 400
+    tmpfs.close()
+    assert (tmp_path / "shm").is_dir()  # still used by the other process
+
+
+def test_tmpfs_usage_counter(tmp_path, monkeypatch):
+    """The projects are only measured again when their folder changed."""
+    walked = []
+    tree_size = _tmpfs._tree_size
+    monkeypatch.setattr(_tmpfs, "_tree_size", lambda root: walked.append(root) or tree_size(root))
+    tmpfs = Tmpfs(root=tmp_path / "shm", budget=10000)
+    mirror = tmpfs.reserve(tmp_path / "test")
+    for i in range(3):
+        (project := mirror / f"copie{i:03d}").mkdir()
+        (project / "README.rst").write_bytes(b"x" * 100)
+        assert tmpfs.reserve(tmp_path / "test") == mirror
+    assert tmpfs.used() == 300
+    assert walked == [mirror / "copie000", mirror / "copie001", mirror / "copie002"]
+
+    (mirror / "copie001" / "LICENSE").write_bytes(b"x" * 50)
+    shutil.rmtree(mirror / "copie002")
+    assert tmpfs.used() == 250
+    assert walked[3:] == [mirror / "copie001"]
+
+    assert tmpfs.release(tmp_path / "test") == mirror
+    assert tmpfs.used() == 0
+
+
 def test_copie_copy_without_subdirectory(testdir, incomplete_copier_template, test_check):
     """Programmatically create a **Copier** template and use `copy` to create a project from it."""
     testdir.makepyfile(
@@ -206,6 +961,81 @@ def test_copie_with_template_kwarg(testdir, copier_template, test_check):
     assert result.ret == 0
 
 
+def test_copie_copy_many(testdir, copier_template, test_check):
+    """Render several sets of answers concurrently and get the results in order."""
+    testdir.makepyfile(
+        """
+        def test_copie_projects(copie):
+            names = ["foo", "bar", "baz"]
+            results = copie.copy_many([{"repo_name": n} for n in names], workers=2)
+
+            assert [r.exit_code for r in results] == [0, 0, 0]
+            assert [r.answers["repo_name"] for r in results] == names
+            assert [r.project_dir.name for r in results] == ["copie000", "copie001", "copie002"]
+            for name, result in zip(names, results):
+                assert (result.project_dir / f"{name}.txt").is_file()
+
+            # the counter keeps going for the next copies
+            assert copie.copy().project_dir.name == "copie003"
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    test_check(result, "test_copie_projects")
+    assert result.ret == 0
+
+
+def test_copie_copy_memory_backend(testdir, copier_template, test_check, template_default_content):
+    """Keep the rendered files in memory and write them on disk only on demand."""
+    testdir.makepyfile(
+        """
+        def test_copie_project(copie):
+            result = copie.copy(backend="memory")
+
+            assert result.exit_code == 0
+            assert result.project_dir is None
+            assert not list(copie.test_dir.iterdir())
+
+            readme = result.tree / "README.rst"
+            assert readme.is_file() and readme.exists()
+            assert readme.read_text() == "%s"
+            assert (result.tree / "foobar.txt").read_bytes() == b"templated filename"
+            assert result.tree.glob("*.txt") == ["foobar.txt"]
+            assert not (result.tree / "missing").exists()
+
+            project_dir = result.materialize()
+            assert project_dir == result.project_dir
+            assert project_dir.name == "copie000"
+            assert (project_dir / "README.rst").read_text() == "%s"
+        """
+        % (template_default_content, template_default_content)
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    test_check(result, "test_copie_project")
+    assert result.ret == 0
+
+
+def test_copie_memory_backend_scratch(testdir, copier_template, tmp_path, monkeypatch):
+    """The projects of the memory backend are rendered on the default tmpfs."""
+    (shm := tmp_path / "shm").mkdir()
+    cwd = tmp_path / "cwd.txt"
+    monkeypatch.setattr("pytest_copie.plugin.TMPFS_DEFAULT", str(shm))
+    with (copier_template / "copier.yaml").open("a") as f:
+        f.write(f"_tasks: [\"pwd > '{cwd}'\"]\n")
+    testdir.makepyfile(
+        """
+        def test_scratch(copie):
+            assert copie.copy(backend="memory").exit_code == 0
+            assert not list(copie.test_dir.iterdir())
+        """
+    )
+
+    testdir.runpytest(f"--template={copier_template}").assert_outcomes(passed=1)
+    assert Path(cwd.read_text().strip()).is_relative_to(shm)
+    assert list(shm.iterdir()) == []
+
+
 def test_copie_fixture_removes_directories(testdir, copier_template, test_check):
     """Check the copie fixture removes the test directories from one test to another."""
     testdir.makepyfile(
@@ -226,6 +1056,55 @@ def test_copie_fixture_removes_directories(testdir, copier_template, test_check)
     assert result.ret == 0
 
 
+def test_copie_fixture_trash_cleanup(testdir, copier_template, test_check):
+    """Check the copie fixture moves the test directories to the trash with --copie-cleanup=trash."""
+    testdir.makepyfile(
+        """
+        def test_create_dir(copie):
+            result = copie.copy()
+            globals().update(test_dir = result.project_dir.parent)
+            assert result.exception is None
+
+        def test_previous_dir_is_trashed(copie, tmp_path_factory):
+            assert test_dir.is_dir() is False
+            trash = next(tmp_path_factory.getbasetemp().glob("copie_trash*"))
+            assert [p.name for p in trash.iterdir()] == ["000001-copie"]
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}", "--copie-cleanup=trash")
+    test_check(result, "test_create_dir")
+    test_check(result, "test_previous_dir_is_trashed")
+    assert result.ret == 0
+
+
+def test_cleaner_background(tmp_path):
+    """Check the background deletions are all done once the cleaner is closed."""
+    dirs = [tmp_path / f"dir_{i}" for i in range(10)]
+    for d in dirs:
+        (d / "sub").mkdir(parents=True)
+        (d / "sub" / "file.txt").write_text("content")
+
+    cleaner = Cleaner(mode="background")
+    for d in dirs:
+        cleaner.remove(d)
+    cleaner.close()
+    assert not any(d.exists() for d in dirs)
+
+
+def test_venv_cache_evict(tmp_path):
+    """Check the least recently used bases are evicted, except the ones being built."""
+    cache = VenvCache(root=tmp_path)
+    for i, name in enumerate(["old", "locked", "recent"]):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / ".copie-complete").touch()
+        os.utime(tmp_path / name / ".copie-complete", (i, i))
+    (tmp_path / ".locked.lock").touch()
+
+    assert cache.evict(1) == [tmp_path / "old"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".locked.lock", "locked", "recent"]
+
+
 def test_copie_fixture_keeps_directories(testdir, copier_template, test_check):
     """Check the copie fixture keeps the test directories from one test to another."""
     testdir.makepyfile(
@@ -264,6 +1143,76 @@ def test_copie_result_context(testdir, copier_template, test_check):
     assert result.ret == 0
 
 
+def test_copie_timings(testdir, copier_template, test_check):
+    """Check that the phases are timed and that the slowest renders are reported."""
+    config = yaml.safe_load((copier_template / "copier.yaml").read_text())
+    config["_tasks"] = ["echo done"]
+    (copier_template / "copier.yaml").write_text(yaml.dump(config))
+
+    testdir.makepyfile(
+        """
+        def test_timed_project(copie):
+            result = copie.copy(extra_answers={"repo_name": "timed"})
+            assert result.exit_code == 0
+            assert {"config", "clone", "render", "tasks", "answers"} <= set(result.timings)
+            assert all(t >= 0 for t in result.timings.values())
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}", "--copie-durations=5")
+    test_check(result, "test_timed_project")
+    result.stdout.fnmatch_lines(
+        [
+            "*slowest 5 copie renders*",
+            "*s *::test_timed_project {'repo_name': 'timed'}",
+            "    config *s clone *s render *s tasks *s answers *s",
+        ]
+    )
+    assert result.ret == 0
+
+
+def test_copie_matrix(testdir, copier_template):
+    """Check that the copie_matrix marker parametrizes the tests with the answer sets."""
+    config = yaml.safe_load((copier_template / "copier.yaml").read_text())
+    config["license"] = {"type": "str", "choices": ["MIT", "BSD", "GPL"], "default": "BSD"}
+    config["use_docs"] = {"type": "bool", "default": True}
+    config["use_ci"] = {"type": "bool", "default": False}
+    (copier_template / "copier.yaml").write_text(yaml.dump(config, sort_keys=False))
+
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.copie_matrix(coverage="pairwise")
+        def test_pairwise(copie, copie_answers):
+            assert copie.copy(extra_answers=copie_answers).exit_code == 0
+
+        @pytest.mark.copie_matrix(coverage="cartesian", questions=["license"])
+        def test_cartesian(copie_answers):
+            assert list(copie_answers) == ["license"]
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    result.assert_outcomes(passed=6 + 3)
+    result.stdout.fnmatch_lines(
+        [
+            "*::test_pairwise?license=BSD-use_docs=True-use_ci=False? PASSED*",
+            "*::test_cartesian?license=BSD? PASSED*",
+        ]
+    )
+
+
+def test_covering_array():
+    """Check that the pairwise cases cover every pair of answers with fewer cases."""
+    values = [list(range(3))] * 4 + [list(range(2))] * 4
+    cases = covering_array(values, 2)
+    assert len(cases) < 3**4 * 2**4 / 50
+    for a, b in itertools.combinations(range(len(values)), 2):
+        pairs = {(case[a], case[b]) for case in cases}
+        assert pairs == set(itertools.product(range(len(values[a])), range(len(values[b]))))
+
+
 def test_cookies_group(testdir):
     """Check that pytest registered the --cookies-group option."""
     result = testdir.runpytest("--help")
@@ -396,3 +1345,84 @@ def test_copy_include_file_error_invalid_file(testdir):
 
     result = testdir.runpytest("-v", f"--template={template_dir}")
     assert result.ret == 0
+
+
+def test_copy_include_file_error_circular(testdir):
+    """Validates that pytest-copie reports circular '!include' directives."""
+    (template_dir := Path(testdir.tmpdir) / "copie-template").mkdir()
+    (template_dir / "copier.yml").write_text("!include a.yml\n---\n_subdirectory: project\n")
+    (template_dir / "a.yml").write_text("a: !include b.yml\n")
+    (template_dir / "b.yml").write_text("b: !include a.yml\n")
+
+    testdir.makepyfile(
+        """
+        def test_copie_project(copie):
+            result = copie.copy()
+
+            assert result.exit_code == -1
+            assert isinstance(result.exception, ValueError)
+            assert str(result.exception).startswith("Circular !include detected")
+        """,
+    )
+
+    result = testdir.runpytest("-v", f"--template={template_dir}")
+    assert result.ret == 0
+
+
+def test_template_config_cache(tmp_path):
+    """The copier.yaml file is parsed again only when it or one of its includes changes."""
+    (tmp_path / "copier.yml").write_text("!include other.yml\n---\n_subdirectory: project\n")
+    (tmp_path / "other.yml").write_text("test: test\n")
+
+    config = load_template_config(tmp_path)
+    assert config.documents == [{"test": "test"}, {"_subdirectory": "project"}]
+    assert config.has_subdirectory
+    assert load_template_config(tmp_path) is config
+
+    (tmp_path / "other.yml").write_text("test: changed\n")
+    os.utime(tmp_path / "other.yml", ns=(0, 0))
+    assert load_template_config(tmp_path).documents[0] == {"test": "changed"}
+
+    # a nested include changing invalidates the parse of the files including it
+    (tmp_path / "other.yml").write_text("a: !include nested.yml\n")
+    (tmp_path / "nested.yml").write_text("x: 1\n")
+    assert load_template_config(tmp_path).documents[0] == {"a": {"x": 1}}
+    (tmp_path / "nested.yml").write_text("x: 2\n")
+    os.utime(tmp_path / "nested.yml", ns=(1, 1))
+    assert load_template_config(tmp_path).documents[0] == {"a": {"x": 2}}
+
+    # the global SafeLoader doesn't know about the directive
+    assert "!include" not in yaml.SafeLoader.yaml_constructors
+
+
+def test_plugin_import_time():
+    """The plugin module imports the heavy dependencies lazily and within its time budget.
+
+    The budget is relative to the import of pytest, measured in the same process, so that the
+    test doesn't depend on the speed of the machine.
+    """
+    heavy = ["copier", "plumbum", "jinja2", "yaml"]
+    code = (
+        "import sys, pytest, pytest_copie.plugin;"
+        f"print(' '.join(m for m in sys.modules if m.split('.')[0] in {heavy}))"
+    )
+    ratios = []
+    for _ in range(3):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert process.stdout.split() == [], "heavy modules imported with the plugin"
+
+        # the lines of -X importtime are "import time: self [us] | cumulative | module"
+        cumulative = {}
+        for line in process.stderr.splitlines()[1:]:
+            _, time_us, module = line.rsplit("|", 2)
+            cumulative[module.strip()] = int(time_us)
+        ratios.append(cumulative["pytest_copie.plugin"] / cumulative["pytest"])
+    assert min(ratios) < 0.5, "importing the plugin takes more than half the time of pytest"
+
+    # the lazy attributes are still available
+    assert git("--version").startswith("git version")
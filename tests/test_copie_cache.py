@@ -0,0 +1,277 @@
+"""Test the render cache of the copie fixtures."""
+
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+
+import pytest
+
+from pytest_copie._cache import RenderCache, materialize, template_digest, tree_digest
+
+
+def test_copie_cache_reuses_renders(testdir, copier_template, test_check):
+    """Identical copies are rendered once and reproduced in independent directories."""
+    testdir.makepyfile(
+        """
+        def test_cached_copies(copie, tmp_path_factory):
+            first = copie.copy()
+            second = copie.copy()
+            other = copie.copy(extra_answers={"repo_name": "helloworld"})
+
+            assert first.exit_code == second.exit_code == other.exit_code == 0
+            assert first.project_dir != second.project_dir
+            assert first.answers == second.answers
+            assert (second.project_dir / "foobar.txt").is_file()
+            assert (other.project_dir / "helloworld.txt").is_file()
+
+            # the projects are independent from each other
+            (first.project_dir / "README.rst").write_text("modified")
+            assert (second.project_dir / "README.rst").read_text() != "modified"
+
+            cache_dir = next(tmp_path_factory.getbasetemp().glob("copie_cache*"))
+            assert len(list(cache_dir.iterdir())) == 2
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}", "--copie-cache=session")
+    test_check(result, "test_cached_copies")
+    assert result.ret == 0
+
+
+def test_copie_cache_memory_backend(testdir, copier_template, test_check):
+    """Cached renders are read in memory without being reproduced on disk."""
+    testdir.makepyfile(
+        """
+        def test_cached_memory(copie):
+            first = copie.copy()
+            second = copie.copy(backend="memory")
+
+            assert second.exit_code == 0
+            assert second.project_dir is None
+            assert not (copie.test_dir / "copie001").exists()
+            assert (second.tree / "README.rst").read_bytes() == (
+                first.project_dir / "README.rst"
+            ).read_bytes()
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}", "--copie-cache=session")
+    test_check(result, "test_cached_memory")
+    assert result.ret == 0
+
+
+def test_copie_cache_template_location(testdir, copier_template, test_check):
+    """Identical templates in different places don't share their renders."""
+    other = copier_template.parent / "other-template"
+    shutil.copytree(copier_template, other)
+    testdir.makepyfile(
+        """
+        from pathlib import Path
+
+        import yaml
+
+        def test_locations(copie):
+            first = copie.copy()
+            second = copie.copy(template_dir=Path(r"%s"))
+
+            assert first.exit_code == second.exit_code == 0
+            assert second.materialization is None
+            answers = yaml.safe_load((second.project_dir / ".copier-answers.yml").read_text())
+            assert answers["_src_path"] == r"%s"
+        """
+        % (other, other)
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}", "--copie-cache=session")
+    test_check(result, "test_locations")
+    assert result.ret == 0
+
+
+def test_copie_cache_disabled(testdir, copier_template, test_check):
+    """No cache is created by default."""
+    testdir.makepyfile(
+        """
+        def test_no_cache(copie, tmp_path_factory):
+            assert copie.copy().exit_code == 0
+            assert not list(tmp_path_factory.getbasetemp().glob("copie_cache*"))
+        """
+    )
+
+    result = testdir.runpytest("-v", f"--template={copier_template}")
+    test_check(result, "test_no_cache")
+    assert result.ret == 0
+
+
+def test_copie_cache_shared_by_xdist_workers(testdir, copier_template):
+    """The pytest-xdist workers render each project once in a shared cache."""
+    pytest.importorskip("xdist")
+    testdir.makepyfile(
+        """
+        import pytest
+
+        @pytest.mark.parametrize("i", range(4))
+        def test_shared(copie, tmp_path_factory, i):
+            result = copie.copy()
+            assert result.exit_code == 0
+            cache_dir = tmp_path_factory.getbasetemp().parent / "copie_cache"
+            assert len([p for p in cache_dir.iterdir() if not p.name.startswith(".")]) == 1
+        """
+    )
+
+    result = testdir.runpytest("-n", "2", f"--template={copier_template}", "--copie-cache=session")
+    result.assert_outcomes(passed=4)
+
+
+def test_copie_cache_persistent(testdir, copier_template, monkeypatch):
+    """The persistent cache reuses the renders of the previous runs until it is cleared."""
+    testdir.makepyfile(
+        """
+        import os
+
+        def test_copy(copie):
+            result = copie.copy()
+            assert result.exit_code == 0
+            assert (result.materialization is not None) == ("COPIE_CACHED" in os.environ)
+        """
+    )
+    args = ["-v", f"--template={copier_template}", "--copie-cache=persistent"]
+    testdir.runpytest(*args).assert_outcomes(passed=1)
+
+    monkeypatch.setenv("COPIE_CACHED", "1")
+    testdir.runpytest(*args).assert_outcomes(passed=1)
+
+    monkeypatch.delenv("COPIE_CACHED")
+    testdir.runpytest(*args, "--copie-cache-clear").assert_outcomes(passed=1)
+
+    # any file of the template is part of the key
+    (copier_template / "tests").mkdir()
+    (copier_template / "tests" / "test_template.py").write_text("def test_template(): pass\n")
+    testdir.runpytest(*args).assert_outcomes(passed=1)
+
+
+def test_render_cache_evict(tmp_path):
+    """The least recently used renders are removed beyond the size of the cache."""
+    cache = RenderCache(root=tmp_path / "cache")
+    cache.root.mkdir()
+    (src := tmp_path / "project").mkdir()
+    (src / "file.txt").write_bytes(b"x" * 1000)
+    for key in ("old", "used", "new"):
+        cache.store(key, src, {})
+    os.utime(cache.root / "old" / "answers.json", (0, 0))
+    os.utime(cache.root / "used" / "answers.json", (1, 1))
+    os.utime(cache.root / "new" / "answers.json", (2, 2))
+    assert cache.lookup("used") is not None
+
+    assert cache.evict(2500) == [cache.root / "old"]
+    assert {p.name for p in cache.root.iterdir()} == {"used", "new"}
+
+    cache.clear()
+    assert list(cache.root.iterdir()) == []
+
+
+def test_template_digest(copier_template):
+    """The digest of a template covers all its files except the ones ignored by git."""
+    before = template_digest(copier_template)
+    (copier_template / "shared").mkdir()
+    (copier_template / "shared" / "macros.jinja").write_text("v1")
+    assert template_digest(copier_template) != before
+
+    before = template_digest(copier_template)
+    (copier_template / ".gitignore").write_text(".venv/\n*.pyc\n!keep.pyc\n")
+    (copier_template / ".venv").mkdir()
+    (copier_template / ".venv" / "pyvenv.cfg").write_text("home = /usr/bin")
+    (copier_template / "shared" / "macros.pyc").write_bytes(b"compiled")
+    ignored = template_digest(copier_template)
+    assert ignored != before
+    (copier_template / ".venv" / "pyvenv.cfg").write_text("home = /usr/local/bin")
+    (copier_template / "shared" / "macros.pyc").write_bytes(b"recompiled")
+    assert template_digest(copier_template) == ignored
+
+    (copier_template / "shared" / "keep.pyc").write_bytes(b"kept")
+    assert template_digest(copier_template) != ignored
+
+
+def test_template_digest_git(copier_template):
+    """The files of a git template are listed by git, the untracked ones included."""
+    git = ["git", "-c", "user.name=copie", "-c", "user.email=copie@example.com"]
+    (copier_template / ".gitignore").write_text(".venv/\n")
+    subprocess.run([*git, "init", "-q"], cwd=copier_template, check=True)
+    subprocess.run([*git, "add", "."], cwd=copier_template, check=True)
+    subprocess.run([*git, "commit", "-qm", "init"], cwd=copier_template, check=True)
+    before = template_digest(copier_template)
+
+    (copier_template / ".venv").mkdir()
+    (copier_template / ".venv" / "pyvenv.cfg").write_text("home = /usr/bin")
+    assert template_digest(copier_template) == before
+
+    (copier_template / "shared.jinja").write_text("untracked")
+    assert template_digest(copier_template) != before
+
+
+def test_copie_cache_include_outside_subdirectory(testdir, copier_template, monkeypatch):
+    """Editing a template included from outside of the subdirectory renders the project again."""
+    (copier_template / "shared").mkdir()
+    (copier_template / "shared" / "m.jinja").write_text("v1")
+    (copier_template / "project" / "included.txt.jinja").write_text(
+        '{% include "shared/m.jinja" %}'
+    )
+    testdir.makepyfile(
+        """
+        import os
+
+        def test_copy(copie):
+            result = copie.copy()
+            assert result.exit_code == 0
+            assert (result.project_dir / "included.txt").read_text() == os.environ["COPIE_V"]
+            assert result.materialization is None
+        """
+    )
+    args = ["-v", f"--template={copier_template}", "--copie-cache=persistent"]
+    monkeypatch.setenv("COPIE_V", "v1")
+    testdir.runpytest(*args).assert_outcomes(passed=1)
+
+    (copier_template / "shared" / "m.jinja").write_text("v2")
+    monkeypatch.setenv("COPIE_V", "v2")
+    testdir.runpytest(*args).assert_outcomes(passed=1)
+
+
+def test_render_cache_locks(tmp_path):
+    """A render lock is exclusive and waiting returns once it is released."""
+    cache = RenderCache(root=tmp_path)
+    assert cache.acquire("key") is True
+    assert cache.acquire("key") is False
+
+    threading.Timer(0.1, cache.release, args=("key",)).start()
+    cache.wait("key")
+    assert cache.acquire("key") is True
+    cache.release("key")
+
+    # a stale lock is dropped instead of blocking forever
+    cache.acquire("key")
+    RenderCache(root=tmp_path, lock_timeout=0).wait("key")
+    assert cache.acquire("key") is True
+
+
+def test_materialize(tmp_path):
+    """The materialization strategies reproduce the tree and report the one used."""
+    (src := tmp_path / "src" / "sub").mkdir(parents=True)
+    (src / "file.txt").write_text("content")
+
+    assert materialize(tmp_path / "src", tmp_path / "copy", ("copy",)) == "copy"
+    assert materialize(tmp_path / "src", tmp_path / "link", ("hardlink", "copy")) == "hardlink"
+
+    copied, linked = tmp_path / "copy" / "sub" / "file.txt", tmp_path / "link" / "sub" / "file.txt"
+    assert copied.read_text() == linked.read_text() == "content"
+    assert not copied.samefile(src / "file.txt")
+    assert linked.samefile(src / "file.txt")
+    assert tree_digest(tmp_path / "src") == tree_digest(tmp_path / "copy")
+
+
+def test_tree_digest_changes_with_content(tmp_path: Path):
+    """The digest of a template changes when a file is modified."""
+    (tmp_path / "file.txt").write_text("content")
+    before = tree_digest(tmp_path)
+    (tmp_path / "file.txt").write_text("other content")
+    assert tree_digest(tmp_path) != before
@@ -188,3 +188,63 @@ def test_invalid_parent_result_rejected(testdir: Pytester) -> None:
 
     res = testdir.runpytest("-v")
     res.assert_outcomes(passed=1)
+
+
+# --------------------------------------------------------------------------- #
+#                        Parent materialization strategies                    #
+# --------------------------------------------------------------------------- #
+def test_parent_hardlink_materialization(testdir: Pytester) -> None:
+    """Parent files are hardlinked except the ones the child template may write."""
+    tmp = Path(testdir.tmpdir)
+    parent_tpl = _create_parent_template(tmp)
+    child_tpl = _create_child_template(tmp)
+    (vendor := parent_tpl / "template" / "vendor").mkdir()
+    (vendor / "asset.txt").write_text("vendored asset")
+
+    parent_tpl_s = str(parent_tpl).replace("\\", "\\\\")
+    child_tpl_s = str(child_tpl).replace("\\", "\\\\")
+
+    testdir.makepyfile(
+        f"""
+        from pathlib import Path
+
+        import pytest
+
+        def test_parent_child(copie):
+            parent_result = copie.copy(template_dir=Path(r"{parent_tpl_s}"))
+            assert parent_result.materialization is None
+
+            child_copie = copie(
+                parent_result=parent_result,
+                child_tpl=Path(r"{child_tpl_s}"),
+                materialization="hardlink",
+            )
+            child_result = child_copie.copy()
+            assert child_result.exit_code == 0
+            assert child_result.materialization == "hardlink"
+
+            # untouched parent files are shared with the parent project
+            parent_asset = parent_result.project_dir / "vendor" / "asset.txt"
+            assert (child_result.project_dir / "vendor" / "asset.txt").samefile(parent_asset)
+
+            # files in folders the child template renders into are independent copies
+            parent_file = child_result.project_dir / "parent_file.txt"
+            assert not parent_file.samefile(parent_result.project_dir / "parent_file.txt")
+            assert (child_result.project_dir / "child.txt").is_file()
+
+            # without reflinks, "auto" copies the files instead of hardlinking them
+            auto_result = copie(
+                parent_result=parent_result,
+                child_tpl=Path(r"{child_tpl_s}"),
+                materialization="auto",
+            ).copy()
+            assert auto_result.materialization in ("reflink", "copy")
+            assert not (auto_result.project_dir / "vendor" / "asset.txt").samefile(parent_asset)
+
+            with pytest.raises(ValueError, match="materialization must be one of"):
+                copie(parent_result=parent_result, child_tpl=Path(r"{child_tpl_s}"), materialization="foo")
+        """
+    )
+
+    res = testdir.runpytest("-v")
+    res.assert_outcomes(passed=1)